@@ -1,10 +1,30 @@
+import threading
 from collections import Counter, defaultdict
 from datetime import datetime
-import json
-from typing import Any, Dict, List
-from feedback.feedback_loop import load_feedback
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+import numpy as np
+from analysis.call_store import CallColumns, get_call_store, is_column_dir, open_columns, read_call_records
+from feedback.feedback_store import get_feedback_store
 
 AHT_THRESHOLD = 530  # seconds
+SHORT_CALL_THRESHOLD = 50  # seconds, for customer_level_insights
+
+# group_by values accepted by transition_statistics -> categorical column
+TRANSITION_GROUPS = {
+    "reason": "reason",
+    "category": "category",
+    "agent": "agent_id",
+    "disposition": "disposition"
+}
+
+# Effectiveness group -> call column it comes from (None: the feedback itself)
+EFFECTIVENESS_GROUPS = {
+    "recommendation": None,
+    "reason": "reason",
+    "agent": "agent_id"
+}
+# group_by -> (feedback/call data version, result)
+_effectiveness_cache: Dict[str, Tuple[Any, dict]] = {}
 
 
 def parse_timestamp(timestamp: str) -> datetime:
@@ -16,33 +36,36 @@ def parse_timestamp(timestamp: str) -> datetime:
         return datetime.strptime(timestamp, "%Y-%m-%dT%H:%M:%SZ")
 
 
-def load_calls(file_path: str = "data/telecom_calls.jsonl") -> List[Dict[str, Any]]:
-    calls = []
-    with open(file_path, "r") as file:
-        for line in file:
-            try:
-                call = json.loads(line)
-                # Validate required fields
-                if "call_id" not in call:
-                    continue  # Skip invalid records
-                calls.append(call)
-            except json.JSONDecodeError:
-                continue  # Skip malformed lines
-    return calls
-
-def calculate_aht(calls: List[Dict[str, Any]]) -> float:
+def load_calls(
+    file_path: str = "data/telecom_calls.jsonl"
+) -> Union[CallColumns, List[Dict[str, Any]]]:
+    # Column directories from data/convert_calls.py are memory-mapped, not parsed
+    if is_column_dir(file_path):
+        return open_columns(file_path)
+    # Skips malformed lines and records without a call_id
+    return list(read_call_records(file_path))
+
+def calculate_aht(calls: Union[CallColumns, List[Dict[str, Any]]]) -> float:
+    if isinstance(calls, CallColumns):
+        return float(calls.duration.mean()) if len(calls) > 0 else 0.0
     total_duration = sum(call["duration"] for call in calls)
     total_calls = len(calls)
     return total_duration / total_calls if total_calls > 0 else 0.0
 
 
-def get_long_calls(calls: List[Dict[str, Any]], threshold: int = AHT_THRESHOLD) -> List[Dict[str, Any]]:
+def get_long_calls(
+    calls: Union[CallColumns, List[Dict[str, Any]]], threshold: int = AHT_THRESHOLD
+) -> Union[CallColumns, List[Dict[str, Any]]]:
+    if isinstance(calls, CallColumns):
+        return calls.take(np.flatnonzero(calls.duration > threshold))
     return [call for call in calls if call["duration"] > threshold]
 
 
 def top_contact_reasons(
-    calls: List[Dict[str, Any]], top_n: int = 5
+    calls: Union[CallColumns, List[Dict[str, Any]]], top_n: int = 5
 ) -> List[Dict[str, Any]]:
+    if isinstance(calls, CallColumns):
+        return calls.value_counts("reason", top_n)
     reasons = [call["reason"] for call in calls]
     return Counter(reasons).most_common(top_n)
 
@@ -52,31 +75,31 @@ def get_call_event_bottlenecks(call: Dict[str, Any]) -> Dict[str, Any]:
     if len(events) < 2:
         return {}
     
+    # Parse each timestamp once rather than once per pair it belongs to
+    times = []
+    for event in events:
+        try:
+            times.append(parse_timestamp(event["timestamp"]) if "timestamp" in event else None)
+        except (TypeError, ValueError) as e:
+            print(f"Error processing event timestamps: {str(e)}")
+            times.append(None)
+    
     bottlenecks = []
     for i in range(1, len(events)):
         prev_event = events[i-1]
         curr_event = events[i]
         
-        # Check for required fields in both events
-        if "timestamp" not in prev_event or "timestamp" not in curr_event:
-            continue  # Skip if either event is missing timestamp
+        # Skip if either event is missing a (valid) timestamp or its event_type
+        if times[i-1] is None or times[i] is None:
+            continue
         if "event_type" not in prev_event or "event_type" not in curr_event:
-            continue  # Skip if either event is missing event_type
-            
-        try:
-            start_time = parse_timestamp(prev_event["timestamp"])
-            end_time = parse_timestamp(curr_event["timestamp"])
-            duration = (end_time - start_time).total_seconds()
-            
-            bottlenecks.append({
-                "from": prev_event["event_type"],
-                "to": curr_event["event_type"],
-                "duration": duration
-            })
-        except (KeyError, ValueError) as e:
-            # Log error and continue processing
-            print(f"Error processing event timestamps: {str(e)}")
             continue
+            
+        bottlenecks.append({
+            "from": prev_event["event_type"],
+            "to": curr_event["event_type"],
+            "duration": (times[i] - times[i-1]).total_seconds()
+        })
     
     if not bottlenecks:
         return {}
@@ -85,9 +108,116 @@ def get_call_event_bottlenecks(call: Dict[str, Any]) -> Dict[str, Any]:
     return {"longest_segment": slowest_bottleneck}
 
 
+def longest_segments(calls: CallColumns) -> Tuple[np.ndarray, np.ndarray]:
+    """Column in `calls.transitions()` of each call's slowest transition and its duration.
+
+    Ties go to the earliest segment in the call, like `get_call_event_bottlenecks`.
+    Calls without any timed transition get -1 and NaN.
+    """
+    transitions = calls.transitions()
+    column = transitions.slowest(calls)
+    rows = np.flatnonzero(column >= 0)
+    longest = np.full(len(calls), np.nan)
+    # A repeated transition's column holds its longest occurrence, which is the call's slowest segment
+    longest[rows] = transitions.durations[rows, column[rows]]
+    return column, longest
+
+
+def bottleneck_summary(calls: CallColumns) -> List[Dict[str, Any]]:
+    """Average duration of the longest segment, per transition that was the longest."""
+    column, longest = longest_segments(calls)
+    valid = column >= 0
+    if not valid.any():
+        return []
+    present, first_seen, inverse = np.unique(column[valid], return_index=True, return_inverse=True)
+    averages = np.bincount(inverse, weights=longest[valid]) / np.bincount(inverse)
+    labels = calls.transitions().labels(calls.vocab)
+    return [
+        {"transition": labels[present[i]], "avg_duration": float(averages[i])}
+        for i in np.argsort(first_seen, kind="stable")
+    ]
+
+
+def _transition_summary(
+    durations: np.ndarray, longest_column: np.ndarray, labels: List[str], percentiles: Sequence[float]
+) -> List[Dict[str, Any]]:
+    counts = np.count_nonzero(~np.isnan(durations), axis=0)
+    longest_counts = np.bincount(longest_column[longest_column >= 0], minlength=len(labels))
+    summary = []
+    for t in np.flatnonzero(counts):
+        values = durations[:, t]
+        values = values[~np.isnan(values)]
+        stats = {
+            "transition": labels[t],
+            "count": int(counts[t]),
+            "mean": round(float(values.mean()), 2),
+            "max": float(values.max()),
+            "longest_segment_calls": int(longest_counts[t])
+        }
+        for p, value in zip(percentiles, np.percentile(values, percentiles)):
+            stats[f"p{p:g}"] = round(float(value), 2)
+        summary.append(stats)
+    return summary
+
+
+def transition_statistics(
+    calls: CallColumns, group_by: Optional[str] = None, percentiles: Sequence[float] = (50, 90, 95)
+) -> Dict[str, Any]:
+    """Count, mean, percentiles and max per event transition, optionally per group."""
+    labels = calls.transitions().labels(calls.vocab)
+    durations = calls.transitions().durations
+    longest_column, _ = longest_segments(calls)
+
+    if group_by is None:
+        return {
+            "total_calls": len(calls),
+            "transitions": _transition_summary(durations, longest_column, labels, percentiles)
+        }
+
+    column = TRANSITION_GROUPS[group_by]
+    codes = calls.codes[column]
+    order = np.argsort(codes, kind="stable")
+    present, counts = np.unique(codes, return_counts=True)
+    group_labels = calls.vocab[column]
+    groups = {}
+    for code, rows in zip(present, np.split(order, np.cumsum(counts)[:-1])):
+        groups[group_labels[code]] = {
+            "total_calls": len(rows),
+            "transitions": _transition_summary(durations[rows], longest_column[rows], labels, percentiles)
+        }
+    return {"total_calls": len(calls), "group_by": group_by, "groups": groups}
+
+
+def _customer_insights_from_columns(
+    calls: CallColumns, threshold: int
+) -> Dict[str, Dict[str, float]]:
+    customers, first_seen, inverse = np.unique(
+        calls.codes["customer_id"], return_index=True, return_inverse=True
+    )
+    total_calls = np.bincount(inverse, minlength=len(customers))
+    total_duration = np.bincount(inverse, weights=calls.duration, minlength=len(customers))
+    short_call = np.bincount(inverse, weights=calls.duration < threshold, minlength=len(customers))
+    short_pct = np.round(short_call / total_calls * 100, 2)
+
+    labels = calls.vocab["customer_id"]
+    # Keep first-appearance order like the dict-based version
+    return {
+        labels[customers[i]]: {
+            "total_calls": int(total_calls[i]),
+            "total_duration": float(total_duration[i]),
+            "short_call": int(short_call[i]),
+            "short_call_percentage": float(short_pct[i])
+        }
+        for i in np.argsort(first_seen, kind="stable")
+    }
+
+
 def customer_level_insights(
-    calls: List[Dict[str, Any]], threshold: int = 50
+    calls: Union[CallColumns, List[Dict[str, Any]]], threshold: int = SHORT_CALL_THRESHOLD
 ) -> Dict[str, Dict[str, float]]:
+    if isinstance(calls, CallColumns):
+        return _customer_insights_from_columns(calls, threshold)
+
     customer_insights = defaultdict(lambda: {
         "total_calls": 0,
         "total_duration": 0,
@@ -108,45 +238,198 @@ def customer_level_insights(
 
     return dict(customer_insights)
 
-def analyze_recommendation_effectiveness() -> dict:
-    """Calculate effectiveness of recommendations"""
-    feedback_list = load_feedback()  # From feedback_loop.py
-    
-    if not feedback_list:
+def _count_labels(counter: Dict[str, List[int]], labels: np.ndarray, codes: np.ndarray, rows: np.ndarray) -> None:
+    """Add `codes` (at call rows `rows`) to a label -> [count, first row] counter."""
+    present, first, counts = np.unique(codes, return_index=True, return_counts=True)
+    for code, i, count in zip(present, first, counts):
+        entry = counter.get(labels[code])
+        if entry is None:
+            counter[labels[code]] = [int(count), int(rows[i])]
+        else:
+            entry[0] += int(count)
+
+
+def _most_common(counter: Dict[str, List[int]], top_n: Optional[int]) -> List[Tuple[str, int]]:
+    """Same ordering as `CallColumns.value_counts`: by count, ties by first appearance."""
+    ranked = sorted(counter.items(), key=lambda item: (-item[1][0], item[1][1]))
+    return [(label, count) for label, (count, _) in ranked[:top_n]]
+
+
+class CallAggregates:
+    """Running totals behind /aht/summary and per-customer insights.
+
+    Attached to a store snapshot by `call_aggregates` and carried over to the
+    snapshots `CallStore.append` derives from it, so each call is counted
+    once, in one vectorized pass over the rows added since the last read.
+    """
+
+    def __init__(self, threshold: float = AHT_THRESHOLD, short_threshold: float = SHORT_CALL_THRESHOLD):
+        self.threshold = threshold
+        self.short_threshold = short_threshold
+        self.rows = 0
+        self.total_duration = 0.0
+        self.long_calls = 0
+        self.long_duration = 0.0
+        self.reasons: Dict[str, List[int]] = {}  # label -> [count, first row]
+        self.long_reasons: Dict[str, List[int]] = {}
+        self.customers: Dict[str, List[float]] = {}  # label -> [calls, total duration, short calls]
+        self._lock = threading.Lock()
+
+    def _add(self, calls: CallColumns, start: int) -> None:
+        duration = np.asarray(calls.duration[start:], dtype=np.float64)
+        long_mask = duration > self.threshold
+        self.total_duration += float(duration.sum())
+        self.long_calls += int(np.count_nonzero(long_mask))
+        self.long_duration += float(duration[long_mask].sum())
+
+        rows = np.arange(start, len(calls))
+        reasons = calls.codes["reason"][start:]
+        _count_labels(self.reasons, calls.vocab["reason"], reasons, rows)
+        _count_labels(self.long_reasons, calls.vocab["reason"], reasons[long_mask], rows[long_mask])
+
+        customers, inverse = np.unique(calls.codes["customer_id"][start:], return_inverse=True)
+        totals = np.stack([
+            np.bincount(inverse, minlength=len(customers)),
+            np.bincount(inverse, weights=duration, minlength=len(customers)),
+            np.bincount(inverse, weights=duration < self.short_threshold, minlength=len(customers))
+        ], axis=1)
+        labels = calls.vocab["customer_id"]
+        for code, values in zip(customers, totals.tolist()):
+            entry = self.customers.get(labels[code])
+            if entry is None:
+                self.customers[labels[code]] = values
+            else:
+                for i, value in enumerate(values):
+                    entry[i] += value
+        self.rows = len(calls)
+
+    def catch_up(self, calls: CallColumns) -> None:
+        with self._lock:
+            if self.rows < len(calls):
+                self._add(calls, self.rows)
+
+    def summary(self, top_n: int = 5) -> Dict[str, Any]:
+        """AHT, long-call totals and the top reasons among long calls."""
+        with self._lock:
+            return {
+                "total_calls": self.rows,
+                "average_aht": self.total_duration / self.rows if self.rows else 0.0,
+                "long_calls_count": self.long_calls,
+                "long_calls_duration": self.long_duration,
+                "top_contact_reasons": _most_common(self.long_reasons, top_n)
+            }
+
+    def top_contact_reasons(self, top_n: int = 5) -> List[Tuple[str, int]]:
+        with self._lock:
+            return _most_common(self.reasons, top_n)
+
+    def customer(self, customer_id: str) -> Optional[Dict[str, float]]:
+        """One customer's entry of `customer_level_insights`, or None if it has no calls."""
+        with self._lock:
+            entry = self.customers.get(customer_id)
+            if entry is None:
+                return None
+            total_calls, total_duration, short_call = entry
+        return {
+            "total_calls": int(total_calls),
+            "total_duration": float(total_duration),
+            "short_call": int(short_call),
+            "short_call_percentage": round(short_call / total_calls * 100, 2) if total_calls > 0 else 0
+        }
+
+
+_aggregates_lock = threading.Lock()
+
+
+def call_aggregates(calls: CallColumns) -> CallAggregates:
+    """Running totals for a store snapshot, extended to any rows appended since the last call."""
+    if calls.aggregates is None:
+        with _aggregates_lock:
+            if calls.aggregates is None:
+                calls.aggregates = CallAggregates()
+    aggregates = calls.aggregates
+    if aggregates.rows > len(calls):
+        # An older snapshot than the one the totals were extended to
+        aggregates = CallAggregates()
+    aggregates.catch_up(calls)
+    return aggregates
+
+
+def recommendation_key(recommendation: str) -> str:
+    """First recommendation point, shortened (simplified grouping)"""
+    first_rec = recommendation.split("\n")[0].strip()
+    return first_rec[:50] + "..." if len(first_rec) > 50 else first_rec
+
+
+def _call_labels(column: str):
+    """call_id -> label of `column` for the linked call, or "unknown" if the call isn't loaded."""
+    call_store = get_call_store()
+    try:
+        calls = call_store.get()
+    except FileNotFoundError:
+        calls = None
+    if calls is None:
+        return lambda call_id: "unknown", None
+    labels = calls.labels(column)
+
+    def lookup(call_id: str) -> str:
+        row = calls.find_call(call_id)
+        return "unknown" if row is None or not labels[row] else str(labels[row])
+    # Within one load of the data, appends only ever add rows
+    return lookup, (call_store.loads, len(calls))
+
+
+def analyze_recommendation_effectiveness(group_by: str = "recommendation") -> dict:
+    """Calculate effectiveness of recommendations
+
+    Feedback is grouped by the first recommendation line, or by the contact
+    reason or agent of the call it was given for. Groups are folded from a
+    streaming SQL group-by into running counts and sums, and the result is
+    cached until new feedback arrives (or the call data changes).
+    """
+    if group_by not in EFFECTIVENESS_GROUPS:
+        raise ValueError(f"Invalid group_by '{group_by}', expected one of {', '.join(EFFECTIVENESS_GROUPS)}")
+    store = get_feedback_store()
+    if group_by == "recommendation":
+        column, key_of, calls_version = "recommendation", recommendation_key, None
+    else:
+        column = "call_id"
+        key_of, calls_version = _call_labels(EFFECTIVENESS_GROUPS[group_by])
+
+    version = (store.last_id(), calls_version)
+    cached = _effectiveness_cache.get(group_by)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    totals = store.totals()
+    if not totals["total"]:
         return {}
     
     # Calculate overall effectiveness
-    total_original = sum(fb["original_duration"] for fb in feedback_list)
-    total_new = sum(fb["new_duration"] for fb in feedback_list)
-    total_reduction = total_original - total_new
-    avg_reduction = total_reduction / len(feedback_list)
+    total_reduction = totals["total_original"] - totals["total_new"]
+    avg_reduction = total_reduction / totals["total"]
     
-    # Group by recommendation type
     effectiveness_by_type = {}
-    for fb in feedback_list:
-        # Extract first recommendation point (simplified)
-        first_rec = fb["recommendation"].split("\n")[0].strip()
-        key = first_rec[:50] + "..." if len(first_rec) > 50 else first_rec
-        
-        if key not in effectiveness_by_type:
-            effectiveness_by_type[key] = {
-                "count": 0,
-                "total_red": 0,
-                "scores": []
-            }
-        
-        effectiveness_by_type[key]["count"] += 1
-        effectiveness_by_type[key]["total_red"] += fb["duration_reduction"]
-        effectiveness_by_type[key]["scores"].append(fb["score"])
+    for value, count, score_sum, reduction_sum in store.aggregate_by(column):
+        key = key_of(value)
+        group = effectiveness_by_type.get(key)
+        if group is None:
+            group = effectiveness_by_type[key] = {"count": 0, "total_red": 0, "score_sum": 0}
+        group["count"] += count
+        group["total_red"] += reduction_sum
+        group["score_sum"] += score_sum
     
     # Calculate averages
     for key, data in effectiveness_by_type.items():
         data["avg_duration_red"] = data["total_red"] / data["count"]
-        data["avg_score"] = sum(data["scores"]) / len(data["scores"])
+        data["avg_score"] = data.pop("score_sum") / data["count"]
     
-    return {
-        "total_calls": len(feedback_list),
+    result = {
+        "total_calls": totals["total"],
         "total_duration_reduction": total_reduction,
         "avg_duration_reduction": avg_reduction,
+        "group_by": group_by,
         "effectiveness_by_recommendation": effectiveness_by_type
-    }
\ No newline at end of file
+    }
+    _effectiveness_cache[group_by] = (version, result)
+    return result
\ No newline at end of file
@@ -0,0 +1,114 @@
+import os
+import threading
+from typing import Any, Dict, Optional
+from analysis.call_store import CallStore, StoreReloadedError, get_call_store, parse_call_lines
+
+# Append-only JSONL tailed into the call store while the API runs (None: disabled)
+CALL_TAIL_FILE: Optional[str] = None
+CALL_TAIL_INTERVAL = 1.0  # seconds between polls
+
+
+class CallTailer:
+    """Appends calls written to an append-only JSONL file to a call store.
+
+    Each poll reads the complete lines added since the last one; a line still
+    being written is picked up by the next poll. Lines are validated like
+    `load_calls()`, and records the store cannot encode are skipped.
+
+    Appended calls live in memory only, so the file is read again from the
+    start when the store reloads its data from disk or the file shrinks
+    (rotated or truncated). For the same reason the file can't be the
+    store's own data file: every write to it reloads the store, which then
+    already holds the new lines.
+    """
+
+    def __init__(self, file_path: str, store: Optional[CallStore] = None, interval: float = CALL_TAIL_INTERVAL):
+        self.file_path = file_path
+        self.store = store or get_call_store()
+        if os.path.realpath(file_path) == os.path.realpath(self.store.file_path):
+            raise ValueError(f"{file_path} is the call store's own data file, which it reloads on change; tail a separate file")
+        self.interval = interval
+        self.offset = 0
+        self.lines = 0
+        self.added = 0
+        self._loads: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def poll(self) -> int:
+        """Append whatever complete lines were written since the last poll; returns how many calls were added."""
+        with self._lock:
+            self.store.get()
+            if self._loads != self.store.loads:
+                self._loads = self.store.loads
+                self.offset = 0
+            try:
+                size = os.path.getsize(self.file_path)
+            except FileNotFoundError:
+                return 0
+            if size < self.offset:
+                self.offset = 0
+            if size == self.offset:
+                return 0
+
+            with open(self.file_path, "rb") as f:
+                f.seek(self.offset)
+                data = f.read(size - self.offset)
+            end = data.rfind(b"\n") + 1
+            if not end:
+                return 0
+            lines = data[:end].split(b"\n")[:-1]
+            try:
+                added = self.store.append(parse_call_lines(lines), loads=self._loads)
+            except StoreReloadedError:
+                return 0  # nothing added; the next poll starts over on the new data
+            self.offset += end
+            self.lines += len(lines)
+            self.added += added
+            return added
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as e:
+                print(f"Call tailer error on {self.file_path}: {e}")
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self.poll()
+        self._thread = threading.Thread(target=self._run, name="call-tailer", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "file": self.file_path,
+            "offset": self.offset,
+            "lines_read": self.lines,
+            "calls_added": self.added,
+            "running": self._thread is not None
+        }
+
+
+_tailer: Optional[CallTailer] = None
+_tailer_lock = threading.Lock()
+
+
+def get_call_tailer() -> Optional[CallTailer]:
+    """Process-wide tailer of `CALL_TAIL_FILE`, or None when tailing is disabled."""
+    global _tailer
+    if CALL_TAIL_FILE is None:
+        return None
+    with _tailer_lock:
+        if _tailer is None:
+            _tailer = CallTailer(CALL_TAIL_FILE)
+        return _tailer
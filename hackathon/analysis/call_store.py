@@ -0,0 +1,1022 @@
+import fcntl
+import json
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+import numpy as np
+
+try:
+    import orjson
+    _json_loads = orjson.loads
+except ImportError:  # stdlib fallback, roughly 2-3x slower
+    _json_loads = json.loads
+
+DATA_FILE = "data/telecom_calls.jsonl"
+
+# Low-cardinality string fields kept as integer codes into a per-column vocabulary
+CATEGORICAL_COLUMNS = ("reason", "category", "customer_id", "agent_id", "disposition")
+
+# Files bigger than this are parsed in a process pool
+PARALLEL_LOAD_BYTES = 64 * 1024 * 1024
+CHUNKS_PER_WORKER = 4
+
+# Fixed-width arrays written by `write_columns`, one `.npy` file each
+ARRAY_COLUMNS = ("call_id", "duration", "start_time", "event_offsets", "event_type", "event_time")
+COLUMN_FORMAT_VERSION = 1
+# Lookup indexes stored next to the columns (`index.<name>.npy`), so readers
+# map them instead of rebuilding them; older column directories lack them
+INDEX_ARRAYS = ("call_id.sorted", "call_id.rows", "customer_id.rows", "customer_id.offsets", "reason.rows", "reason.offsets")
+
+# "process": every process loads its own copy of the data. "shared": one process
+# publishes it as a column directory under `<data>.shared/` and every process
+# (e.g. `uvicorn main:app --workers N`) memory-maps the current generation
+CALL_STORE_MODES = ("process", "shared")
+CALL_STORE_MODE = "process"
+SHARED_CURRENT_FILE = "CURRENT"
+SHARED_LOCK_FILE = ".lock"
+SHARED_GENERATIONS_KEPT = 2  # the current one and the one readers may still be switching away from
+SHARED_ATTACH_ATTEMPTS = 3  # newer publishes may retire a generation between reading CURRENT and opening it
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def _epoch_micros(timestamp: Optional[str]) -> int:
+    """ISO-8601 `...Z` timestamp to epoch microseconds (-1 when missing or invalid)."""
+    if not timestamp:
+        return -1
+    try:
+        dt = datetime.fromisoformat(timestamp.replace("Z", "+00:00"))
+    except ValueError:
+        return -1
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return (dt - _EPOCH) // timedelta(microseconds=1)
+
+
+def _isoformat(epoch_micros: int) -> Optional[str]:
+    if epoch_micros < 0:
+        return None
+    dt = _EPOCH + timedelta(microseconds=epoch_micros)
+    return dt.strftime("%Y-%m-%dT%H:%M:%S.%fZ")
+
+
+def normalize_reason(reason: str) -> str:
+    return reason.strip().lower()
+
+
+class TransitionMatrix:
+    """Per-call durations between consecutive events.
+
+    `durations[i, t]` is the time in seconds call `i` spent going from
+    `pairs[t, 0]` to `pairs[t, 1]` (event type codes), NaN when the call has
+    no such transition. Columns are ordered by first appearance in the data.
+    """
+
+    def __init__(self, pairs: np.ndarray, durations: np.ndarray):
+        self.pairs = pairs
+        self.durations = durations
+        self._slowest: Optional[np.ndarray] = None
+
+    def labels(self, vocab: Dict[str, np.ndarray]) -> List[str]:
+        event_labels = vocab["event_type"]
+        return [f"{event_labels[a]} → {event_labels[b]}" for a, b in self.pairs]
+
+    def take(self, rows: np.ndarray) -> "TransitionMatrix":
+        subset = TransitionMatrix(self.pairs, self.durations[rows])
+        if self._slowest is not None:
+            subset._slowest = self._slowest[rows]
+        return subset
+
+    def slowest(self, columns: "CallColumns") -> np.ndarray:
+        """Column of each call's slowest transition (-1 if it has none), computed once.
+
+        Ties go to the segment that comes first in the call's own events, as
+        with `max()` in `get_call_event_bottlenecks`. `columns` must be the
+        calls this matrix was computed from.
+        """
+        if self._slowest is None:
+            slowest = np.full(len(columns), -1, dtype=np.int64)
+            call_of, from_type, to_type, seconds = event_segments(columns)
+            if len(call_of):
+                # Segments are grouped by call in event order: take each call's first one at its maximum
+                starts = np.flatnonzero(np.r_[True, call_of[1:] != call_of[:-1]])
+                maxima = np.repeat(np.maximum.reduceat(seconds, starts), np.diff(np.r_[starts, len(call_of)]))
+                candidates = np.flatnonzero(seconds == maxima)
+                first = candidates[np.r_[True, call_of[candidates[1:]] != call_of[candidates[:-1]]]]
+                n_types = max(len(columns.vocab["event_type"]), 1)
+                slowest[call_of[first]] = self.columns_of(from_type[first], to_type[first], n_types)
+            self._slowest = slowest
+        return self._slowest
+
+    @classmethod
+    def from_events(cls, columns: "CallColumns") -> "TransitionMatrix":
+        call_of, from_type, to_type, seconds = event_segments(columns)
+        n_types = max(len(columns.vocab["event_type"]), 1)
+        pair_codes = from_type.astype(np.int64) * n_types + to_type
+        present, first_seen, inverse = np.unique(pair_codes, return_index=True, return_inverse=True)
+        order = np.argsort(first_seen, kind="stable")
+        column_of = np.empty(len(order), dtype=np.int64)
+        column_of[order] = np.arange(len(order))
+
+        durations = np.full((len(columns), len(present)), np.nan)
+        # A transition repeated within one call keeps its longest occurrence
+        np.fmax.at(durations, (call_of, column_of[inverse]), seconds)
+        pairs = np.stack([present[order] // n_types, present[order] % n_types], axis=1)
+        return cls(pairs, durations)
+
+    def columns_of(self, from_type: np.ndarray, to_type: np.ndarray, n_types: int) -> np.ndarray:
+        """Column of each (from, to) event type pair; every pair must have one."""
+        pair_codes = self.pairs[:, 0].astype(np.int64) * n_types + self.pairs[:, 1]
+        sorter = np.argsort(pair_codes)
+        return sorter[np.searchsorted(pair_codes, from_type.astype(np.int64) * n_types + to_type, sorter=sorter)]
+
+
+def event_segments(columns: "CallColumns") -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """Consecutive event pairs of every call, in event order: (row, from type, to type, seconds)."""
+    offsets, types, times = columns.event_offsets, columns.event_type, columns.event_time
+    call_of = np.repeat(np.arange(len(columns)), np.diff(offsets))
+    prev = np.arange(max(len(types) - 1, 0))
+    curr = prev + 1
+    # Same rules as get_call_event_bottlenecks: both events need a type and a timestamp
+    valid = (
+        (call_of[prev] == call_of[curr])
+        & (types[prev] >= 0) & (types[curr] >= 0)
+        & (times[prev] >= 0) & (times[curr] >= 0)
+    )
+    prev, curr = prev[valid], curr[valid]
+    return call_of[prev], types[prev], types[curr], (times[curr] - times[prev]) / 1e6
+
+
+class CallColumns:
+    """Column-oriented view over a set of calls.
+
+    Numeric fields are plain NumPy arrays, categorical fields are int32 codes
+    into `vocab[name]`. Events are stored CSR-style: the events of row `i`
+    are `event_offsets[i]:event_offsets[i + 1]` in `event_type` (codes into
+    `vocab["event_type"]`) and `event_time` (epoch microseconds).
+
+    Subsets produced by `take()` share the vocabularies with the store they
+    came from but carry no index.
+    """
+
+    def __init__(
+        self,
+        call_id: np.ndarray,
+        duration: np.ndarray,
+        start_time: np.ndarray,
+        codes: Dict[str, np.ndarray],
+        vocab: Dict[str, np.ndarray],
+        event_offsets: np.ndarray,
+        event_type: np.ndarray,
+        event_time: np.ndarray,
+        index: Optional["CallIndex"] = None
+    ):
+        self.call_id = call_id
+        self.duration = duration
+        self.start_time = start_time
+        self.codes = codes
+        self.vocab = vocab
+        self.event_offsets = event_offsets
+        self.event_type = event_type
+        self.event_time = event_time
+        self.index = index
+        # Running metrics attached by `aht_analysis.call_aggregates`, kept across appends like the index
+        self.aggregates: Optional[Any] = None
+        self._transitions: Optional[TransitionMatrix] = None
+        self._buffers: Optional["AppendBuffers"] = None
+
+    def __len__(self) -> int:
+        return len(self.call_id)
+
+    def labels(self, name: str) -> np.ndarray:
+        """Decoded string values of a categorical column."""
+        return self.vocab[name][self.codes[name]]
+
+    def take(self, rows: np.ndarray) -> "CallColumns":
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.event_offsets[rows]
+        lengths = self.event_offsets[rows + 1] - starts
+        offsets = np.zeros(len(rows) + 1, dtype=np.int64)
+        np.cumsum(lengths, out=offsets[1:])
+        # Position of every selected event in the source event arrays
+        gather = np.repeat(starts - offsets[:-1], lengths) + np.arange(offsets[-1])
+        subset = CallColumns(
+            call_id=self.call_id[rows],
+            duration=self.duration[rows],
+            start_time=self.start_time[rows],
+            codes={name: codes[rows] for name, codes in self.codes.items()},
+            vocab=self.vocab,
+            event_offsets=offsets,
+            event_type=self.event_type[gather],
+            event_time=self.event_time[gather]
+        )
+        if self._transitions is not None:
+            subset._transitions = self._transitions.take(rows)
+        return subset
+
+    def transitions(self) -> TransitionMatrix:
+        """Event transition durations, computed once from the event columns."""
+        if self._transitions is None:
+            self._transitions = TransitionMatrix.from_events(self)
+        return self._transitions
+
+    def find_call(self, call_id: str) -> Optional[int]:
+        return self.index.call_row(self, call_id)
+
+    def customer_rows(self, customer_id: str) -> np.ndarray:
+        return self.index.customer_rows(self, customer_id)
+
+    def reason_rows(self, reason: str) -> np.ndarray:
+        return self.index.reason_rows(self, reason)
+
+    def value_counts(self, name: str, top_n: Optional[int] = None) -> List[Tuple[str, int]]:
+        """Same ordering as `Counter(...).most_common()`: by count, ties by first appearance."""
+        codes = self.codes[name]
+        if len(codes) == 0:
+            return []
+        present, first_seen, counts = np.unique(codes, return_index=True, return_counts=True)
+        order = np.lexsort((first_seen, -counts))[:top_n]
+        labels = self.vocab[name]
+        return [(labels[present[i]], int(counts[i])) for i in order]
+
+    def events(self, i: int) -> List[Dict[str, Any]]:
+        event_labels = self.vocab["event_type"]
+        events = []
+        for j in range(self.event_offsets[i], self.event_offsets[i + 1]):
+            event = {}
+            if self.event_type[j] >= 0:
+                event["event_type"] = event_labels[self.event_type[j]]
+            if self.event_time[j] >= 0:
+                event["timestamp"] = _isoformat(int(self.event_time[j]))
+            events.append(event)
+        return events
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Rebuild a record shaped like a `telecom_calls.jsonl` line (without free text)."""
+        return {
+            "call_id": str(self.call_id[i]),
+            "start_time": _isoformat(int(self.start_time[i])),
+            "duration": float(self.duration[i]),
+            "customer": {"customer_id": self.vocab["customer_id"][self.codes["customer_id"][i]]},
+            "agent": {"agent_id": self.vocab["agent_id"][self.codes["agent_id"][i]]},
+            "reason": self.vocab["reason"][self.codes["reason"][i]],
+            "category": self.vocab["category"][self.codes["category"][i]],
+            "disposition": self.vocab["disposition"][self.codes["disposition"][i]],
+            "events": self.events(i)
+        }
+
+
+class AppendBuffers:
+    """Arrays with spare capacity behind a chain of appended snapshots.
+
+    Each snapshot's arrays are views of the first n rows of a buffer, so an
+    append only writes the new rows after them and older snapshots (shorter
+    views) are left untouched. A buffer is reallocated, 1.5x the needed
+    size, when it is full, its dtype must widen, or `current` is not the
+    newest view of it.
+    """
+
+    def __init__(self):
+        self._arrays: Dict[str, np.ndarray] = {}
+        self._rows: Dict[str, int] = {}  # rows used by the newest snapshot
+
+    def extend(self, name: str, current: np.ndarray, tail: np.ndarray) -> np.ndarray:
+        buffer = self._arrays.get(name)
+        n, needed = len(current), len(current) + len(tail)
+        dtype = np.result_type(current, tail)
+        reusable = (
+            buffer is not None and self._rows[name] == n and len(buffer) >= needed
+            and buffer.dtype == dtype and buffer.shape[1:] == tail.shape[1:]
+            and current.__array_interface__["data"][0] == buffer.__array_interface__["data"][0]
+        )
+        if not reusable:
+            buffer = np.empty((max(needed * 3 // 2, 16),) + tail.shape[1:], dtype=dtype)
+            buffer[:n] = current
+            self._arrays[name] = buffer
+        buffer[n:needed] = tail
+        self._rows[name] = needed
+        return buffer[:needed]
+
+
+def concat_transitions(
+    base: TransitionMatrix, tail_calls: "CallColumns", buffers: AppendBuffers
+) -> TransitionMatrix:
+    """Transitions of base rows followed by those of `tail_calls`, coded against the same event vocabulary.
+
+    Only the tail's matrix is computed; transitions first seen in the tail
+    become new columns after the existing ones (NaN for the base rows),
+    which keeps columns in order of first appearance. Slowest transitions,
+    if computed for the base, are extended the same way.
+    """
+    tail = tail_calls.transitions()
+    column_of = {(int(a), int(b)): column for column, (a, b) in enumerate(base.pairs)}
+    new_pairs = []
+    tail_columns = []
+    for a, b in tail.pairs:
+        key = (int(a), int(b))
+        if key not in column_of:
+            column_of[key] = len(column_of)
+            new_pairs.append(key)
+        tail_columns.append(column_of[key])
+
+    n_columns = len(column_of)
+    durations = base.durations
+    if new_pairs:
+        padded = np.full((len(durations), n_columns), np.nan)
+        padded[:, :durations.shape[1]] = durations
+        durations = padded
+    tail_durations = np.full((len(tail.durations), n_columns), np.nan)
+    tail_durations[:, tail_columns] = tail.durations
+    pairs = np.concatenate([base.pairs, np.asarray(new_pairs, dtype=base.pairs.dtype).reshape(-1, 2)]) if new_pairs else base.pairs
+    combined = TransitionMatrix(pairs, buffers.extend("transitions", durations, tail_durations))
+    if base._slowest is not None:
+        tail_slowest = tail.slowest(tail_calls)
+        mapped = np.where(tail_slowest >= 0, np.asarray(tail_columns, dtype=np.int64)[tail_slowest], -1)
+        combined._slowest = buffers.extend("transitions.slowest", base._slowest, mapped)
+    return combined
+
+
+def concat_columns(base: CallColumns, tail: CallColumns) -> CallColumns:
+    """Append `tail` to `base`; `tail` must have been encoded against base's vocabularies.
+
+    Appends write into `AppendBuffers` shared along the chain of snapshots,
+    so they cost the tail's size rather than a copy of every column. The
+    first append copies the base once, which for memory-mapped columns
+    (a column directory or a "shared" store) moves them into private memory.
+    Transitions computed for the base are extended with the tail's.
+    """
+    buffers = base._buffers or AppendBuffers()
+
+    def extend(name: str, current: np.ndarray, new: np.ndarray) -> np.ndarray:
+        return buffers.extend(name, current, new)
+
+    columns = CallColumns(
+        call_id=extend("call_id", base.call_id, tail.call_id),
+        duration=extend("duration", base.duration, tail.duration),
+        start_time=extend("start_time", base.start_time, tail.start_time),
+        codes={name: extend(f"{name}.codes", base.codes[name], tail.codes[name]) for name in base.codes},
+        vocab=tail.vocab,
+        event_offsets=extend("event_offsets", base.event_offsets, tail.event_offsets[1:] + base.event_offsets[-1]),
+        event_type=extend("event_type", base.event_type, tail.event_type),
+        event_time=extend("event_time", base.event_time, tail.event_time)
+    )
+    columns._buffers = buffers
+    if base._transitions is not None:
+        columns._transitions = concat_transitions(base._transitions, tail, buffers)
+    return columns
+
+
+class CallIndex:
+    """Secondary indexes over a store's rows.
+
+    Stores build it when they load their data (`warm`). Every snapshot a
+    store hands out extends the previous one, so the index catches up with
+    whichever snapshot asks, and a reader holding an older, shorter
+    snapshot ignores rows at or past its own length.
+    """
+
+    def __init__(self):
+        self._call_rows: Dict[str, int] = {}
+        self._customer_rows: Dict[str, List[int]] = defaultdict(list)
+        self._reason_rows: Dict[str, List[int]] = defaultdict(list)
+        self._indexed = 0
+        self._lock = threading.Lock()
+
+    def _add(self, columns: CallColumns, start: int) -> None:
+        call_rows = self._call_rows
+        for row in range(start, len(columns)):
+            # First occurrence wins, like the old linear scan
+            call_rows.setdefault(str(columns.call_id[row]), row)
+
+        for name, rows_by_key, normalize in (
+            ("customer_id", self._customer_rows, str),
+            ("reason", self._reason_rows, normalize_reason)
+        ):
+            codes = columns.codes[name][start:]
+            order = np.argsort(codes, kind="stable")
+            present, counts = np.unique(codes, return_counts=True)
+            labels = columns.vocab[name]
+            for code, rows in zip(present, np.split(order + start, np.cumsum(counts)[:-1])):
+                rows_by_key[normalize(labels[code])].extend(rows.tolist())
+
+    def warm(self, columns: CallColumns) -> None:
+        """Index every row of `columns` now rather than on the first lookup."""
+        self._catch_up(columns)
+
+    def _catch_up(self, columns: CallColumns) -> None:
+        if self._indexed >= len(columns):
+            return
+        with self._lock:
+            if self._indexed < len(columns):
+                self._add(columns, self._indexed)
+                self._indexed = len(columns)
+
+    @staticmethod
+    def _visible(rows: List[int], limit: int) -> np.ndarray:
+        rows = np.asarray(rows, dtype=np.int64)
+        return rows[:np.searchsorted(rows, limit)]
+
+    def call_row(self, columns: CallColumns, call_id: str) -> Optional[int]:
+        self._catch_up(columns)
+        row = self._call_rows.get(call_id)
+        return row if row is not None and row < len(columns) else None
+
+    def customer_rows(self, columns: CallColumns, customer_id: str) -> np.ndarray:
+        self._catch_up(columns)
+        return self._visible(self._customer_rows.get(customer_id, []), len(columns))
+
+    def reason_rows(self, columns: CallColumns, reason: str) -> np.ndarray:
+        self._catch_up(columns)
+        return self._visible(self._reason_rows.get(normalize_reason(reason), []), len(columns))
+
+
+def index_arrays(columns: CallColumns) -> Dict[str, np.ndarray]:
+    """The `INDEX_ARRAYS` for `columns`: sorted call ids, and rows grouped by code CSR-style."""
+    order = np.argsort(columns.call_id, kind="stable")  # stable: first occurrence of an id sorts first
+    arrays = {"call_id.sorted": columns.call_id[order], "call_id.rows": order}
+    for name in ("customer_id", "reason"):
+        codes = columns.codes[name]
+        offsets = np.zeros(len(columns.vocab[name]) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(codes, minlength=len(columns.vocab[name])), out=offsets[1:])
+        arrays[f"{name}.rows"] = np.argsort(codes, kind="stable")
+        arrays[f"{name}.offsets"] = offsets
+    return arrays
+
+
+class MappedCallIndex(CallIndex):
+    """`CallIndex` answered from precomputed `index_arrays`, typically memory-mapped.
+
+    The arrays cover the first `rows` rows; rows appended after those are
+    indexed in memory by `CallIndex`. Label lookups are built by `warm`, or
+    on first use.
+    """
+
+    def __init__(self, arrays: Dict[str, np.ndarray], vocab: Dict[str, np.ndarray], rows: int):
+        super().__init__()
+        self._arrays = arrays
+        self._vocab = vocab
+        self._indexed = rows
+        self._codes: Dict[str, Dict[str, List[int]]] = {}
+
+    def warm(self, columns: CallColumns) -> None:
+        for name in ("customer_id", "reason"):
+            self._codes_for(name, "")
+        super().warm(columns)
+
+    def _codes_for(self, name: str, key: str) -> List[int]:
+        lookup = self._codes.get(name)
+        if lookup is None:
+            normalize = normalize_reason if name == "reason" else str
+            lookup = defaultdict(list)
+            for code, label in enumerate(self._vocab[name]):
+                lookup[normalize(label)].append(code)
+            self._codes[name] = lookup
+        return lookup.get(key, [])
+
+    def _mapped_rows(self, name: str, key: str) -> np.ndarray:
+        rows, offsets = self._arrays[f"{name}.rows"], self._arrays[f"{name}.offsets"]
+        parts = [rows[offsets[code]:offsets[code + 1]] for code in self._codes_for(name, key)]
+        if len(parts) == 1:
+            return parts[0]
+        return np.sort(np.concatenate(parts)) if parts else np.empty(0, dtype=np.int64)
+
+    def call_row(self, columns: CallColumns, call_id: str) -> Optional[int]:
+        ids = self._arrays["call_id.sorted"]
+        position = int(np.searchsorted(ids, call_id))
+        if position < len(ids) and ids[position] == call_id:
+            return int(self._arrays["call_id.rows"][position])
+        return super().call_row(columns, call_id)
+
+    def customer_rows(self, columns: CallColumns, customer_id: str) -> np.ndarray:
+        return np.concatenate([self._mapped_rows("customer_id", customer_id), super().customer_rows(columns, customer_id)])
+
+    def reason_rows(self, columns: CallColumns, reason: str) -> np.ndarray:
+        key = normalize_reason(reason)
+        return np.concatenate([self._mapped_rows("reason", key), super().reason_rows(columns, reason)])
+
+
+class ColumnBuilder:
+    """Accumulates validated call records and produces `CallColumns`.
+
+    Passing an existing `vocab` keeps codes compatible with those columns so
+    the result can be appended with `concat_columns`.
+    """
+
+    def __init__(self, vocab: Optional[Dict[str, np.ndarray]] = None):
+        self.call_id: List[str] = []
+        self.duration: List[float] = []
+        self.start_time: List[int] = []
+        self.event_offsets: List[int] = [0]
+        self.event_type: List[int] = []
+        self.event_time: List[int] = []
+        self.codes: Dict[str, List[int]] = {name: [] for name in CATEGORICAL_COLUMNS}
+        self._lookup: Dict[str, Dict[str, int]] = {
+            name: {label: code for code, label in enumerate(vocab[name])} if vocab else {}
+            for name in CATEGORICAL_COLUMNS + ("event_type",)
+        }
+
+    def _encode(self, name: str, value: Any) -> int:
+        label = "" if value is None else str(value)
+        lookup = self._lookup[name]
+        code = lookup.get(label)
+        if code is None:
+            code = lookup[label] = len(lookup)
+        return code
+
+    def append(self, call: Dict[str, Any]) -> None:
+        """Add one record; a field of the wrong type raises before anything is added."""
+        duration = float(call.get("duration") or 0)
+        start_time = _epoch_micros(call.get("start_time"))
+        values = {
+            "reason": call.get("reason"),
+            "category": call.get("category"),
+            "customer_id": (call.get("customer") or {}).get("customer_id"),
+            "agent_id": (call.get("agent") or {}).get("agent_id"),
+            "disposition": call.get("disposition")
+        }
+        events = [
+            (event.get("event_type"), _epoch_micros(event.get("timestamp")))
+            for event in call.get("events") or [] if isinstance(event, dict)
+        ]
+
+        self.call_id.append(str(call["call_id"]))
+        self.duration.append(duration)
+        self.start_time.append(start_time)
+        for name in CATEGORICAL_COLUMNS:
+            self.codes[name].append(self._encode(name, values[name]))
+        for event_type, event_time in events:
+            self.event_type.append(-1 if event_type is None else self._encode("event_type", event_type))
+            self.event_time.append(event_time)
+        self.event_offsets.append(len(self.event_type))
+
+    def extend(self, calls: Iterable[Dict[str, Any]]) -> "ColumnBuilder":
+        for call in calls:
+            self.append(call)
+        return self
+
+    def build(self) -> CallColumns:
+        return CallColumns(
+            call_id=np.array(self.call_id, dtype=str),
+            duration=np.array(self.duration, dtype=np.float64),
+            start_time=np.array(self.start_time, dtype=np.int64),
+            codes={name: np.array(codes, dtype=np.int32) for name, codes in self.codes.items()},
+            vocab={name: np.array(list(lookup), dtype=object) for name, lookup in self._lookup.items()},
+            event_offsets=np.array(self.event_offsets, dtype=np.int64),
+            event_type=np.array(self.event_type, dtype=np.int32),
+            event_time=np.array(self.event_time, dtype=np.int64)
+        )
+
+
+def is_call_record(call: Any) -> bool:
+    """The check every loader applies: a JSON object with a call_id."""
+    return isinstance(call, dict) and "call_id" in call
+
+
+def parse_call_lines(lines: Iterable[bytes]) -> Iterator[Dict[str, Any]]:
+    for line in lines:
+        try:
+            call = _json_loads(line)
+        except ValueError:  # json.JSONDecodeError and orjson.JSONDecodeError
+            continue
+        if not is_call_record(call):
+            continue
+        yield call
+
+
+def read_call_records(file_path: str) -> Iterable[Dict[str, Any]]:
+    """Yield valid call records, skipping malformed lines and records without call_id."""
+    with open(file_path, "rb") as file:
+        yield from parse_call_lines(file)
+
+
+def split_byte_ranges(file_path: str, n_chunks: int) -> List[Tuple[int, int]]:
+    """Split a file into roughly equal `(start, end)` ranges that end on newlines."""
+    size = os.path.getsize(file_path)
+    bounds = [0]
+    with open(file_path, "rb") as f:
+        for i in range(1, n_chunks):
+            target = size * i // n_chunks
+            if target <= bounds[-1]:
+                continue
+            f.seek(target)
+            f.readline()  # finish the line the target landed in
+            position = f.tell()
+            if position >= size:
+                break
+            bounds.append(position)
+    bounds.append(size)
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _read_range(file_path: str, start: int, end: int) -> List[bytes]:
+    with open(file_path, "rb") as f:
+        f.seek(start)
+        return f.read(end - start).split(b"\n")
+
+
+def _parse_range_records(task: Tuple[str, int, int]) -> List[Dict[str, Any]]:
+    return list(parse_call_lines(_read_range(*task)))
+
+
+def _parse_range_columns(task: Tuple[str, int, int]) -> CallColumns:
+    return ColumnBuilder().extend(parse_call_lines(_read_range(*task))).build()
+
+
+def _parallel_map(func, file_path: str, workers: Optional[int]) -> Iterator[Any]:
+    workers = workers or os.cpu_count() or 1
+    tasks = [(file_path, start, end) for start, end in split_byte_ranges(file_path, workers * CHUNKS_PER_WORKER)]
+    if workers == 1 or len(tasks) <= 1:
+        yield from map(func, tasks)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() keeps file order, so row order matches the sequential reader
+        yield from pool.map(func, tasks)
+
+
+def iter_call_batches(file_path: str, workers: Optional[int] = None) -> Iterator[List[Dict[str, Any]]]:
+    """Yield valid call records in file-ordered batches, parsed in a process pool."""
+    yield from _parallel_map(_parse_range_records, file_path, workers)
+
+
+def iter_column_chunks(file_path: str, workers: Optional[int] = None) -> Iterator[CallColumns]:
+    """Like `iter_call_batches` but each worker returns columns with its own vocabularies."""
+    yield from _parallel_map(_parse_range_columns, file_path, workers)
+
+
+def merge_columns(chunks: Iterable[CallColumns]) -> CallColumns:
+    """Concatenate independently encoded chunks, re-mapping codes to one shared vocabulary."""
+    lookups: Dict[str, Dict[str, int]] = {name: {} for name in CATEGORICAL_COLUMNS + ("event_type",)}
+    parts: Dict[str, List[np.ndarray]] = defaultdict(list)
+
+    def remap(name: str, chunk: CallColumns, codes: np.ndarray) -> np.ndarray:
+        lookup = lookups[name]
+        mapping = np.array(
+            [lookup.setdefault(label, len(lookup)) for label in chunk.vocab[name]] + [-1],
+            dtype=np.int32
+        )
+        return mapping[codes]  # code -1 (missing event type) hits the trailing -1
+
+    event_total = 0
+    for chunk in chunks:
+        for name in ("call_id", "duration", "start_time", "event_time"):
+            parts[name].append(getattr(chunk, name))
+        for name in CATEGORICAL_COLUMNS:
+            parts[name].append(remap(name, chunk, chunk.codes[name]))
+        parts["event_type"].append(remap("event_type", chunk, chunk.event_type))
+        parts["event_offsets"].append(chunk.event_offsets[1:] + event_total)
+        event_total += int(chunk.event_offsets[-1])
+
+    def join(name: str, dtype) -> np.ndarray:
+        return np.concatenate(parts[name]) if parts[name] else np.empty(0, dtype=dtype)
+
+    return CallColumns(
+        call_id=join("call_id", str),
+        duration=join("duration", np.float64),
+        start_time=join("start_time", np.int64),
+        codes={name: join(name, np.int32) for name in CATEGORICAL_COLUMNS},
+        vocab={name: np.array(list(lookup), dtype=object) for name, lookup in lookups.items()},
+        event_offsets=np.concatenate([np.zeros(1, dtype=np.int64)] + parts["event_offsets"]),
+        event_type=join("event_type", np.int32),
+        event_time=join("event_time", np.int64)
+    )
+
+
+def load_columns(file_path: str, workers: Optional[int] = None) -> CallColumns:
+    """Parse a JSONL export into columns, in parallel for large files."""
+    if os.path.getsize(file_path) < PARALLEL_LOAD_BYTES or workers == 1:
+        return ColumnBuilder().extend(read_call_records(file_path)).build()
+    return merge_columns(iter_column_chunks(file_path, workers))
+
+
+def column_dir_for(file_path: str) -> str:
+    """`data/telecom_calls.jsonl` -> `data/telecom_calls.cols`"""
+    return os.path.splitext(file_path)[0] + ".cols"
+
+
+def is_column_dir(path: str) -> bool:
+    return os.path.isfile(os.path.join(path, "meta.json"))
+
+
+def _read_meta(path: str) -> Dict[str, Any]:
+    with open(os.path.join(path, "meta.json"), "r") as f:
+        return json.load(f)
+
+
+def column_dir_is_fresh(path: str, source_path: str) -> bool:
+    """True when `path` was converted from the current contents of `source_path`."""
+    if not is_column_dir(path):
+        return False
+    meta = _read_meta(path)
+    stat = os.stat(source_path)
+    return meta.get("source_mtime_ns") == stat.st_mtime_ns and meta.get("source_size") == stat.st_size
+
+
+def write_columns(columns: CallColumns, out_dir: str, source_path: Optional[str] = None) -> None:
+    """Write `columns` as one `.npy` per column plus `vocab.json` and `meta.json`.
+
+    The directory is written next to `out_dir` and renamed into place, so a
+    reader never opens a half-written dataset.
+    """
+    tmp_dir = out_dir.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    os.makedirs(tmp_dir)
+
+    for name in ARRAY_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.npy"), getattr(columns, name))
+    for name in CATEGORICAL_COLUMNS:
+        np.save(os.path.join(tmp_dir, f"{name}.codes.npy"), columns.codes[name])
+    transitions = columns.transitions()
+    np.save(os.path.join(tmp_dir, "transition_pairs.npy"), transitions.pairs)
+    np.save(os.path.join(tmp_dir, "transitions.npy"), transitions.durations)
+    for name, array in index_arrays(columns).items():
+        np.save(os.path.join(tmp_dir, f"index.{name}.npy"), array)
+    with open(os.path.join(tmp_dir, "vocab.json"), "w") as f:
+        json.dump({name: list(labels) for name, labels in columns.vocab.items()}, f)
+
+    meta = {"version": COLUMN_FORMAT_VERSION, "rows": len(columns)}
+    if source_path is not None:
+        stat = os.stat(source_path)
+        meta.update(source=source_path, source_mtime_ns=stat.st_mtime_ns, source_size=stat.st_size)
+    with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+    # Open readers keep their mappings of the old files after the swap
+    old_dir = out_dir.rstrip("/") + ".old"
+    shutil.rmtree(old_dir, ignore_errors=True)
+    if os.path.exists(out_dir):
+        os.rename(out_dir, old_dir)
+    os.rename(tmp_dir, out_dir)
+    shutil.rmtree(old_dir, ignore_errors=True)
+
+
+def open_columns(path: str) -> CallColumns:
+    """Open a column directory zero-copy; arrays are memory-mapped read-only."""
+    meta = _read_meta(path)
+    if meta.get("version") != COLUMN_FORMAT_VERSION:
+        raise ValueError(f"Unsupported call column format in {path}: {meta.get('version')}")
+
+    def load(name: str) -> np.ndarray:
+        return np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")
+
+    with open(os.path.join(path, "vocab.json"), "r") as f:
+        vocab = {name: np.array(labels, dtype=object) for name, labels in json.load(f).items()}
+    columns = CallColumns(
+        codes={name: load(f"{name}.codes") for name in CATEGORICAL_COLUMNS},
+        vocab=vocab,
+        **{name: load(name) for name in ARRAY_COLUMNS}
+    )
+    if os.path.exists(os.path.join(path, "transitions.npy")):
+        columns._transitions = TransitionMatrix(load("transition_pairs"), load("transitions"))
+    if all(os.path.exists(os.path.join(path, f"index.{name}.npy")) for name in INDEX_ARRAYS):
+        arrays = {name: load(f"index.{name}") for name in INDEX_ARRAYS}
+        columns.index = MappedCallIndex(arrays, vocab, len(columns))
+    return columns
+
+
+def _read_columns(file_path: str, workers: Optional[int] = None) -> CallColumns:
+    """Columns for a JSONL export or column directory, preferring an up-to-date `.cols` directory."""
+    if os.path.isdir(file_path):
+        return open_columns(file_path)
+    if column_dir_is_fresh(column_dir_for(file_path), file_path):
+        return open_columns(column_dir_for(file_path))
+    columns = load_columns(file_path, workers)
+    columns.transitions()
+    return columns
+
+
+def shared_dir_for(file_path: str) -> str:
+    """`data/telecom_calls.jsonl` -> `data/telecom_calls.shared`"""
+    return os.path.splitext(file_path)[0] + ".shared"
+
+
+def read_current(shared_dir: str) -> Optional[Dict[str, Any]]:
+    """The published generation (`generation`, `dir`, `source`), or None before the first publish."""
+    try:
+        with open(os.path.join(shared_dir, SHARED_CURRENT_FILE), "r") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def _source_signature(file_path: str) -> List[int]:
+    stat = os.stat(file_path)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def publish_columns(
+    file_path: str = DATA_FILE,
+    shared_dir: Optional[str] = None,
+    workers: Optional[int] = None,
+    blocking: bool = True,
+    force: bool = False
+) -> Optional[int]:
+    """Load `file_path` and publish it as the next generation under `shared_dir`.
+
+    Publishers serialize on a lock file. A generation already built from the
+    current file is kept unless `force`. Readers switch when `CURRENT` is
+    replaced; generations older than `SHARED_GENERATIONS_KEPT` are removed
+    (processes that still map them keep their pages). Returns the current
+    generation, or None if another process holds the lock and `blocking` is
+    False.
+    """
+    shared_dir = shared_dir or shared_dir_for(file_path)
+    os.makedirs(shared_dir, exist_ok=True)
+    with open(os.path.join(shared_dir, SHARED_LOCK_FILE), "a") as lock:  # closing releases the lock
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            return None
+        current = read_current(shared_dir)
+        source = _source_signature(file_path)  # before loading: a write during the load gets republished
+        if current is not None and current["source"] == source and not force:
+            return current["generation"]
+
+        generation = (current["generation"] if current else 0) + 1
+        name = f"gen-{generation:06d}"
+        started = time.perf_counter()
+        columns = _read_columns(file_path, workers)
+        write_columns(columns, os.path.join(shared_dir, name), source_path=file_path)
+        tmp_path = os.path.join(shared_dir, SHARED_CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump({"generation": generation, "dir": name, "source": source, "rows": len(columns)}, f)
+        os.replace(tmp_path, os.path.join(shared_dir, SHARED_CURRENT_FILE))
+        print(f"Published {len(columns)} calls as generation {generation} in {time.perf_counter() - started:.1f}s")
+
+        for entry in os.listdir(shared_dir):
+            if entry.startswith("gen-") and entry[4:].isdigit() and int(entry[4:]) <= generation - SHARED_GENERATIONS_KEPT:
+                shutil.rmtree(os.path.join(shared_dir, entry), ignore_errors=True)
+        return generation
+
+
+class StoreReloadedError(RuntimeError):
+    """The store reloaded its data since the caller last looked (see `CallStore.append`)."""
+
+
+class CallStore:
+    """Resident columnar copy of the call dataset.
+
+    `file_path` may be a JSONL export or a column directory written by
+    `data/convert_calls.py`. For a JSONL file, an up-to-date `.cols`
+    directory next to it is memory-mapped instead of parsing the JSON.
+
+    The data is loaded, and its call_id/customer/reason index built, once;
+    `get()` only re-reads it when its mtime or size has changed since the
+    last load. Calls added with `append()` are indexed incrementally and
+    live in memory until the next reload from disk.
+    """
+
+    def __init__(self, file_path: str = DATA_FILE, workers: Optional[int] = None):
+        self.file_path = file_path
+        self.workers = workers
+        self._columns: Optional[CallColumns] = None
+        self._signature: Optional[Tuple[int, int]] = None
+        self._lock = threading.Lock()
+        self.loads = 0  # bumped whenever data is (re)loaded, dropping appended calls
+
+    def _file_signature(self) -> Tuple[int, int]:
+        path = self.file_path
+        if os.path.isdir(path):
+            path = os.path.join(path, "meta.json")
+        stat = os.stat(path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self) -> CallColumns:
+        columns = _read_columns(self.file_path, self.workers)
+        if columns.index is None:
+            columns.index = CallIndex()
+        columns.index.warm(columns)  # lookups after a reload don't pay for the build
+        return columns
+
+    def get(self) -> CallColumns:
+        signature = self._file_signature()
+        if self._columns is not None and signature == self._signature:
+            return self._columns
+        with self._lock:
+            if self._columns is None or signature != self._signature:
+                self._columns = self._load()
+                self._signature = signature
+                self.loads += 1
+            return self._columns
+
+    def append(self, calls: Iterable[Dict[str, Any]], loads: Optional[int] = None) -> int:
+        """Add call records, skipping invalid ones like the loaders do; returns how many were added.
+
+        With `loads`, the records are only added if the data is still the
+        load the caller saw (`self.loads`); otherwise `StoreReloadedError`
+        is raised and nothing is added.
+        """
+        self.get()
+        with self._lock:
+            if loads is not None and loads != self.loads:
+                raise StoreReloadedError(f"{self.file_path} was reloaded (load {self.loads}, expected {loads})")
+            base = self._columns
+            builder = ColumnBuilder(base.vocab)
+            for call in calls:
+                if not is_call_record(call):
+                    continue
+                try:
+                    builder.append(call)
+                except (AttributeError, TypeError, ValueError):
+                    continue  # e.g. a non-numeric duration
+            tail = builder.build()
+            if not len(tail):
+                return 0
+            columns = concat_columns(base, tail)
+            columns.index = base.index
+            columns.aggregates = base.aggregates
+            self._columns = columns
+            return len(tail)
+
+
+class SharedCallStore(CallStore):
+    """Call store published once per data version and memory-mapped by every process.
+
+    The first process to find the published generation missing or older than
+    `file_path` loads the file and publishes the next one (see
+    `publish_columns`); the others keep serving the generation they have and
+    switch to the new one once `CURRENT` points at it. Attaching maps the
+    columns and indexes read-only, so memory stays flat as workers are added
+    and a new worker only reads the vocabularies before it can serve.
+
+    Calls added with `append()` stay private to the process until the next
+    generation is published. The first append copies the mapped columns
+    (and transitions, if computed) into that worker's private memory, so a
+    worker that ingests calls no longer shares the generation's pages.
+    """
+
+    def __init__(self, file_path: str = DATA_FILE, workers: Optional[int] = None, shared_dir: Optional[str] = None):
+        super().__init__(file_path, workers)
+        self.shared_dir = shared_dir or shared_dir_for(file_path)
+        self.generation: Optional[int] = None
+        self._current: Optional[Tuple[int, int]] = None
+
+    def _current_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(os.path.join(self.shared_dir, SHARED_CURRENT_FILE))
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns  # os.replace() gives CURRENT a new inode
+
+    def _attach(self) -> None:
+        for attempt in range(SHARED_ATTACH_ATTEMPTS):
+            signature = self._current_signature()
+            current = read_current(self.shared_dir)
+            path = os.path.join(self.shared_dir, current["dir"])
+            try:
+                columns = open_columns(path)
+                break
+            except FileNotFoundError:
+                # Retired by a newer publish: retry against the new CURRENT. If
+                # CURRENT hasn't moved, it names a generation that is gone.
+                if self._current_signature() == signature or attempt == SHARED_ATTACH_ATTEMPTS - 1:
+                    raise FileNotFoundError(
+                        f"Published call store generation {current['generation']} is missing: {path}"
+                    ) from None
+        if columns.index is None:
+            columns.index = CallIndex()
+        columns.index.warm(columns)
+        self._columns = columns
+        self._current = signature
+        self._signature = tuple(current["source"])
+        self.generation = current["generation"]
+        self.loads += 1
+
+    def get(self) -> CallColumns:
+        source = self._file_signature()
+        if self._columns is not None and source == self._signature and self._current_signature() == self._current:
+            return self._columns
+        with self._lock:
+            current = read_current(self.shared_dir)
+            if current is None or tuple(current["source"]) != source:
+                # Only a process without data waits for whoever is publishing
+                publish_columns(self.file_path, self.shared_dir, self.workers, blocking=self._columns is None)
+                current = read_current(self.shared_dir)
+            if current is not None and (self._columns is None or current["generation"] != self.generation):
+                self._attach()
+            return self._columns
+
+
+_stores: Dict[str, CallStore] = {}
+_stores_lock = threading.Lock()
+
+
+def get_call_store(file_path: str = DATA_FILE) -> CallStore:
+    """Process-wide store for `file_path`, created on first use.
+
+    In "shared" `CALL_STORE_MODE` a JSONL file is served through a
+    `SharedCallStore`; a column directory is already memory-mapped.
+    """
+    key = os.path.abspath(file_path)
+    with _stores_lock:
+        store = _stores.get(key)
+        if store is None:
+            if CALL_STORE_MODE not in CALL_STORE_MODES:
+                raise ValueError(f"Unknown call store mode '{CALL_STORE_MODE}', expected one of {', '.join(CALL_STORE_MODES)}")
+            shared = CALL_STORE_MODE == "shared" and not os.path.isdir(file_path)
+            store = _stores[key] = SharedCallStore(file_path) if shared else CallStore(file_path)
+        return store
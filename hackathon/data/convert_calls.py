@@ -0,0 +1,46 @@
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analysis.call_store import column_dir_for, load_columns, publish_columns, shared_dir_for, write_columns
+
+
+def convert_calls(input_file="telecom_calls.jsonl", output_dir=None):
+    """Convert a JSONL call export into memory-mappable column files.
+
+    Numeric fields become fixed-width `.npy` arrays, reason/category/customer/
+    agent/disposition are dictionary-encoded and event timestamps are stored
+    as int64 epoch microseconds alongside the per-call transition durations
+    derived from them. Free-text fields are dropped.
+    """
+    output_dir = output_dir or column_dir_for(input_file)
+    start = time.time()
+    columns = load_columns(input_file)
+    write_columns(columns, output_dir, source_path=input_file)
+    print(f"{len(columns)} records converted to {output_dir} in {time.time() - start:.1f}s")
+
+
+def publish_calls(input_file="telecom_calls.jsonl", force=False):
+    """Publish the next generation for API workers running with CALL_STORE_MODE = "shared".
+
+    Workers already serving switch to it on their next request.
+    """
+    generation = publish_columns(input_file, force=force)
+    print(f"Generation {generation} of {input_file} is current in {shared_dir_for(input_file)}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert telecom_calls.jsonl to the binary column format")
+    parser.add_argument("input_file", nargs="?", default="data/telecom_calls.jsonl")
+    parser.add_argument("output_dir", nargs="?", default=None,
+                        help="Defaults to the input path with a .cols suffix")
+    parser.add_argument("--publish", action="store_true",
+                        help="Publish a shared-store generation (input path with a .shared suffix) instead")
+    parser.add_argument("--force", action="store_true", help="With --publish, republish an unchanged file")
+    args = parser.parse_args()
+    if args.publish:
+        publish_calls(args.input_file, args.force)
+    else:
+        convert_calls(args.input_file, args.output_dir)
@@ -1,19 +1,22 @@
+import hashlib
 import json
 import os
+import threading
 from pathlib import Path
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 from langchain_community.vectorstores import FAISS
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from langchain_core.documents import Document
-
-FEEDBACK_FILE = Path("data/feedback.jsonl")
-
-# Create the embeddings model once (module-level)
-embeddings = HuggingFaceEmbeddings(model_name="BAAI/bge-base-en-v1.5")
+from feedback.feedback_store import SUMMARY_WINDOWS, get_feedback_store
+from rag.models import model_registry
+from rag.retriever import retriever_service
+from rag.storage import load_vector_store, remove_documents, save_vector_store
 
 # Initialize index directory
 index_dir = "data/retriever_db"
 os.makedirs(index_dir, exist_ok=True)
+# Last feedback id the index has been updated with
+WATERMARK_FILE = Path(index_dir) / "feedback_watermark.json"
+_retrain_lock = threading.Lock()
 
 def save_feedback(
     call_id: str,
@@ -24,7 +27,7 @@ def save_feedback(
     new_duration: int,       # New field
     comment: str = ""
 ) -> None:
-    """Save user feedback to a JSONL file."""
+    """Save user feedback to the feedback store."""
     duration_reduction = original_duration - new_duration
     percent_reduction = (duration_reduction / original_duration * 100) if original_duration > 0 else 0
     feedback = {
@@ -39,24 +42,27 @@ def save_feedback(
         "comment": comment
     }
     
-    with FEEDBACK_FILE.open("a") as f:
-        f.write(json.dumps(feedback) + "\n")
+    get_feedback_store().add(feedback)
 
 
 def load_feedback() -> List[Dict]:
-    """Load all feedback entries from JSONL file."""
-    if not FEEDBACK_FILE.exists():
-        return []
-    
-    with FEEDBACK_FILE.open("r") as f:
-        return [json.loads(line) for line in f]
+    """Load all feedback entries in the order they were saved."""
+    return get_feedback_store().all()
+
 
+def summarize_feedback(window: Optional[str] = None) -> Dict[str, any]:
+    """Generate summary statistics with effectiveness metrics.
 
-def summarize_feedback() -> Dict[str, any]:
-    """Generate summary statistics with effectiveness metrics."""
-    feedback_list = load_feedback()
+    `window` ("hour" or "day") limits the summary to recent feedback.
+    Reads running aggregates, so the cost doesn't grow with the feedback.
+    """
+    if window is not None and window not in SUMMARY_WINDOWS:
+        raise ValueError(f"Unknown window '{window}', expected one of {', '.join(SUMMARY_WINDOWS)}")
+    window_seconds = SUMMARY_WINDOWS.get(window)
+    store = get_feedback_store()
+    totals = store.totals(window_seconds)
     
-    if not feedback_list:
+    if not totals["total"]:
         return {
             "total": 0,
             "average_score": 0.0,
@@ -66,18 +72,13 @@ def summarize_feedback() -> Dict[str, any]:
             "low_quality": []
         }
     
-    total = len(feedback_list)
-    avg_score = sum(fb["score"] for fb in feedback_list) / total
-    avg_duration_red = sum(fb["duration_reduction"] for fb in feedback_list) / total
-    avg_percent_red = sum(fb["percent_reduction"] for fb in feedback_list) / total
-    
     return {
-        "total": total,
-        "average_score": round(avg_score, 2),
-        "avg_duration_reduction": round(avg_duration_red, 2),
-        "avg_percent_reduction": round(avg_percent_red, 2),
-        "low_quality": sorted(feedback_list, key=lambda x: x["score"])[:3],
-        "high_quality": sorted(feedback_list, key=lambda x: x["percent_reduction"], reverse=True)[:3]
+        "total": totals["total"],
+        "average_score": round(totals["average_score"], 2),
+        "avg_duration_reduction": round(totals["avg_duration_reduction"], 2),
+        "avg_percent_reduction": round(totals["avg_percent_reduction"], 2),
+        "low_quality": store.lowest_scores(3, window_seconds),
+        "high_quality": store.highest_reductions(3, window_seconds)
     }
 
 
@@ -90,44 +91,115 @@ def get_positive_feedback_contexts(min_score: int = 4, min_reduction: float = 10
             "recommendation": fb["recommendation"],
             "percent_reduction": fb["percent_reduction"]
         }
-        for fb in load_feedback()
-        if fb["score"] >= min_score and fb["percent_reduction"] >= min_reduction
+        for fb in get_feedback_store().positive(min_score, min_reduction)
     ]
 
 
-def retrain_faiss_with_feedback() -> str:
-    """Update FAISS index with positive feedback entries."""
+def read_feedback_since(last_id: int) -> Tuple[List[Dict], int]:
+    """Feedback entries saved after id `last_id`, and the id to resume from."""
+    return get_feedback_store().since(last_id)
 
-    entries = get_positive_feedback_contexts()
-    
-    if not entries:
-        return "No positive feedback to update FAISS index."
-    
-    # Create document objects for FAISS
+
+def feedback_doc_id(entry: Dict) -> str:
+    """Stable id: the same recommendation for the same call always maps to one document."""
+    digest = hashlib.sha1(f"{entry['call_id']}\0{entry['recommendation']}".encode("utf-8")).hexdigest()
+    return f"feedback-{digest[:16]}"
+
+
+def _load_watermark() -> Dict:
+    if not WATERMARK_FILE.exists():
+        return {"last_id": 0, "index_signature": None}
+    with WATERMARK_FILE.open("r") as f:
+        watermark = json.load(f)
+    # Watermarks from the JSONL era hold a byte offset; replaying is safe
+    watermark.setdefault("last_id", 0)
+    return watermark
+
+
+def _save_watermark(last_id: int) -> None:
+    watermark = {"last_id": last_id, "index_signature": retriever_service.index_signature()}
+    tmp_path = WATERMARK_FILE.with_suffix(".tmp")
+    with tmp_path.open("w") as f:
+        json.dump(watermark, f)
+    os.replace(tmp_path, WATERMARK_FILE)
+
+
+def retrain_faiss_with_feedback(min_score: int = 4, min_reduction: float = 10.0) -> str:
+    """Upsert positive feedback added since the last retrain into the FAISS index.
+
+    The watermark records the last feedback id the index has caught up
+    with. It is only trusted while the index on disk is the one this
+    function last wrote; after a full rebuild every entry is replayed, which
+    is safe because documents are keyed by `feedback_doc_id`.
+    """
+    with _retrain_lock:
+        return _retrain(min_score, min_reduction)
+
+
+def _retrain(min_score: int, min_reduction: float) -> str:
+    watermark = _load_watermark()
+    last_id = watermark["last_id"] if watermark["index_signature"] == retriever_service.index_signature() else 0
+    entries, new_last_id = read_feedback_since(last_id)
+
+    # Later entries for the same id win
+    positive = {
+        feedback_doc_id(fb): fb
+        for fb in entries
+        if fb["score"] >= min_score and fb["percent_reduction"] >= min_reduction
+    }
+    if not positive:
+        if new_last_id != last_id:
+            _save_watermark(new_last_id)
+        return "No new positive feedback to update FAISS index."
+
+    ids = list(positive)
     texts = [
         Document(
             page_content=(
                 f"Context: {entry['context']}\n"
                 f"Recommendation: {entry['recommendation']}"
-            )
+            ),
+            metadata={"source": "feedback", "call_id": entry["call_id"]}
         )
-        for entry in entries
+        for entry in positive.values()
     ]
-    
+
+    # Shared model; document vectors are cached so a retrain only embeds new feedback
+    embeddings = model_registry.document_embeddings()
     try:
-        db = FAISS.load_local(
-            index_dir,
-            embeddings,
-            allow_dangerous_deserialization=True
-        )
+        db = load_vector_store(index_dir, embeddings, memory_map=False)
     except Exception as e:
         print(f"Creating new index because: {str(e)}")
-        db = FAISS.from_documents(texts, embeddings)
-        db.save_local(index_dir)
+        db = FAISS.from_documents(texts, embeddings, ids=ids)
+        save_vector_store(db, index_dir)
+        retriever_service.reload()
+        _save_watermark(new_last_id)
         return f"Created new FAISS index with {len(texts)} entries"
-    
-    # Add new documents to existing index
-    db.add_documents(texts)
-    db.save_local(index_dir)
-    
-    return f"Updated FAISS index with {len(texts)} positive feedback entries."
\ No newline at end of file
+
+    existing = set(db.index_to_docstore_id.values())
+    changed = []
+    unchanged = set()
+    for doc_id, doc in zip(ids, texts):
+        if doc_id not in existing:
+            continue
+        current = db.docstore.search(doc_id)
+        if current.page_content == doc.page_content and current.metadata == doc.metadata:
+            unchanged.add(doc_id)  # replayed entry: nothing to re-embed
+        else:
+            changed.append(doc_id)
+    added = [(doc_id, doc) for doc_id, doc in zip(ids, texts) if doc_id not in unchanged]
+    if not added:
+        _save_watermark(new_last_id)
+        return f"FAISS index already has all {len(unchanged)} positive feedback entries."
+
+    db = remove_documents(db, changed)
+    db.add_documents([doc for _, doc in added], ids=[doc_id for doc_id, _ in added])
+    save_vector_store(db, index_dir)
+    # Serving retriever keeps answering from the old index until the swap
+    retriever_service.reload()
+    _save_watermark(new_last_id)
+
+    return (
+        f"Updated FAISS index with {len(added) - len(changed)} new and "
+        f"{len(changed)} updated positive feedback entries."
+    )
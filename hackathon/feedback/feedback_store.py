@@ -0,0 +1,303 @@
+import json
+import sqlite3
+import threading
+import time
+from collections import defaultdict
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from rag.batching import MicroBatcher
+
+FEEDBACK_DB = Path("data/feedback.db")
+LEGACY_FEEDBACK_FILE = Path("data/feedback.jsonl")
+
+# Concurrent saves are committed together in one transaction
+WRITE_MAX_WAIT_MS = 10.0
+WRITE_MAX_BATCH = 256
+
+# Columns of a feedback record, in the order the JSONL file used
+FEEDBACK_COLUMNS = (
+    "call_id", "context", "recommendation", "score", "original_duration",
+    "new_duration", "duration_reduction", "percent_reduction", "comment"
+)
+INSERT_COLUMNS = FEEDBACK_COLUMNS + ("created_at",)
+
+# Running sums per time bucket; windowed summaries add up the buckets they cover
+ROLLUP_BUCKET_SECONDS = 60
+ALL_TIME_BUCKET = -1
+SUMMARY_WINDOWS = {"hour": 3600, "day": 86400}
+ROLLUP_SUMS = ("score", "duration_reduction", "percent_reduction", "original_duration", "new_duration")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedback (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    call_id TEXT NOT NULL,
+    context TEXT NOT NULL,
+    recommendation TEXT NOT NULL,
+    score INTEGER NOT NULL,
+    original_duration REAL NOT NULL,
+    new_duration REAL NOT NULL,
+    duration_reduction REAL NOT NULL,
+    percent_reduction REAL NOT NULL,
+    comment TEXT NOT NULL DEFAULT '',
+    created_at REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_feedback_score ON feedback (score);
+CREATE INDEX IF NOT EXISTS idx_feedback_percent_reduction ON feedback (percent_reduction);
+CREATE INDEX IF NOT EXISTS idx_feedback_call_id ON feedback (call_id);
+CREATE TABLE IF NOT EXISTS store_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS feedback_rollups (
+    bucket INTEGER PRIMARY KEY,
+    count INTEGER NOT NULL,
+    score_sum REAL NOT NULL,
+    duration_reduction_sum REAL NOT NULL,
+    percent_reduction_sum REAL NOT NULL,
+    original_duration_sum REAL NOT NULL,
+    new_duration_sum REAL NOT NULL
+);
+"""
+
+_SELECT = f"SELECT {', '.join(FEEDBACK_COLUMNS)} FROM feedback"
+_INSERT = (
+    f"INSERT INTO feedback ({', '.join(INSERT_COLUMNS)}) "
+    f"VALUES ({', '.join('?' for _ in INSERT_COLUMNS)})"
+)
+_SUM_COLUMNS = ", ".join(f"{name}_sum" for name in ROLLUP_SUMS)
+_UPSERT_ROLLUP = (
+    f"INSERT INTO feedback_rollups (bucket, count, {_SUM_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+    f"ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count, "
+    + ", ".join(f"{name}_sum = {name}_sum + excluded.{name}_sum" for name in ROLLUP_SUMS)
+)
+
+
+class FeedbackStore:
+    """SQLite (WAL mode) storage for recommendation feedback.
+
+    Readers never block the writer and vice versa, so many API workers can
+    save and query at once. Saves from concurrent requests are grouped into
+    one transaction by a `MicroBatcher`; each call still returns only once
+    its row is committed. Every thread gets its own connection.
+
+    Every insert also updates running sums (all-time and per minute) in the
+    same transaction, so summaries never scan the feedback table.
+    """
+
+    def __init__(self, db_path: Path = FEEDBACK_DB, legacy_file: Optional[Path] = LEGACY_FEEDBACK_FILE):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            self._migrate(conn)
+        self._writer = MicroBatcher(self._insert_batch, WRITE_MAX_WAIT_MS, WRITE_MAX_BATCH, name="feedback-writer")
+        if legacy_file is not None:
+            self.import_jsonl_once(legacy_file)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")  # durable at checkpoints; safe with WAL
+            self._local.conn = conn
+        return conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        columns = {row["name"] for row in conn.execute("PRAGMA table_info(feedback)")}
+        if "created_at" not in columns:
+            conn.execute("ALTER TABLE feedback ADD COLUMN created_at REAL NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_feedback_created_at ON feedback (created_at)")
+        has_rollups = conn.execute("SELECT 1 FROM feedback_rollups WHERE bucket = ?", (ALL_TIME_BUCKET,)).fetchone()
+        if not has_rollups:
+            self._rebuild_rollups(conn)
+
+    @staticmethod
+    def _rebuild_rollups(conn: sqlite3.Connection) -> None:
+        """Recompute every rollup from the feedback table (databases created before rollups existed)."""
+        sums = ", ".join(f"SUM({name})" for name in ROLLUP_SUMS)
+        conn.execute("DELETE FROM feedback_rollups")
+        conn.execute(
+            f"INSERT INTO feedback_rollups (bucket, count, {_SUM_COLUMNS}) "
+            f"SELECT CAST(created_at / {ROLLUP_BUCKET_SECONDS} AS INTEGER), COUNT(*), {sums} "
+            f"FROM feedback GROUP BY 1"
+        )
+        conn.execute(
+            f"INSERT INTO feedback_rollups (bucket, count, {_SUM_COLUMNS}) "
+            f"SELECT ?, COUNT(*), {', '.join(f'COALESCE(SUM({name}), 0)' for name in ROLLUP_SUMS)} FROM feedback",
+            (ALL_TIME_BUCKET,)
+        )
+
+    @staticmethod
+    def _values(record: Dict[str, Any]) -> Tuple:
+        # FeedbackItem.comment is optional and arrives as None
+        values = tuple(record.get(column) or "" if column == "comment" else record[column] for column in FEEDBACK_COLUMNS)
+        missing = [column for column, value in zip(FEEDBACK_COLUMNS, values) if value is None]
+        if missing:
+            raise ValueError(f"Feedback record is missing {', '.join(missing)}")
+        created_at = record.get("created_at")
+        if created_at is None:  # 0 is a real value: imported rows without a timestamp
+            created_at = time.time()
+        return values + (created_at,)
+
+    @staticmethod
+    def _update_rollups(conn: sqlite3.Connection, rows: List[Tuple]) -> None:
+        positions = [INSERT_COLUMNS.index(name) for name in ROLLUP_SUMS]
+        created_at = INSERT_COLUMNS.index("created_at")
+        totals: Dict[int, List[float]] = defaultdict(lambda: [0] * (len(ROLLUP_SUMS) + 1))
+        for row in rows:
+            for bucket in (ALL_TIME_BUCKET, int(row[created_at] // ROLLUP_BUCKET_SECONDS)):
+                acc = totals[bucket]
+                acc[0] += 1
+                for i, position in enumerate(positions, 1):
+                    acc[i] += row[position]
+        conn.executemany(_UPSERT_ROLLUP, [(bucket, *acc) for bucket, acc in totals.items()])
+
+    def _insert_rows(self, conn: sqlite3.Connection, rows: List[Tuple]) -> List[int]:
+        ids = [conn.execute(_INSERT, row).lastrowid for row in rows]
+        self._update_rollups(conn, rows)
+        return ids
+
+    def _insert_batch(self, rows: List[Tuple]) -> List[int]:
+        conn = self._connect()
+        with conn:
+            return self._insert_rows(conn, rows)
+
+    def add(self, record: Dict[str, Any]) -> int:
+        """Insert one record; returns its id once committed."""
+        # Build the row here so a malformed record fails its caller, not the whole batch
+        return self._writer.submit(self._values(record))
+
+    def add_many(self, records: List[Dict[str, Any]]) -> int:
+        """Insert records in a single transaction (bulk loads)."""
+        conn = self._connect()
+        with conn:
+            self._insert_rows(conn, [self._values(record) for record in records])
+        return len(records)
+
+    def import_jsonl_once(self, path: Path) -> int:
+        """Load a legacy feedback.jsonl the first time this database sees it."""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        marker = f"imported:{path.resolve()}"
+        conn = self._connect()
+        # IMMEDIATE takes the write lock up front, so two processes can't both import
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if conn.execute("SELECT 1 FROM store_meta WHERE key = ?", (marker,)).fetchone():
+                conn.rollback()
+                return 0
+            with path.open("r") as f:
+                records = [json.loads(line) for line in f if line.strip()]
+            # No timestamps in the file: rows land in the all-time totals only
+            self._insert_rows(conn, [self._values({**record, "created_at": 0}) for record in records])
+            conn.execute("INSERT INTO store_meta (key, value) VALUES (?, ?)", (marker, str(len(records))))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"Imported {len(records)} feedback entries from {path}")
+        return len(records)
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        return [dict(row) for row in self._connect().execute(sql, params)]
+
+    def all(self) -> List[Dict[str, Any]]:
+        return self._query(f"{_SELECT} ORDER BY id")
+
+    def count(self) -> int:
+        return self._connect().execute("SELECT COUNT(*) FROM feedback").fetchone()[0]
+
+    def since(self, last_id: int) -> Tuple[List[Dict[str, Any]], int]:
+        """Records with id > `last_id` in insertion order, and the id to resume from."""
+        rows = self._connect().execute(f"SELECT id, {', '.join(FEEDBACK_COLUMNS)} FROM feedback WHERE id > ? ORDER BY id", (last_id,)).fetchall()
+        if not rows:
+            return [], last_id
+        return [{column: row[column] for column in FEEDBACK_COLUMNS} for row in rows], rows[-1]["id"]
+
+    def positive(self, min_score: int, min_reduction: float) -> List[Dict[str, Any]]:
+        return self._query(
+            f"{_SELECT} WHERE score >= ? AND percent_reduction >= ? ORDER BY id",
+            (min_score, min_reduction)
+        )
+
+    def by_call_id(self, call_id: str) -> List[Dict[str, Any]]:
+        return self._query(f"{_SELECT} WHERE call_id = ? ORDER BY id", (call_id,))
+
+    @staticmethod
+    def _window_start(window_seconds: Optional[float]) -> Optional[float]:
+        return None if window_seconds is None else time.time() - window_seconds
+
+    def totals(self, window_seconds: Optional[float] = None) -> Dict[str, Any]:
+        """Count, averages and duration totals from the rollups.
+
+        All-time totals read one row; a window adds up its per-minute
+        buckets, so its start is rounded down to the minute.
+        """
+        sums = ", ".join(f"COALESCE(SUM({name}_sum), 0)" for name in ROLLUP_SUMS)
+        start = self._window_start(window_seconds)
+        if start is None:
+            where, params = "bucket = ?", (ALL_TIME_BUCKET,)
+        else:
+            where, params = "bucket >= ?", (int(start // ROLLUP_BUCKET_SECONDS),)
+        row = self._connect().execute(
+            f"SELECT COALESCE(SUM(count), 0), {sums} FROM feedback_rollups WHERE {where}", params
+        ).fetchone()
+        total, score, duration_reduction, percent_reduction, original, new = row
+        return {
+            "total": total,
+            "average_score": score / total if total else None,
+            "avg_duration_reduction": duration_reduction / total if total else None,
+            "avg_percent_reduction": percent_reduction / total if total else None,
+            "total_original": original,
+            "total_new": new
+        }
+
+    def lowest_scores(self, n: int, window_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        # Index-ordered LIMIT reads n rows, not the table; id breaks ties in insertion order
+        start = self._window_start(window_seconds)
+        if start is None:
+            return self._query(f"{_SELECT} ORDER BY score, id LIMIT ?", (n,))
+        return self._query(f"{_SELECT} WHERE created_at >= ? ORDER BY score, id LIMIT ?", (start, n))
+
+    def highest_reductions(self, n: int, window_seconds: Optional[float] = None) -> List[Dict[str, Any]]:
+        start = self._window_start(window_seconds)
+        if start is None:
+            return self._query(f"{_SELECT} ORDER BY percent_reduction DESC, id LIMIT ?", (n,))
+        return self._query(
+            f"{_SELECT} WHERE created_at >= ? ORDER BY percent_reduction DESC, id LIMIT ?", (start, n)
+        )
+
+    def aggregate_by(self, column: str) -> Iterator[Tuple[str, int, float, float]]:
+        """Stream (value, count, score sum, duration reduction sum) per distinct `column` value.
+
+        Groups come out in order of first appearance; the caller folds them
+        into coarser keys without holding per-row data.
+        """
+        if column not in ("recommendation", "call_id"):
+            raise ValueError(f"Cannot aggregate feedback by '{column}'")
+        return self._connect().execute(
+            f"SELECT {column}, COUNT(*), SUM(score), SUM(duration_reduction) "
+            f"FROM feedback GROUP BY {column} ORDER BY MIN(id)"
+        )
+
+    def last_id(self) -> int:
+        """Changes whenever feedback is added (reads the rowid b-tree's last entry)."""
+        return self._connect().execute("SELECT COALESCE(MAX(id), 0) FROM feedback").fetchone()[0]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": str(self.db_path), "entries": self.count(), "writer": self._writer.stats()}
+
+
+_store: Optional[FeedbackStore] = None
+_store_lock = threading.Lock()
+
+
+def get_feedback_store() -> FeedbackStore:
+    """Process-wide store, created (and the legacy JSONL imported) on first use."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = FeedbackStore()
+    return _store
@@ -1,36 +1,106 @@
+import asyncio
 from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+import json
+from fastapi import Body, FastAPI, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import Dict, Optional, List, Any, DefaultDict
+from typing import Dict, Optional, List, Any
 from analysis.aht_analysis import (
-    load_calls,
     calculate_aht,
     get_long_calls,
-    top_contact_reasons,
     get_call_event_bottlenecks,
-    customer_level_insights
+    bottleneck_summary,
+    transition_statistics,
+    TRANSITION_GROUPS,
+    customer_level_insights,
+    call_aggregates,
+    analyze_recommendation_effectiveness
 )
-from rag.recommendation import get_recommendations, llm as recommendation_llm
+from analysis.call_store import get_call_store
+from analysis.call_ingest import get_call_tailer
+from rag.recommendation import (
+    get_recommendations_async,
+    stream_recommendations_async,
+    recommendation_cache
+)
+from rag.models import model_registry
+from rag.scheduler import (
+    inference_scheduler,
+    SchedulerError,
+    QueueFullError
+)
+from rag.retriever import retriever_service
 from analysis.simulation import simulate_aht_reduction
 from feedback.feedback_loop import (
     save_feedback,
     summarize_feedback,
     retrain_faiss_with_feedback
 )
+from feedback.feedback_store import get_feedback_store
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Initialize model before serving requests"""
-    print("Warming up LLM...")
-    # Warm up the model with a short prompt
-    recommendation_llm.invoke("Telecom customer service assistant warm up")
+    print("Loading retriever index...")
+    retriever_service.load()
+    recommendation_cache.load(tag=retriever_service.index_signature())
+    print("Loading call data...")
+    try:
+        get_call_store().get()  # columns, transitions and the call_id/customer/reason index
+    except FileNotFoundError as e:
+        print(f"Call data not loaded yet: {e}")
+    call_tailer = get_call_tailer()
+    if call_tailer is not None:
+        print(f"Tailing {call_tailer.file_path} for new calls...")
+        call_tailer.start()
+    print("Opening feedback store...")
+    get_feedback_store()  # imports a legacy feedback.jsonl on first run
+    print("Starting LLM workers...")
+    # Each worker loads the model and caches the system prompt's KV state
+    await asyncio.to_thread(model_registry.warm_up)
+    await inference_scheduler.start(concurrency=model_registry.llm().size)
     print("Model ready to serve requests")
     yield  # App runs here
     # Optional cleanup at shutdown
     print("Shutting down model")
+    await inference_scheduler.stop()
+    model_registry.shutdown()
+    if call_tailer is not None:
+        call_tailer.stop()
+    recommendation_cache.save(tag=retriever_service.index_signature())
 
 app = FastAPI(title="Telecom Intelligence RAG API", lifespan=lifespan)
 
+
+def scheduler_http_error(e: SchedulerError) -> HTTPException:
+    """Map scheduler backpressure to the status a client should retry on"""
+    if isinstance(e, QueueFullError):
+        return HTTPException(status_code=429, detail=f"Recommendation queue is full: {e}", headers={"Retry-After": "5"})
+    return HTTPException(status_code=503, detail=f"Recommendation unavailable: {e}", headers={"Retry-After": "5"})
+
+
+async def recommend(query: str) -> str:
+    """Queue an LLM recommendation, turning scheduler backpressure into HTTP errors"""
+    try:
+        return await get_recommendations_async(query)
+    except SchedulerError as e:
+        raise scheduler_http_error(e)
+
+
+def sse_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+# Call ids sent per document in the SSE context event; a grouped document keeps up to 1000
+STREAM_CONTEXT_CALL_IDS = 5
+
+
+def context_metadata(metadata: Dict[str, Any]) -> Dict[str, Any]:
+    """Document metadata for the SSE context event, without the bulk of a group's call ids"""
+    if "call_ids" not in metadata:
+        return metadata
+    return {**metadata, "call_ids": metadata["call_ids"][:STREAM_CONTEXT_CALL_IDS]}
+
 class CallData(BaseModel):
     notes: str
     reason: str
@@ -50,10 +120,10 @@ class FeedbackItem(BaseModel):
 
 
 @app.post("/recommendations", response_model=Dict[str, Any])
-def get_recommendations_endpoint(call: CallData):
+async def get_recommendations_endpoint(call: CallData):
     """Generate recommendations based on call notes and reason"""
     query = f"{call.notes}\nReason: {call.reason}"
-    result = get_recommendations(query)
+    result = await recommend(query)
     call_dict = {
         "events": call.events,
         "call_id": call.call_id,
@@ -71,52 +141,146 @@ def get_recommendations_endpoint(call: CallData):
         "bottleneck": bottleneck
     }
 
+'''Streams the same recommendations as server-sent events: a `context` event with the retrieved
+documents and bottleneck analysis, one `token` event per generated chunk, then `done` (or `error`)'''
+@app.post("/recommendations/stream")
+async def stream_recommendations_endpoint(call: CallData):
+    """Stream recommendations token by token"""
+    query = f"{call.notes}\nReason: {call.reason}"
+    try:
+        bottleneck = get_call_event_bottlenecks({"events": call.events, "call_id": call.call_id})
+    except Exception as e:
+        bottleneck = {"error": str(e)}
+    try:
+        prepared = await stream_recommendations_async(query)
+    except SchedulerError as e:
+        raise scheduler_http_error(e)
+
+    async def events():
+        yield sse_event("context", {
+            "call_id": call.call_id,
+            "cached": prepared["cached"] is not None,
+            "documents": [
+                {"rank": rank, "content": doc.page_content, "metadata": context_metadata(doc.metadata)}
+                for rank, doc in enumerate(prepared.get("docs", []), 1)
+            ],
+            "bottleneck": bottleneck
+        })
+        parts = []
+        try:
+            async for token in prepared["tokens"]:
+                parts.append(token)
+                yield sse_event("token", {"text": token})
+        except SchedulerError as e:
+            yield sse_event("error", {"detail": str(e)})
+            return
+        yield sse_event("done", {"recommendations": "".join(parts).strip()})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+'''Bulk-ingest calls shaped like telecom_calls.jsonl lines. Records are validated like load_calls()
+(a JSON object with a call_id); invalid ones are skipped. Ingested calls are kept in memory by this
+process until the call data is reloaded from disk'''
+@app.post("/calls", response_model=Dict[str, Any])
+def ingest_calls(calls: List[Any] = Body(..., description="Call records")):
+    """Append calls to the analytics store and its running aggregates"""
+    store = get_call_store()
+    try:
+        added = store.append(calls)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=503, detail=f"Call data not loaded: {e}")
+    return {
+        "received": len(calls),
+        "added": added,
+        "skipped": len(calls) - added,
+        "total_calls": len(store.get())
+    }
+
+
+@app.get("/calls/tailer", response_model=Dict[str, Any])
+def call_tailer_stats():
+    """Get the JSONL tailer's position and how many calls it has added"""
+    call_tailer = get_call_tailer()
+    if call_tailer is None:
+        raise HTTPException(status_code=404, detail="Call tailing is disabled (CALL_TAIL_FILE is not set)")
+    return call_tailer.stats()
+
+
 '''Provides a comprehensive summary of Average Handling Time (AHT) metrics across all calls'''
 @app.get("/aht/summary", response_model=Dict[str, Any])
 def aht_summary(cost_per_call: float = Query(8.0, gt=0, description="Operational cost per call in dollars")):
     """Get AHT summary statistics"""
-    calls = load_calls()
-    aht = calculate_aht(calls)
-    long_calls = get_long_calls(calls)
-    top_reasons = top_contact_reasons(long_calls)
+    # Running totals, only extended by calls ingested since the last request
+    summary = call_aggregates(get_call_store().get()).summary()
+    long_calls_count = summary["long_calls_count"]
+    total_calls = summary["total_calls"]
 
-    long_call_duration = sum(call['duration'] for call in long_calls)
+    long_call_duration = summary["long_calls_duration"]
     potential_savings = (long_call_duration * 0.5) / 3600 * (cost_per_call / 3600) * 4
     
     return {
-        "average_aht": round(aht, 2),
-        "long_calls_count": len(long_calls),
-        "long_calls_percentage": round(len(long_calls) / len(calls) * 100, 2),
-        "top_contact_reasons": top_reasons,
+        "average_aht": round(summary["average_aht"], 2),
+        "long_calls_count": long_calls_count,
+        "long_calls_percentage": round(long_calls_count / total_calls * 100, 2) if total_calls else 0.0,
+        "top_contact_reasons": summary["top_contact_reasons"],
         "estimated_annual_savings": round(potential_savings, 2),
         "cost_per_call": cost_per_call,
         "notes": "Savings assume 50% reduction in long call durations"
     }
 
-'''For contact-specific insights , sample : GET /aht/reason/Billing%20Inquiry'''
-@app.get("/aht/reason/{contact_reason}")
-async def get_reason_insights(contact_reason: str):
-    calls = load_calls()
-    reason_calls = [c for c in calls if c['reason'].lower() == contact_reason.lower()]
-    
-    if not reason_calls:
-        raise HTTPException(404, detail="Contact reason not found")
+@app.get("/recommendations/queue", response_model=Dict[str, Any])
+def recommendation_queue_stats():
+    """Get inference scheduler queue depth and outcome counters, plus per-worker LLM throughput"""
+    return {**inference_scheduler.stats(), "llm_pool": model_registry.llm().stats()}
+
+
+@app.get("/models", response_model=Dict[str, Any])
+def model_stats():
+    """Get which shared models are loaded and how long each took to load"""
+    return model_registry.stats()
+
+
+@app.get("/retriever/batching", response_model=Dict[str, Any])
+def retriever_batching_stats():
+    """Get batch-size and latency histograms for query embedding and search"""
+    return retriever_service.batching_stats()
+
+
+@app.get("/retriever/index", response_model=Dict[str, Any])
+def retriever_index_info():
+    """Get the index type, its build parameters and the search parameters in effect"""
+    return retriever_service.index_info()
+
+
+@app.put("/retriever/search-params", response_model=Dict[str, Any])
+def update_search_params(
+    nprobe: Optional[int] = Query(None, gt=0, description="IVF lists probed per query"),
+    ef_search: Optional[int] = Query(None, gt=0, description="HNSW candidate list size per query")
+):
+    """Trade recall for latency on the loaded index without rebuilding it"""
+    return retriever_service.set_search_params(nprobe=nprobe, ef_search=ef_search)
+
+
+@app.get("/recommendations/cache", response_model=Dict[str, Any])
+def recommendation_cache_stats():
+    """Get semantic recommendation cache hit/miss counters"""
+    return recommendation_cache.stats()
+
+
+def reason_insights(contact_reason: str) -> Optional[Dict[str, Any]]:
+    """Store lookups and analysis for /aht/reason; blocking, so handlers run it in a thread"""
+    calls = get_call_store().get()
+    reason_calls = calls.take(calls.reason_rows(contact_reason))
     
-    # Get bottlenecks specific to this reason
-    bottlenecks = DefaultDict(list)
-    for call in reason_calls:
-        if 'events' in call:
-            bottle = get_call_event_bottlenecks(call)
-            if bottle and "longest_segment" in bottle:
-                segment = bottle["longest_segment"]
-                key = f"{segment['from']} → {segment['to']}"
-                bottlenecks[key].append(segment['duration'])
+    if not len(reason_calls):
+        return None
     
-    # Average bottleneck durations
-    avg_bottlenecks = [{
-        "transition": k,
-        "avg_duration": sum(v)/len(v)
-    } for k, v in bottlenecks.items()]
+    # Average longest-segment duration per transition, from precomputed timings
+    avg_bottlenecks = bottleneck_summary(reason_calls)
     
     # Get customer insights
     cust_insights = customer_level_insights(reason_calls)
@@ -132,48 +296,88 @@ async def get_reason_insights(contact_reason: str):
         "average_duration": calculate_aht(reason_calls),
         "long_calls": len(get_long_calls(reason_calls)),
         "customer_insights": {"top_customers": top_customers},
-        "bottlenecks": avg_bottlenecks,
-        "recommendations": get_recommendations(f"Reduce AHT for {contact_reason}")
+        "bottlenecks": avg_bottlenecks
+    }
+
+
+'''For contact-specific insights , sample : GET /aht/reason/Billing%20Inquiry'''
+@app.get("/aht/reason/{contact_reason}")
+async def get_reason_insights(contact_reason: str):
+    # A reload or index build must not stall the event loop (and every stream on it)
+    insights = await asyncio.to_thread(reason_insights, contact_reason)
+    
+    if insights is None:
+        raise HTTPException(404, detail="Contact reason not found")
+    
+    insights["recommendations"] = await recommend(f"Reduce AHT for {contact_reason}")
+    return insights
+
+
+'''Event transition timings across all calls, sample : GET /aht/transitions?group_by=category'''
+@app.get("/aht/transitions", response_model=Dict[str, Any])
+def aht_transitions(
+    group_by: Optional[str] = Query(None, description="Group by reason, category, agent or disposition")
+):
+    """Get count, mean, percentiles and max for every event transition"""
+    if group_by is not None and group_by not in TRANSITION_GROUPS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by must be one of: {', '.join(TRANSITION_GROUPS)}"
+        )
+    return transition_statistics(get_call_store().get(), group_by)
+
+
+def call_details(call_id: str) -> Optional[Dict[str, Any]]:
+    """Store lookup and bottleneck analysis for /aht/details; blocking, so handlers run it in a thread"""
+    calls = get_call_store().get()
+    row = calls.find_call(call_id)
+    call = calls.row(row) if row is not None else None
+
+    if not call:
+        return None
+
+    # Get call details
+    details = {
+        "call_id": call.get("call_id", "N/A"),
+        "customer_id": call.get("customer", {}).get("customer_id", "N/A"),
+        "reason": call.get("reason", "Unknown"),
+        "duration": call.get("duration", 0),
+        "agent_id": call.get("agent", {}).get("agent_id", "N/A"),
+        "timestamp": call.get("timestamp", "Not recorded")
     }
 
+    # Get bottlenecks if events exist
+    if "events" in call and isinstance(call["events"], list):
+        try:
+            details["bottlenecks"] = get_call_event_bottlenecks(call)
+        except Exception as e:
+            details["bottlenecks"] = f"Analysis error: {str(e)}"
+    else:
+        details["bottlenecks"] = "No event data available"
+    return details
+
 
 @app.get("/aht/details/{call_id}", response_model=Dict[str, Any])
-def aht_details(call_id: str):
+async def aht_details(call_id: str):
     try:
         """Get AHT details for a specific call"""
-        calls = load_calls()
-        call = next((c for c in calls if str(c.get("call_id", "")) == call_id), None)
+        details = await asyncio.to_thread(call_details, call_id)
     
-        if not call:
+        if not details:
             raise HTTPException(status_code=404, detail="Call not found")
     
-         # Get call details
-        details = {
-            "call_id": call.get("call_id", "N/A"),
-            "customer_id": call.get("customer", {}).get("customer_id", "N/A"),
-            "reason": call.get("reason", "Unknown"),
-            "duration": call.get("duration", 0),
-            "agent_id": call.get("agent", {}).get("agent_id", "N/A"),
-            "timestamp": call.get("timestamp", "Not recorded")
-        }
-
-     # Get bottlenecks if events exist
-        if "events" in call and isinstance(call["events"], list):
-            try:
-                details["bottlenecks"] = get_call_event_bottlenecks(call)
-            except Exception as e:
-                details["bottlenecks"] = f"Analysis error: {str(e)}"
-        else:
-            details["bottlenecks"] = "No event data available"
-    
         # Get AI recommendations
         query = f"Call {call_id}: {details['reason']} (Duration: {details['duration']}s)"
         try:
-            details["recommendations"] = get_recommendations(query)
+            details["recommendations"] = await recommend(query)
+        except HTTPException:
+            raise  # backpressure: let the client retry
         except Exception as e:
             details["recommendations"] = [f"Could not generate recommendations: {str(e)}"]
             
         return details
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -184,13 +388,12 @@ def aht_details(call_id: str):
 @app.get("/customer/insights/{customer_id}", response_model=Dict[str, Any])
 def customer_insights(customer_id: str):
     """Get insights for a specific customer"""
-    calls = load_calls()
-    insights = customer_level_insights(calls)
+    insights = call_aggregates(get_call_store().get()).customer(customer_id)
     
-    if customer_id not in insights:
+    if insights is None:
         raise HTTPException(status_code=404, detail="Customer not found")
     
-    return insights[customer_id]
+    return insights
 
 
 @app.post("/feedback/save", response_model=Dict[str, str])
@@ -216,9 +419,39 @@ def save_feedback_endpoint(feedback: FeedbackItem):
 
 
 @app.get("/feedback/summary", response_model=Dict[str, Any])
-def get_feedback_summary():
+def get_feedback_summary(
+    window: Optional[str] = Query(None, description="Only feedback from the last 'hour' or 'day'")
+):
     """Get feedback summary"""
-    return summarize_feedback()
+    try:
+        return summarize_feedback(window)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.get("/feedback/effectiveness", response_model=Dict[str, Any])
+def get_feedback_effectiveness(
+    group_by: str = Query("recommendation", description="Group by recommendation, reason or agent"),
+    offset: int = Query(0, ge=0, description="Groups to skip"),
+    limit: int = Query(20, ge=1, le=200, description="Groups per page")
+):
+    """Recommendation effectiveness per group, largest groups first"""
+    try:
+        analysis = analyze_recommendation_effectiveness(group_by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    groups = analysis.get("effectiveness_by_recommendation", {})
+    ranked = sorted(groups.items(), key=lambda item: (-item[1]["count"], item[0]))
+    return {
+        "group_by": group_by,
+        "total_calls": analysis.get("total_calls", 0),
+        "total_duration_reduction": analysis.get("total_duration_reduction", 0),
+        "avg_duration_reduction": analysis.get("avg_duration_reduction", 0),
+        "total_groups": len(ranked),
+        "offset": offset,
+        "limit": limit,
+        "groups": [{"key": key, **data} for key, data in ranked[offset:offset + limit]]
+    }
 
 
 @app.post("/feedback/retrain", response_model=Dict[str, str])
@@ -0,0 +1,148 @@
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import numpy as np
+
+
+class SemanticCache:
+    """Response cache keyed on query embeddings.
+
+    A lookup hits when a live entry's embedding has cosine similarity of at
+    least `threshold` with the query embedding, so templated queries that
+    differ only slightly share one response. Entries expire after
+    `ttl_seconds` and the least recently used entry is evicted once
+    `max_entries` is reached.
+    """
+
+    def __init__(
+        self,
+        threshold: float = 0.95,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 3600,
+        persist_path: Optional[str] = None
+    ):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.persist_path = persist_path
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None  # (max_entries, dim), unit length
+        self._entries: "OrderedDict[int, Dict[str, Any]]" = OrderedDict()  # slot -> entry, LRU order
+        self._free_slots = list(range(max_entries - 1, -1, -1))
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.generation = 0  # bumped by clear(), so answers computed before it can be turned away
+
+    @staticmethod
+    def _normalize(vector) -> np.ndarray:
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def _expired(self, entry: Dict[str, Any], now: float) -> bool:
+        return self.ttl_seconds is not None and now - entry["created_at"] > self.ttl_seconds
+
+    def _release(self, slot: int) -> None:
+        del self._entries[slot]
+        self._free_slots.append(slot)
+
+    def get(self, vector) -> Optional[str]:
+        """Cached response for the closest query above the threshold, if any."""
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            for slot in [s for s, e in self._entries.items() if self._expired(e, now)]:
+                self._release(slot)
+                self.evictions += 1
+            if not self._entries:
+                self.misses += 1
+                return None
+
+            slots = np.fromiter(self._entries.keys(), dtype=np.int64, count=len(self._entries))
+            similarities = self._vectors[slots] @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            slot = int(slots[best])
+            self._entries.move_to_end(slot)
+            self.hits += 1
+            return self._entries[slot]["response"]
+
+    def put(
+        self, query: str, vector, response: str, created_at: Optional[float] = None, generation: Optional[int] = None
+    ) -> None:
+        """Add an entry; with `generation`, only if the cache has not been cleared since it was read."""
+        vector = self._normalize(vector)
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            if self._vectors is None or self._vectors.shape[1] != len(vector):
+                self._vectors = np.zeros((self.max_entries, len(vector)), dtype=np.float32)
+            if not self._free_slots:
+                oldest = next(iter(self._entries))
+                self._release(oldest)
+                self.evictions += 1
+            slot = self._free_slots.pop()
+            self._vectors[slot] = vector
+            self._entries[slot] = {
+                "query": query,
+                "response": response,
+                "created_at": created_at if created_at is not None else time.time()
+            }
+
+    def clear(self) -> None:
+        """Drop every entry, e.g. after the retriever index changed."""
+        with self._lock:
+            self._entries.clear()
+            self._free_slots = list(range(self.max_entries - 1, -1, -1))
+            self.generation += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds
+        }
+
+    def save(self, tag: str = "") -> None:
+        """Write entries to `persist_path` (.npy vectors + .json metadata)."""
+        if not self.persist_path:
+            return
+        with self._lock:
+            slots = list(self._entries)
+            vectors = self._vectors[slots] if slots else np.zeros((0, 0), dtype=np.float32)
+            meta = {"tag": tag, "entries": [self._entries[s] for s in slots]}
+        np.save(f"{self.persist_path}.npy", vectors)
+        tmp_path = f"{self.persist_path}.json.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, f"{self.persist_path}.json")
+
+    def load(self, tag: str = "") -> int:
+        """Restore entries saved with the same `tag`; returns how many were loaded."""
+        if not self.persist_path or not os.path.exists(f"{self.persist_path}.json"):
+            return 0
+        with open(f"{self.persist_path}.json", "r") as f:
+            meta = json.load(f)
+        if meta.get("tag") != tag:
+            return 0  # saved against a different index
+        vectors = np.load(f"{self.persist_path}.npy")
+        loaded = 0
+        now = time.time()
+        for entry, vector in zip(meta["entries"], vectors):
+            if not self._expired(entry, now):
+                self.put(entry["query"], vector, entry["response"], entry["created_at"])
+                loaded += 1
+        return loaded
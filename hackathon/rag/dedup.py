@@ -0,0 +1,124 @@
+import re
+from typing import Any, Dict, Iterable, List, Optional
+import faiss
+import numpy as np
+
+# Lines that identify a single call rather than describe it
+PER_CALL_LINE = re.compile(r"^\s*customer id:.*$", re.IGNORECASE | re.MULTILINE)
+# Cosine similarity above which two distinct texts are treated as the same document
+NEAR_DUPLICATE_THRESHOLD = 0.98
+# Call ids kept per group; `count` stays exact beyond this
+MAX_GROUP_CALL_IDS = 1000
+
+
+def representative_text(text: str) -> str:
+    """The text that is embedded for a group: per-call lines dropped, whitespace tidied."""
+    lines = [line.strip() for line in PER_CALL_LINE.sub("", text).splitlines()]
+    return "\n".join(line for line in lines if line)
+
+
+def dedup_key(text: str) -> str:
+    """Texts with the same key are collapsed into one document."""
+    return re.sub(r"\s+", " ", representative_text(text)).strip().lower()
+
+
+class DocumentGroup:
+    """One indexed document standing in for every call whose text has the same key."""
+
+    __slots__ = ("text", "count", "call_ids", "duration_total", "duration_count")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.count = 0
+        self.call_ids: List[str] = []
+        self.duration_total = 0.0
+        self.duration_count = 0
+
+    def add(self, call_id: Optional[str], duration: Optional[float]) -> None:
+        self.count += 1
+        if call_id is not None and len(self.call_ids) < MAX_GROUP_CALL_IDS:
+            self.call_ids.append(call_id)
+        if duration is not None:
+            self.duration_total += duration
+            self.duration_count += 1
+
+    def merge(self, other: "DocumentGroup") -> None:
+        self.count += other.count
+        self.call_ids.extend(other.call_ids[:MAX_GROUP_CALL_IDS - len(self.call_ids)])
+        self.duration_total += other.duration_total
+        self.duration_count += other.duration_count
+
+    def to_state(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "call_ids": self.call_ids,
+            "duration_total": self.duration_total,
+            "duration_count": self.duration_count
+        }
+
+    @classmethod
+    def from_state(cls, text: str, state: Dict[str, Any]) -> "DocumentGroup":
+        group = cls(text)
+        group.count = state["count"]
+        group.call_ids = list(state["call_ids"])
+        group.duration_total = state["duration_total"]
+        group.duration_count = state["duration_count"]
+        return group
+
+    def metadata(self) -> Dict[str, Any]:
+        avg = self.duration_total / self.duration_count if self.duration_count else None
+        return {
+            "count": self.count,
+            "call_ids": self.call_ids,
+            "avg_duration": round(avg, 2) if avg is not None else None
+        }
+
+
+def group_documents(documents: Iterable) -> Dict[str, DocumentGroup]:
+    """Collapse documents (with `call_id`/`duration` metadata) by `dedup_key`, keeping first-seen order."""
+    groups: Dict[str, DocumentGroup] = {}
+    for doc in documents:
+        key = dedup_key(doc.page_content)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = DocumentGroup(representative_text(doc.page_content))
+        group.add(doc.metadata.get("call_id"), doc.metadata.get("duration"))
+    return groups
+
+
+def merge_near_duplicates(
+    groups: List[DocumentGroup], vectors: np.ndarray, threshold: float = NEAR_DUPLICATE_THRESHOLD
+) -> List[int]:
+    """Fold groups whose vectors are within `threshold` cosine of an earlier kept group into it.
+
+    Returns the positions of the groups that were kept (their metadata now
+    includes the folded ones).
+    """
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32).copy()
+    faiss.normalize_L2(vectors)
+    kept_index = faiss.IndexFlatIP(vectors.shape[1])
+    kept: List[int] = []
+    for i, vector in enumerate(vectors):
+        if kept:
+            similarity, nearest = kept_index.search(vector[None, :], 1)
+            if similarity[0, 0] >= threshold:
+                groups[kept[nearest[0, 0]]].merge(groups[i])
+                continue
+        kept_index.add(vector[None, :])
+        kept.append(i)
+    return kept
+
+
+def distinct_documents(documents: Iterable, k: int) -> List:
+    """First `k` documents with distinct `dedup_key`s, in rank order."""
+    seen = set()
+    distinct = []
+    for doc in documents:
+        key = dedup_key(doc.page_content)
+        if key in seen:
+            continue
+        seen.add(key)
+        distinct.append(doc)
+        if len(distinct) == k:
+            break
+    return distinct
@@ -0,0 +1,177 @@
+import os
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+# "torch" is sentence-transformers; the ONNX backends run the same weights
+# exported by scripts/export_onnx_embeddings.py, optionally int8-quantized
+EMBEDDING_BACKENDS = ("torch", "onnx", "onnx-int8")
+ONNX_MODEL_DIR = str(Path(__file__).resolve().parent.parent / "models" / "bge-base-en-v1.5-onnx")
+ONNX_MODEL_FILE = "model.onnx"
+ONNX_INT8_MODEL_FILE = "model_int8.onnx"
+ONNX_INPUTS = ("input_ids", "attention_mask", "token_type_ids")
+ONNX_OPSET = 14
+ONNX_BATCH_SIZE = 32
+MAX_SEQUENCE_LENGTH = 512  # bge-base
+
+
+def embedding_id(model_name: str, backend: str) -> str:
+    """Names the vectors a backend produces, for caches and build manifests.
+
+    The torch backend keeps the bare model name so existing caches stay valid.
+    """
+    return model_name if backend == "torch" else f"{model_name}+{backend}"
+
+
+class OnnxEmbeddings(Embeddings):
+    """bge on ONNX Runtime, pooled like its sentence-transformers config: CLS token, L2-normalized.
+
+    Texts are embedded in length-sorted batches to keep padding short.
+    `threads` sets ONNX Runtime's intra-op thread count (default: all cores).
+    """
+
+    def __init__(
+        self,
+        model_dir: str = ONNX_MODEL_DIR,
+        quantized: bool = False,
+        threads: Optional[int] = None,
+        batch_size: int = ONNX_BATCH_SIZE
+    ):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        path = os.path.join(model_dir, ONNX_INT8_MODEL_FILE if quantized else ONNX_MODEL_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"{path} not found, export it with scripts/export_onnx_embeddings.py")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        options.inter_op_num_threads = 1
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+        self.batch_size = batch_size
+
+    def _embed(self, texts: Sequence[str]) -> np.ndarray:
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        vectors: List[np.ndarray] = [None] * len(texts)
+        for start in range(0, len(texts), self.batch_size):
+            positions = order[start:start + self.batch_size]
+            encoded = self.tokenizer(
+                [texts[i] for i in positions],
+                padding=True,
+                truncation=True,
+                max_length=MAX_SEQUENCE_LENGTH,
+                return_tensors="np"
+            )
+            feeds = {name: encoded[name].astype(np.int64) for name in self.input_names}
+            cls = self.session.run(None, feeds)[0][:, 0]
+            cls /= np.linalg.norm(cls, axis=1, keepdims=True)
+            for position, vector in zip(positions, cls):
+                vectors[position] = vector
+        return np.asarray(vectors, dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return self._embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        # No query instruction, same as the torch backend
+        return self._embed([text])[0].tolist()
+
+
+def create_embeddings(
+    model_name: str,
+    backend: str = "torch",
+    threads: Optional[int] = None,
+    onnx_model_dir: str = ONNX_MODEL_DIR
+) -> Embeddings:
+    """Embedding model for `backend`; every backend returns normalized vectors for the same index."""
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+        if threads:
+            import torch
+            torch.set_num_threads(threads)
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cpu"},
+            encode_kwargs={"normalize_embeddings": True}
+        )
+    if backend in ("onnx", "onnx-int8"):
+        return OnnxEmbeddings(onnx_model_dir, quantized=backend == "onnx-int8", threads=threads)
+    raise ValueError(f"Unknown embedding backend '{backend}', expected one of {', '.join(EMBEDDING_BACKENDS)}")
+
+
+class LazyEmbeddings(Embeddings):
+    """`create_embeddings(...)`, loaded on the first embed call.
+
+    For stores that need an embedding function but may never embed anything
+    in this process, such as an index built from precomputed vectors.
+    """
+
+    def __init__(self, model_name: str, backend: str = "torch", threads: Optional[int] = None):
+        self.model_name = model_name
+        self.backend = backend
+        self.threads = threads
+        self._embeddings: Optional[Embeddings] = None
+
+    @property
+    def embeddings(self) -> Embeddings:
+        if self._embeddings is None:
+            self._embeddings = create_embeddings(self.model_name, self.backend, self.threads)
+        return self._embeddings
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embeddings.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+
+def export_onnx(model_name: str, output_dir: str = ONNX_MODEL_DIR, quantize: bool = True) -> Dict[str, str]:
+    """Export `model_name`'s encoder to ONNX (plus a dynamic int8 copy); returns the written model paths."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(output_dir, exist_ok=True)
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    model = AutoModel.from_pretrained(model_name).eval()
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in ONNX_INPUTS}
+    dynamic_axes["last_hidden_state"] = {0: "batch", 1: "sequence"}
+    paths = {"onnx": os.path.join(output_dir, ONNX_MODEL_FILE)}
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in ONNX_INPUTS),  # BertModel.forward's positional order
+            paths["onnx"],
+            input_names=list(ONNX_INPUTS),
+            output_names=["last_hidden_state"],
+            dynamic_axes=dynamic_axes,
+            opset_version=ONNX_OPSET
+        )
+    tokenizer.save_pretrained(output_dir)
+
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        paths["onnx-int8"] = os.path.join(output_dir, ONNX_INT8_MODEL_FILE)
+        quantize_dynamic(paths["onnx"], paths["onnx-int8"], weight_type=QuantType.QInt8)
+    return paths
+
+
+def cosine_drift(reference: np.ndarray, candidate: np.ndarray) -> Dict[str, float]:
+    """Row-wise cosine similarity of `candidate` vectors to `reference` ones for the same texts."""
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    similarity = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "mean_cosine": float(similarity.mean()),
+        "min_cosine": float(similarity.min()),
+        "p01_cosine": float(np.percentile(similarity, 1)),
+        "max_drift": float(1 - similarity.min())
+    }
@@ -0,0 +1,255 @@
+import fcntl
+import hashlib
+import json
+import os
+import re
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBEDDING_CACHE_DIR = "data/embedding_cache"
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Eviction compacts down to this fraction of the limit so it doesn't run on every put
+EVICT_TO_FRACTION = 0.8
+KEY_BYTES = 16
+
+
+class EmbeddingCache:
+    """Persistent text -> vector cache for one embedding model.
+
+    Entries are keyed by a hash of the model name and the text. Vectors are
+    appended to a flat float32 file that is read through a memory map, keys
+    to a parallel file of fixed-size digests; `meta.json` holds the committed
+    entry count, so a crash mid-append only loses the uncommitted tail.
+    Writers from several processes serialise on a lock file, which readers
+    hold shared while they map keys to vector rows, so a compaction can't
+    renumber rows in between. Once the files outgrow `max_bytes` the least
+    recently used entries are compacted away.
+    """
+
+    def __init__(self, model_name: str, cache_dir: str = EMBEDDING_CACHE_DIR, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9._-]+", "_", model_name))
+        os.makedirs(self.path, exist_ok=True)
+        self._lock = threading.Lock()
+        self.dim: Optional[int] = None
+        self.count = 0
+        self.generation = 0
+        self._rows: Dict[bytes, int] = {}
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._clock = 0
+        self._vectors: Optional[np.memmap] = None
+        self.hits = 0
+        self.misses = 0
+        with self._lock, self._process_lock(shared=True):
+            self._refresh()
+
+    def _file(self, name: str) -> str:
+        return os.path.join(self.path, name)
+
+    def key(self, text: str) -> bytes:
+        return hashlib.blake2b(f"{self.model_name}\0{text}".encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+    @contextmanager
+    def _process_lock(self, shared: bool = False):
+        # flock is per open file: never take it again while holding it
+        with open(self._file("lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_meta(self) -> Dict:
+        try:
+            with open(self._file("meta.json"), "r") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {"dim": None, "count": 0, "generation": 0, "clock": 0}
+
+    def _write_meta(self) -> None:
+        meta = {"model": self.model_name, "dim": self.dim, "count": self.count, "generation": self.generation, "clock": self._clock}
+        tmp_path = self._file("meta.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._file("meta.json"))
+
+    def _refresh(self) -> None:
+        """Pick up entries committed by other processes (or a compaction) since we last looked.
+
+        Callers hold the process lock (shared is enough) until they are done
+        with the rows, so meta.json, keys.bin and vectors.f32 agree.
+        """
+        meta = self._read_meta()
+        if meta["generation"] != self.generation:
+            self._rows, self.count = {}, 0
+            self._last_used = np.zeros(0, dtype=np.int64)
+            self._vectors = None
+        self.dim, self.generation = meta["dim"], meta["generation"]
+        self._clock = max(self._clock, meta.get("clock", 0))
+        if meta["count"] > self.count:
+            with open(self._file("keys.bin"), "rb") as f:
+                f.seek(self.count * KEY_BYTES)
+                raw = f.read((meta["count"] - self.count) * KEY_BYTES)
+            for i in range(len(raw) // KEY_BYTES):
+                self._rows[raw[i * KEY_BYTES:(i + 1) * KEY_BYTES]] = self.count + i
+            used = np.zeros(meta["count"], dtype=np.int64)
+            used[:len(self._last_used)] = self._last_used
+            saved = self._load_last_used()
+            used[:min(len(saved), len(used))] = np.maximum(used[:len(saved)], saved[:len(used)])
+            self._last_used = used
+            self.count = meta["count"]
+
+    def _load_last_used(self) -> np.ndarray:
+        try:
+            return np.load(self._file("last_used.npy"))
+        except FileNotFoundError:
+            return np.zeros(0, dtype=np.int64)
+
+    def _matrix(self) -> np.memmap:
+        if self._vectors is None or len(self._vectors) != self.count:
+            self._vectors = np.memmap(self._file("vectors.f32"), dtype=np.float32, mode="r", shape=(self.count, self.dim))
+        return self._vectors
+
+    def lookup(self, texts: Sequence[str]) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """Cached vectors by position in `texts`, and the positions that missed."""
+        with self._lock, self._process_lock(shared=True):
+            self._refresh()
+            rows = [self._rows.get(self.key(text)) for text in texts]
+            found = {i: row for i, row in enumerate(rows) if row is not None}
+            missing = [i for i, row in enumerate(rows) if row is None]
+            hits: Dict[int, np.ndarray] = {}
+            if found:
+                positions = np.fromiter(found.values(), dtype=np.int64, count=len(found))
+                vectors = np.asarray(self._matrix()[positions])
+                hits = dict(zip(found, vectors))
+                self._clock += 1
+                self._last_used[positions] = self._clock
+            self.hits += len(found)
+            self.misses += len(missing)
+            return hits, missing
+
+    def put(self, texts: Sequence[str], vectors) -> None:
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        if not len(texts):
+            return
+        with self._lock, self._process_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match cached dimension {self.dim}")
+
+            new_keys: Dict[bytes, int] = {}
+            for i, text in enumerate(texts):
+                key = self.key(text)
+                if key not in self._rows and key not in new_keys:
+                    new_keys[key] = i
+            if not new_keys:
+                return
+            # Truncate to the committed count first: a crashed writer may have left a partial tail
+            with open(self._file("vectors.f32"), "ab") as vf, open(self._file("keys.bin"), "ab") as kf:
+                vf.truncate(self.count * self.dim * 4)
+                kf.truncate(self.count * KEY_BYTES)
+                vf.write(vectors[list(new_keys.values())].tobytes())
+                kf.write(b"".join(new_keys))
+            self._clock += 1
+            for offset, key in enumerate(new_keys):
+                self._rows[key] = self.count + offset
+            self._last_used = np.concatenate([self._last_used, np.full(len(new_keys), self._clock, dtype=np.int64)])
+            self.count += len(new_keys)
+            np.save(self._file("last_used.npy"), self._last_used)
+            self._write_meta()
+            self._vectors = None
+
+            if self.size_bytes() > self.max_bytes:
+                self._compact(int(self.max_entries() * EVICT_TO_FRACTION))
+
+    def embed(self, texts: Sequence[str], embed_fn: Callable[[List[str]], List[List[float]]]) -> np.ndarray:
+        """Vectors for `texts`, running `embed_fn` only on texts not seen before."""
+        hits, missing = self.lookup(texts)
+        if missing:
+            computed = np.asarray(embed_fn([texts[i] for i in missing]), dtype=np.float32)
+            self.put([texts[i] for i in missing], computed)
+            hits.update(zip(missing, computed))
+        if not texts:
+            return np.zeros((0, self.dim or 0), dtype=np.float32)
+        return np.stack([hits[i] for i in range(len(texts))])
+
+    def flush(self) -> None:
+        """Persist recency from lookups since the last write (used for eviction)."""
+        with self._lock, self._process_lock():
+            saved = self._load_last_used()
+            n = min(len(saved), len(self._last_used))
+            self._last_used[:n] = np.maximum(self._last_used[:n], saved[:n])
+            np.save(self._file("last_used.npy"), self._last_used)
+            self._write_meta()
+
+    def entry_bytes(self) -> int:
+        return (self.dim or 0) * 4 + KEY_BYTES + 8
+
+    def size_bytes(self) -> int:
+        return self.count * self.entry_bytes()
+
+    def max_entries(self) -> int:
+        return self.max_bytes // self.entry_bytes() if self.dim else 0
+
+    def compact(self, max_entries: Optional[int] = None) -> Dict[str, int]:
+        """Rewrite the cache keeping at most `max_entries` most recently used entries."""
+        with self._lock, self._process_lock():
+            self._refresh()
+            before = self.count
+            self._compact(self.max_entries() if max_entries is None else max_entries)
+            return {"before": before, "after": self.count, "evicted": before - self.count}
+
+    def _compact(self, keep: int) -> None:
+        if not self.count:
+            return
+        order = np.argsort(-self._last_used, kind="stable")[:keep]
+        order.sort()  # keep file order among survivors
+        keys = list(self._rows)
+        rows_to_key = np.empty(self.count, dtype=object)
+        rows_to_key[list(self._rows.values())] = keys
+        vectors = np.asarray(self._matrix()[order])
+
+        for name, data in (("vectors.f32", vectors.tobytes()), ("keys.bin", b"".join(rows_to_key[order]))):
+            with open(self._file(f"{name}.tmp"), "wb") as f:
+                f.write(data)
+            os.replace(self._file(f"{name}.tmp"), self._file(name))
+        self._last_used = self._last_used[order]
+        np.save(self._file("last_used.npy"), self._last_used)
+        self._rows = {key: i for i, key in enumerate(rows_to_key[order])}
+        self.count = len(order)
+        self.generation += 1
+        self._vectors = None
+        self._write_meta()
+
+    def stats(self) -> Dict[str, object]:
+        lookups = self.hits + self.misses
+        return {
+            "model": self.model_name,
+            "entries": self.count,
+            "size_bytes": self.size_bytes(),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+class CachedEmbeddings(Embeddings):
+    """Wraps an embeddings model so document embeddings go through an `EmbeddingCache`."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.cache.embed(texts, self.embeddings.embed_documents).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        # Query instructions (e.g. BGE's) differ from document encoding, so queries bypass the cache
+        return self.embeddings.embed_query(text)
@@ -0,0 +1,167 @@
+import json
+import math
+import os
+from typing import Any, Dict, Optional
+import faiss
+import numpy as np
+
+INDEX_TYPES = ("flat", "ivf", "ivfpq", "hnsw")
+INDEX_META_FILE = "index_meta.json"
+
+# Build-time defaults
+PQ_SUBQUANTIZERS = 64  # bytes per vector with 8-bit codes; must divide the dimension
+PQ_BITS = 8
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+
+# Query-time defaults, stored with the index and overridable without a rebuild
+DEFAULT_NPROBE = 16
+DEFAULT_EF_SEARCH = 64
+
+# FAISS wants roughly this many training vectors per centroid
+MIN_POINTS_PER_CENTROID = 39
+# ...and its k-means subsamples to this many anyway, so training on more only costs time
+MAX_POINTS_PER_CENTROID = 256
+
+
+def default_nlist(n_vectors: int) -> int:
+    """~4*sqrt(n) inverted lists, capped so every centroid gets enough training points."""
+    nlist = int(4 * math.sqrt(n_vectors))
+    return max(1, min(nlist, n_vectors // MIN_POINTS_PER_CENTROID))
+
+
+def create_index(
+    index_type: str,
+    dim: int,
+    n_vectors: int,
+    nlist: Optional[int] = None,
+    pq_m: int = PQ_SUBQUANTIZERS,
+    pq_bits: int = PQ_BITS,
+    hnsw_m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION
+) -> faiss.Index:
+    """Create an empty (untrained) L2 index of the given type."""
+    if index_type == "flat":
+        return faiss.IndexFlatL2(dim)
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dim, hnsw_m)
+        index.hnsw.efConstruction = ef_construction
+        return index
+
+    nlist = nlist or default_nlist(n_vectors)
+    quantizer = faiss.IndexFlatL2(dim)
+    if index_type == "ivf":
+        return faiss.IndexIVFFlat(quantizer, dim, nlist)
+    if index_type == "ivfpq":
+        if dim % pq_m != 0:
+            raise ValueError(f"pq_m={pq_m} must divide the embedding dimension {dim}")
+        if n_vectors < 2 ** pq_bits:
+            raise ValueError(f"ivfpq with {pq_bits}-bit codes needs at least {2 ** pq_bits} vectors to train")
+        return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits)
+    raise ValueError(f"Unknown index type '{index_type}', expected one of {', '.join(INDEX_TYPES)}")
+
+
+def build_index(index_type: str, vectors: np.ndarray, **options) -> faiss.Index:
+    """Create, train (if needed) and fill an index from an (n, dim) float32 matrix."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = create_index(index_type, vectors.shape[1], len(vectors), **options)
+    if not index.is_trained:
+        index.train(training_sample(index, vectors))
+    index.add(vectors)
+    return index
+
+
+def training_sample(index: faiss.Index, vectors: np.ndarray, seed: int = 0) -> np.ndarray:
+    """A random subset of `vectors` big enough to train `index`'s k-means quantizers.
+
+    That is MAX_POINTS_PER_CENTROID per IVF list, or per PQ code if there
+    are more codes than lists.
+    """
+    centroids = _ivf(index).nlist
+    if isinstance(index, faiss.IndexIVFPQ):
+        centroids = max(centroids, index.pq.ksub)
+    size = centroids * MAX_POINTS_PER_CENTROID
+    if len(vectors) <= size:
+        return vectors
+    rows = np.sort(np.random.default_rng(seed).choice(len(vectors), size, replace=False))
+    return vectors[rows]
+
+
+def removes_by_position(index: faiss.Index) -> bool:
+    """Whether `index.remove_ids` shifts the remaining vectors down to fill the gap.
+
+    langchain's `FAISS.delete` renumbers its position map that way. Flat
+    indexes compact their storage, so labels keep matching positions; IVF
+    indexes leave the other labels as they were, and HNSW
+    graphs can't drop vectors at all.
+    """
+    return isinstance(index, faiss.IndexFlat)
+
+
+def reconstruct_all(index: faiss.Index) -> np.ndarray:
+    """Every vector in `index`, in label order (decoded, so lossy for PQ codes)."""
+    ivf = _ivf(index)
+    if ivf is not None:
+        ivf.make_direct_map()  # IVF lists only know their labels, not positions
+    return index.reconstruct_n(0, index.ntotal)
+
+
+def describe_index(index: faiss.Index) -> Dict[str, Any]:
+    """Build parameters worth recording next to the index."""
+    info: Dict[str, Any] = {"dim": index.d, "ntotal": index.ntotal}
+    ivf = _ivf(index)
+    if ivf is not None:
+        info["nlist"] = ivf.nlist
+    if isinstance(index, faiss.IndexIVFPQ):
+        info["pq_m"] = index.pq.M
+        info["pq_bits"] = index.pq.nbits
+    if isinstance(index, faiss.IndexHNSW):
+        info["hnsw_m"] = index.hnsw.nb_neighbors(1)
+        info["ef_construction"] = index.hnsw.efConstruction
+    return info
+
+
+def _ivf(index: faiss.Index):
+    try:
+        return faiss.extract_index_ivf(index)
+    except RuntimeError:
+        return None
+
+
+def apply_search_params(index: faiss.Index, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, int]:
+    """Set query-time knobs on a loaded index; returns the values now in effect."""
+    applied: Dict[str, int] = {}
+    ivf = _ivf(index)
+    if ivf is not None:
+        if nprobe is not None:
+            ivf.nprobe = min(nprobe, ivf.nlist)
+        applied["nprobe"] = ivf.nprobe
+    if isinstance(index, faiss.IndexHNSW):
+        if ef_search is not None:
+            index.hnsw.efSearch = ef_search
+        applied["ef_search"] = index.hnsw.efSearch
+    return applied
+
+
+def save_index_meta(
+    index_dir: str, index_type: str, index: faiss.Index, search: Dict[str, int], storage: str = "pickle"
+) -> None:
+    write_index_meta(index_dir, {"index_type": index_type, "build": describe_index(index), "search": search, "storage": storage})
+
+
+def write_index_meta(index_dir: str, meta: Dict[str, Any]) -> None:
+    tmp_path = os.path.join(index_dir, f"{INDEX_META_FILE}.tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(meta, f, indent=2)
+    os.replace(tmp_path, os.path.join(index_dir, INDEX_META_FILE))
+
+
+def load_index_meta(index_dir: str) -> Dict[str, Any]:
+    """Index metadata; indexes built before index types existed are flat and pickled."""
+    path = os.path.join(index_dir, INDEX_META_FILE)
+    if not os.path.exists(path):
+        return {"index_type": "flat", "build": {}, "search": {}, "storage": "pickle"}
+    with open(path, "r") as f:
+        meta = json.load(f)
+    meta.setdefault("storage", "pickle")
+    return meta
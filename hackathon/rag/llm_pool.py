@@ -0,0 +1,450 @@
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+# Threads per llama.cpp instance. Single-sequence decoding stops scaling well
+# past a handful of threads, so several small instances beat one wide one.
+MIN_THREADS_PER_WORKER = 4
+MAX_THREADS_PER_WORKER = 8
+# Models at least this big get MAX_THREADS_PER_WORKER per instance
+LARGE_MODEL_BYTES = 4 << 30
+# Private memory per instance on top of the weights, which are mmap'd and
+# shared through the page cache: KV cache for n_ctx=2048 plus scratch buffers
+WORKER_OVERHEAD_BYTES = 1 << 30
+# Fraction of available memory the pool may plan for
+MEMORY_HEADROOM = 0.8
+READY_TIMEOUT_SECONDS = 300.0
+# Longest a caller waits for its completion, or for the next streamed token
+RESULT_TIMEOUT_SECONDS = 300.0
+# How often the dispatcher wakes up to check for dead workers while idle
+HEALTH_CHECK_SECONDS = 1.0
+# Delay before respawning a worker that died while loading, doubled on each failure in a row
+RESPAWN_BACKOFF_SECONDS = 1.0
+MAX_RESPAWN_BACKOFF_SECONDS = 60.0
+
+
+class LLMWorkerError(Exception):
+    """A pool worker failed the generation (or died while running it)."""
+
+
+def available_cpus() -> List[int]:
+    """CPUs this process may run on."""
+    try:
+        return sorted(os.sched_getaffinity(0))
+    except AttributeError:  # not Linux
+        return list(range(os.cpu_count() or 1))
+
+
+def available_memory() -> Optional[int]:
+    """Bytes of memory available for new allocations, or None if unknown."""
+    try:
+        with open("/proc/meminfo", "r") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def plan_pool(
+    model_bytes: int,
+    cpus: int,
+    memory: Optional[int] = None,
+    workers: Optional[int] = None,
+    threads: Optional[int] = None
+) -> Tuple[int, int]:
+    """(workers, threads per worker) for a model of `model_bytes` on `cpus` cores.
+
+    Explicit `workers`/`threads` win; whatever is left unset is derived so
+    the pool covers the cores without oversubscribing them and the
+    instances fit in `memory`.
+    """
+    auto_threads = threads is None
+    if auto_threads:
+        threads = MAX_THREADS_PER_WORKER if model_bytes >= LARGE_MODEL_BYTES else MIN_THREADS_PER_WORKER
+        threads = max(1, min(threads, cpus))
+    if workers is None:
+        workers = max(1, cpus // threads)
+        if memory is not None:
+            fit = int((memory * MEMORY_HEADROOM - model_bytes) // WORKER_OVERHEAD_BYTES)
+            workers = max(1, min(workers, fit))
+        if auto_threads:
+            # Spread cores left over by the division (or the memory cap) across the workers
+            threads = max(threads, min(MAX_THREADS_PER_WORKER, cpus // workers))
+    return workers, threads
+
+
+def cpu_sets(cpus: List[int], workers: int, threads: int) -> List[Optional[List[int]]]:
+    """Disjoint CPU slices per worker; no pinning when the pool oversubscribes the CPUs."""
+    if workers * threads > len(cpus):
+        return [None] * workers
+    return [cpus[i * threads:(i + 1) * threads] for i in range(workers)]
+
+
+def _worker_main(worker_id, model_kwargs, threads, cpus, system_prompt, example_prompt, requests, results, current, cancelled):
+    """Worker process: load a private model, then serve jobs from the shared queue."""
+    if cpus:
+        os.sched_setaffinity(0, cpus)
+    from llama_cpp import Llama
+    from rag.prefix_cache import PromptPrefixCache
+
+    llama = Llama(n_threads=threads, **model_kwargs)
+    prefix_cache = PromptPrefixCache(llama)
+    if system_prompt:
+        prefix_cache.warm(system_prompt, example_prompt)
+    results.put(("ready", worker_id, {"pid": os.getpid(), "prefix_cache": prefix_cache.stats()}))
+
+    while True:
+        job = requests.get()
+        if job is None:
+            break
+        job_id, prompt, kwargs, stream = job
+        # Shared memory, unlike the results queue, survives the process dying right after
+        current[worker_id] = job_id
+        results.put(("started", job_id, worker_id))
+        try:
+            prefix_cache.restore()
+            if stream:
+                tokens = 0
+                for chunk in llama.create_completion(prompt, stream=True, **kwargs):
+                    if cancelled[worker_id] == job_id:
+                        break
+                    tokens += 1
+                    results.put(("token", job_id, chunk["choices"][0]["text"]))
+                text = None
+            else:
+                completion = llama.create_completion(prompt, **kwargs)
+                text = completion["choices"][0]["text"]
+                tokens = completion["usage"]["completion_tokens"]
+        except Exception as e:
+            results.put(("error", job_id, {"worker": worker_id, "error": f"{type(e).__name__}: {e}"}))
+        else:
+            results.put(("done", job_id, {
+                "worker": worker_id, "text": text, "tokens": tokens, "prefix_cache": prefix_cache.stats()
+            }))
+
+
+class _Worker:
+    __slots__ = ("id", "cpus", "process", "pid", "ready", "job", "job_started", "completed",
+                 "failed", "tokens", "busy_seconds", "restarts", "load_failures", "respawn_at", "prefix_cache")
+
+    def __init__(self, worker_id: int, cpus: Optional[List[int]]):
+        self.id = worker_id
+        self.cpus = cpus
+        self.process = None
+        self.pid = None
+        self.ready = False
+        self.job: Optional[int] = None
+        self.job_started = 0.0
+        self.completed = 0
+        self.failed = 0
+        self.tokens = 0
+        self.busy_seconds = 0.0
+        self.restarts = 0
+        self.load_failures = 0  # deaths in a row before reporting ready
+        self.respawn_at = 0.0
+        self.prefix_cache: Dict[str, Any] = {}
+
+
+class LLMPool:
+    """N llama.cpp instances, each in its own process, fed from one request queue.
+
+    Every worker loads the model with its own thread count (and CPU slice
+    when `affinity` is set) and caches the system prompt's KV state. Jobs
+    are pulled by whichever worker is free; a dispatcher thread routes
+    results back to the waiting callers. `generate` and `stream` block, so
+    call them from threads (the inference scheduler runs one per worker).
+    A worker that dies is replaced and its job fails with `LLMWorkerError`,
+    as does a job with no result for `RESULT_TIMEOUT_SECONDS`.
+    """
+
+    def __init__(
+        self,
+        model_kwargs: Dict[str, Any],
+        system_prompt: Optional[str] = None,
+        example_prompt: Optional[str] = None,
+        workers: Optional[int] = None,
+        threads: Optional[int] = None,
+        affinity: bool = True
+    ):
+        self.model_kwargs = model_kwargs
+        self.system_prompt = system_prompt
+        self.example_prompt = example_prompt  # checked against the cached prefix's tokens
+        self.requested_workers = workers
+        self.requested_threads = threads
+        self.affinity = affinity
+        self.size = 0
+        self.threads = 0
+        self._ctx = mp.get_context("spawn")  # never fork the API process and its threads
+        self._workers: List[_Worker] = []
+        self._jobs: Dict[int, queue.Queue] = {}
+        self._abandoned = set()
+        self._job_ids = itertools.count()
+        self._lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._requests = None
+        self._results = None
+        self._current = None
+        self._cancelled = None
+        self._started_at = 0.0
+        self._stopping = False
+
+    @property
+    def running(self) -> bool:
+        return self._dispatcher is not None and self._dispatcher.is_alive()
+
+    def start(self) -> None:
+        """Spawn the workers and wait until every one has loaded the model."""
+        with self._start_lock:
+            if self.running:
+                return
+            cpus = available_cpus()
+            model_bytes = os.path.getsize(self.model_kwargs["model_path"])
+            self.size, self.threads = plan_pool(
+                model_bytes, len(cpus), available_memory(), self.requested_workers, self.requested_threads
+            )
+            slices = cpu_sets(cpus, self.size, self.threads) if self.affinity else [None] * self.size
+            self._stopping = False
+            print(f"Starting {self.size} LLM workers with {self.threads} threads each "
+                  f"({len(cpus)} CPUs, {model_bytes / 1e9:.1f} GB model)")
+
+            self._requests = self._ctx.Queue()
+            self._results = self._ctx.Queue()
+            self._current = self._ctx.Array("q", [-1] * self.size, lock=False)
+            self._cancelled = self._ctx.Array("q", [-1] * self.size, lock=False)
+            self._workers = [_Worker(i, slices[i]) for i in range(self.size)]
+            for worker in self._workers:
+                self._spawn(worker)
+
+            deadline = time.monotonic() + READY_TIMEOUT_SECONDS
+            while not all(worker.ready for worker in self._workers):
+                try:
+                    kind, worker_id, payload = self._results.get(timeout=HEALTH_CHECK_SECONDS)
+                except queue.Empty:
+                    dead = [w.id for w in self._workers if not w.ready and not w.process.is_alive()]
+                    if dead or time.monotonic() > deadline:
+                        self._terminate()
+                        raise LLMWorkerError(f"LLM workers {dead or 'all'} did not start")
+                    continue
+                if kind == "ready":
+                    self._on_ready(self._workers[worker_id], payload)
+
+            self._started_at = time.monotonic()
+            self._dispatcher = threading.Thread(target=self._dispatch, name="llm-pool", daemon=True)
+            self._dispatcher.start()
+
+    def _spawn(self, worker: _Worker) -> None:
+        worker.ready = False
+        worker.process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker.id, self.model_kwargs, self.threads, worker.cpus, self.system_prompt, self.example_prompt,
+                  self._requests, self._results, self._current, self._cancelled),
+            name=f"llm-worker-{worker.id}",
+            daemon=True
+        )
+        worker.process.start()
+
+    @staticmethod
+    def _on_ready(worker: _Worker, payload: Dict[str, Any]) -> None:
+        worker.ready = True
+        worker.load_failures = 0
+        worker.pid = payload["pid"]
+        worker.prefix_cache = payload["prefix_cache"]
+
+    def stop(self) -> None:
+        if self._dispatcher is None:
+            return
+        self._stopping = True  # workers exiting now are not to be replaced
+        for _ in self._workers:
+            self._requests.put(None)
+        for worker in self._workers:
+            worker.process.join(timeout=10)
+        self._terminate()
+        self._results.put(None)
+        self._dispatcher.join()
+        self._dispatcher = None
+        with self._lock:
+            for results in self._jobs.values():
+                results.put(("error", {"error": "LLM pool is shutting down"}))
+            self._jobs.clear()
+
+    def _terminate(self) -> None:
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.process.terminate()
+                worker.process.join()
+
+    def _dispatch(self) -> None:
+        while True:
+            # On every message too: under steady token traffic the get() never times out
+            self._replace_dead_workers()
+            try:
+                message = self._results.get(timeout=HEALTH_CHECK_SECONDS)
+            except queue.Empty:
+                continue
+            if message is None:
+                break
+            kind, key, payload = message
+            with self._lock:
+                if kind == "ready":
+                    self._on_ready(self._workers[key], payload)
+                    continue
+                if kind == "started":
+                    worker = self._workers[payload]
+                    worker.job, worker.job_started = key, time.monotonic()
+                    if key in self._abandoned:
+                        self._cancelled[worker.id] = key
+                    continue
+                if kind in ("done", "error") and self._workers[payload["worker"]].job == key:
+                    # Otherwise the job was already failed when its worker was found dead
+                    self._finish(key, kind, payload)
+                results = self._jobs.get(key)
+            if results is not None:
+                results.put((kind, payload))
+
+    def _finish(self, job_id: int, kind: str, payload: Dict[str, Any]) -> None:
+        worker = self._workers[payload["worker"]]
+        worker.job = None
+        worker.busy_seconds += time.monotonic() - worker.job_started
+        if kind == "done":
+            worker.completed += 1
+            worker.tokens += payload["tokens"]
+            worker.prefix_cache = payload["prefix_cache"]
+        else:
+            worker.failed += 1
+        self._abandoned.discard(job_id)
+
+    def _replace_dead_workers(self) -> None:
+        if self._results is None or self._stopping:
+            return
+        now = time.monotonic()
+        with self._lock:
+            for worker in self._workers:
+                if worker.process.is_alive():
+                    continue
+                if worker.respawn_at:
+                    if now >= worker.respawn_at:
+                        worker.respawn_at = 0.0
+                        self._spawn(worker)
+                    continue
+                job_id = self._current[worker.id]
+                results = self._jobs.get(job_id)
+                if results is not None:
+                    if worker.job != job_id:  # died before its "started" message got out
+                        worker.job_started = time.monotonic()
+                    self._finish(job_id, "error", {"worker": worker.id})
+                    results.put(("error", {"error": f"LLM worker {worker.id} died"}))
+                worker.job = None
+                self._current[worker.id] = -1
+                self._cancelled[worker.id] = -1
+                worker.restarts += 1
+                if worker.ready:
+                    print(f"LLM worker {worker.id} (pid {worker.pid}) exited with {worker.process.exitcode}, restarting")
+                    self._spawn(worker)
+                    continue
+                # Died loading the model (e.g. out of memory): retry, backing off while it keeps failing
+                worker.load_failures += 1
+                delay = min(RESPAWN_BACKOFF_SECONDS * 2 ** (worker.load_failures - 1), MAX_RESPAWN_BACKOFF_SECONDS)
+                print(f"LLM worker {worker.id} exited with {worker.process.exitcode} before it was ready, "
+                      f"restarting in {delay:.0f}s")
+                worker.respawn_at = now + delay
+
+    def _submit(self, prompt: str, kwargs: Dict[str, Any], stream: bool) -> Tuple[int, queue.Queue]:
+        if not self.running:
+            self.start()
+        job_id = next(self._job_ids)
+        results: queue.Queue = queue.Queue()
+        with self._lock:
+            self._jobs[job_id] = results
+        self._requests.put((job_id, prompt, kwargs, stream))
+        return job_id, results
+
+    def _release(self, job_id: int, finished: bool) -> None:
+        with self._lock:
+            self._jobs.pop(job_id, None)
+            if finished:
+                return
+            # Stop the generation if it is running, or as soon as a worker picks it up
+            self._abandoned.add(job_id)
+            for worker in self._workers:
+                if worker.job == job_id:
+                    self._cancelled[worker.id] = job_id
+
+    @staticmethod
+    def _result(results: queue.Queue) -> Tuple[str, Any]:
+        try:
+            return results.get(timeout=RESULT_TIMEOUT_SECONDS)
+        except queue.Empty:
+            raise LLMWorkerError(f"No result from the LLM pool within {RESULT_TIMEOUT_SECONDS:.0f}s") from None
+
+    def generate(self, prompt: str, **kwargs) -> str:
+        """Complete `prompt` on the next free worker; `kwargs` go to `create_completion`."""
+        job_id, results = self._submit(prompt, kwargs, stream=False)
+        finished = False
+        try:
+            kind, payload = self._result(results)
+            finished = True
+        finally:
+            self._release(job_id, finished)
+        if kind == "error":
+            raise LLMWorkerError(payload["error"])
+        return payload["text"]
+
+    def stream(self, prompt: str, **kwargs) -> Iterator[str]:
+        """Like `generate`, but yield text as it is produced.
+
+        Closing the iterator early stops the generation on its worker.
+        """
+        job_id, results = self._submit(prompt, kwargs, stream=True)
+        finished = False
+        try:
+            while True:
+                kind, payload = self._result(results)
+                if kind == "token":
+                    yield payload
+                    continue
+                finished = True
+                if kind == "error":
+                    raise LLMWorkerError(payload["error"])
+                return
+        finally:
+            self._release(job_id, finished)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = [
+                {
+                    "id": w.id,
+                    "pid": w.pid,
+                    "alive": w.process is not None and w.process.is_alive(),
+                    "cpus": w.cpus,
+                    "busy": w.job is not None,
+                    "completed": w.completed,
+                    "failed": w.failed,
+                    "restarts": w.restarts,
+                    "tokens": w.tokens,
+                    "tokens_per_second": round(w.tokens / w.busy_seconds, 2) if w.busy_seconds else None,
+                    "prefix_cache": w.prefix_cache
+                }
+                for w in self._workers
+            ]
+            tokens = sum(w.tokens for w in self._workers)
+        uptime = time.monotonic() - self._started_at if self.running else 0.0
+        return {
+            "running": self.running,
+            "workers": self.size,
+            "threads_per_worker": self.threads,
+            "affinity": self.affinity,
+            "tokens": tokens,
+            "tokens_per_second": round(tokens / uptime, 2) if uptime else None,
+            "per_worker": workers
+        }
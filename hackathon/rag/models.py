@@ -0,0 +1,128 @@
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+# Get absolute path to model
+BASE_DIR = Path(__file__).resolve().parent.parent  # Points to hackathon directory
+MODEL_DIR = BASE_DIR / "models"
+MODEL_FILE = "Phi-3-mini-4k-instruct-q4.gguf"
+MODEL_PATH = str(MODEL_DIR / MODEL_FILE)
+
+# Every LLM worker loads its own instance with these settings (plus its n_threads)
+MODEL_KWARGS = {
+    "model_path": MODEL_PATH,
+    "n_ctx": 2048,       # Reduced context size
+    "n_gpu_layers": 0,   # Disable GPU acceleration
+    "n_batch": 256,      # Smaller batches
+    "verbose": False,    # N instances would interleave their load logs
+    "seed": 42           # For reproducibility
+}
+
+# LLM worker pool; None = derived from the core count and model size
+LLM_WORKERS = None
+LLM_THREADS_PER_WORKER = None
+LLM_CPU_AFFINITY = True  # pin each worker to its own cores (Linux only)
+
+# Same model (and normalization) the call index was built with
+EMBEDDING_MODEL = "BAAI/bge-base-en-v1.5"
+# "torch", or "onnx"/"onnx-int8" after running scripts/export_onnx_embeddings.py
+EMBEDDING_BACKEND = "torch"
+EMBEDDING_THREADS = None  # intra-op threads; None = library default (all cores)
+
+
+class ModelRegistry:
+    """Process-wide owner of the embedding model and the LLM handle.
+
+    Nothing is imported or loaded until first use (or `warm_up()`), so
+    importing the API or running analytics-only code never pays for a
+    model. Every caller shares the same instances.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._document_embeddings = None
+        self._llm = None
+        self.llm_system_prompt: Optional[str] = None
+        self.llm_example_prompt: Optional[str] = None
+        self.load_seconds: Dict[str, float] = {}
+
+    def configure_llm(self, system_prompt: Optional[str] = None, example_prompt: Optional[str] = None) -> None:
+        """Set the prompt prefix every LLM worker caches; must happen before the LLM is created.
+
+        `example_prompt` is a full prompt starting with `system_prompt`; workers
+        check that it tokenizes to the cached prefix plus the rest.
+        """
+        if self._llm is not None and system_prompt != self.llm_system_prompt:
+            raise RuntimeError("LLM already created with a different system prompt")
+        self.llm_system_prompt = system_prompt
+        self.llm_example_prompt = example_prompt
+
+    def embeddings(self):
+        """The shared embedding model (normalized vectors, like the index)."""
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    started = time.perf_counter()
+                    from rag.embedding_backends import create_embeddings
+                    self._embeddings = create_embeddings(EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_THREADS)
+                    self.load_seconds["embeddings"] = time.perf_counter() - started
+        return self._embeddings
+
+    def document_embeddings(self):
+        """The shared model with document vectors cached on disk, for re-indexing known texts."""
+        if self._document_embeddings is None:
+            embeddings = self.embeddings()
+            with self._lock:
+                if self._document_embeddings is None:
+                    from rag.embedding_backends import embedding_id
+                    from rag.embedding_cache import CachedEmbeddings, EmbeddingCache
+                    cache = EmbeddingCache(embedding_id(EMBEDDING_MODEL, EMBEDDING_BACKEND))
+                    self._document_embeddings = CachedEmbeddings(embeddings, cache)
+        return self._document_embeddings
+
+    def llm(self):
+        """The LLM worker pool; its workers start on `warm_up()` or the first generation."""
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    if not os.path.exists(MODEL_PATH):
+                        raise FileNotFoundError(f"Model not found at: {MODEL_PATH}")
+                    from rag.llm_pool import LLMPool
+                    self._llm = LLMPool(
+                        MODEL_KWARGS,
+                        system_prompt=self.llm_system_prompt,
+                        example_prompt=self.llm_example_prompt,
+                        workers=LLM_WORKERS,
+                        threads=LLM_THREADS_PER_WORKER,
+                        affinity=LLM_CPU_AFFINITY
+                    )
+        return self._llm
+
+    def warm_up(self, embeddings: bool = True, llm: bool = True) -> Dict[str, float]:
+        """Load the requested models now instead of on the first request."""
+        if embeddings:
+            self.embeddings()
+        if llm:
+            pool = self.llm()
+            started = time.perf_counter()
+            pool.start()
+            self.load_seconds.setdefault("llm", time.perf_counter() - started)
+        return dict(self.load_seconds)
+
+    def shutdown(self) -> None:
+        if self._llm is not None:
+            self._llm.stop()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "embedding_backend": EMBEDDING_BACKEND,
+            "embeddings_loaded": self._embeddings is not None,
+            "llm_running": self._llm is not None and self._llm.running,
+            "load_seconds": {name: round(seconds, 3) for name, seconds in self.load_seconds.items()}
+        }
+
+
+model_registry = ModelRegistry()
@@ -0,0 +1,80 @@
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+
+class PromptPrefixCache:
+    """Saved llama.cpp state for a fixed prompt prefix (the system prompt).
+
+    `warm()` evaluates the prefix once and snapshots the KV cache.
+    `restore()` puts that snapshot back before a generation, so llama.cpp's
+    own prefix matching only has to evaluate the request-specific suffix.
+    The snapshot is only loaded when the model's current tokens don't
+    already start with the prefix (e.g. after an unrelated prompt).
+
+    Must be used from the thread that owns the model.
+    """
+
+    def __init__(self, llama: Any):
+        self.llama = llama  # llama_cpp.Llama
+        self.prefix: Optional[str] = None
+        self.prefix_tokens: List[int] = []
+        self._state = None
+        self._lock = threading.Lock()
+        self.warm_seconds = 0.0
+        self.restores = 0
+        self.already_resident = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._state is not None
+
+    def tokenize(self, text: str) -> List[int]:
+        # Same call create_completion makes, so the prefix tokens match the prompt's
+        return self.llama.tokenize(text.encode("utf-8"), special=True)
+
+    def warm(self, prefix: str, example_prompt: Optional[str] = None) -> int:
+        """Evaluate `prefix` from an empty context and snapshot the state; returns its token count.
+
+        `example_prompt`, a full prompt built on the prefix, is checked to
+        tokenize to the prefix's tokens followed by the rest. If a token
+        straddled the boundary (e.g. trailing spaces merged into the next
+        word), the snapshot would never match a real prompt.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            tokens = self.tokenize(prefix)
+            if example_prompt is not None and self.tokenize(example_prompt)[:len(tokens)] != tokens:
+                raise ValueError("Prompts don't start with the prefix's tokens; end the prefix on a token boundary")
+            self.llama.reset()
+            self.llama.eval(tokens)
+            self._state = self.llama.save_state()
+            self.prefix = prefix
+            self.prefix_tokens = tokens
+            self.warm_seconds = time.perf_counter() - started
+            return len(tokens)
+
+    def _prefix_resident(self) -> bool:
+        n = len(self.prefix_tokens)
+        return self.llama.n_tokens >= n and list(self.llama.input_ids[:n]) == self.prefix_tokens
+
+    def restore(self) -> bool:
+        """Make the prefix's KV state current; returns False if nothing is cached yet."""
+        with self._lock:
+            if self._state is None:
+                return False
+            if self._prefix_resident():
+                self.already_resident += 1
+            else:
+                self.llama.load_state(self._state)
+                self.restores += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "ready": self.ready,
+            "prefix_tokens": len(self.prefix_tokens),
+            "warm_seconds": round(self.warm_seconds, 3),
+            "restores": self.restores,
+            "already_resident": self.already_resident
+        }
@@ -1,35 +1,49 @@
-from pathlib import Path
-import os
-from rag.retriever import get_retriever
-from langchain_community.llms import LlamaCpp
-
-# Get absolute path to model
-BASE_DIR = Path(__file__).resolve().parent.parent  # Points to hackathon directory
-MODEL_DIR = BASE_DIR / "models"
-MODEL_FILE = "Phi-3-mini-4k-instruct-q4.gguf"
-MODEL_PATH = str(MODEL_DIR / MODEL_FILE)
-
-# Verify model exists
-if not os.path.exists(MODEL_PATH):
-    raise FileNotFoundError(f"Model not found at: {MODEL_PATH}")
-
-llm = LlamaCpp(
-    model_path=MODEL_PATH,
-    n_ctx=2048,          # Reduced context size
-    n_threads=8,         # Use all CPU cores
-    n_gpu_layers=0,      # Disable GPU acceleration
-    n_batch=256,         # Smaller batches
-    max_tokens=256,      # Shorter responses
-    temperature=0.2,     # More deterministic responses
-    verbose=True,
-    seed=42              # For reproducibility
+import asyncio
+from contextlib import closing
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+from rag.cache import SemanticCache
+from rag.models import model_registry
+from rag.retriever import retriever_service
+from rag.scheduler import inference_scheduler
+
+# Near-duplicate queries (notes are templated per reason/disposition) share answers
+CACHE_SIMILARITY_THRESHOLD = 0.95
+CACHE_MAX_ENTRIES = 1024
+CACHE_TTL_SECONDS = 6 * 3600
+CACHE_PERSIST_PATH = None  # e.g. "data/recommendation_cache" to keep entries across restarts
+
+recommendation_cache = SemanticCache(
+    threshold=CACHE_SIMILARITY_THRESHOLD,
+    max_entries=CACHE_MAX_ENTRIES,
+    ttl_seconds=CACHE_TTL_SECONDS,
+    persist_path=CACHE_PERSIST_PATH
 )
+# Answers were grounded in the old index; drop them when it is retrained
+retriever_service.add_reload_listener(recommendation_cache.clear)
 
-def get_recommendations(query: str) -> str:
-    retriever = get_retriever()
-    docs = retriever.invoke(query)
-    context = "\n---\n".join([doc.page_content for doc in docs])
-    
+
+GENERATION_KWARGS = {
+    "max_tokens": 200,
+    "temperature": 0.1,
+    "repeat_penalty": 1.2,
+    "stop": ["<|end|>", "\n\n"]
+}
+
+
+# Fixed start of every prompt; its KV state is cached (see PromptPrefixCache).
+# It ends on the <|user|> special token: trailing whitespace would tokenize
+# differently once the request text follows it.
+SYSTEM_PROMPT = """<|system|>
+    You are a telecom customer service expert. Provide exact actionable recommendations to reduce Average Handling Time (AHT) for the given issue. 
+    Be specific and provide concrete prioritize solutions that:
+    1.Can be implemented immediately
+    2. Address the root cause
+    3. Prevent recurrence
+    Format response as numbered points only. No explanations needed.<|end|>
+    <|user|>"""
+
+
+def build_prompt(query: str, context: str) -> str:
     # prompt = f"""
     # You are an expert in telecom customer service and helpful AI assistant. 
     # Based on the following call summary, provide recommendations for improving customer service:
@@ -42,23 +56,110 @@ def get_recommendations(query: str) -> str:
     # Use the context to support your suggestions. Be specific and provide concrete steps.
     # """
 
-    prompt = f"""<|system|>
-    You are a telecom customer service expert. Provide exact actionable recommendations to reduce Average Handling Time (AHT) for the given issue. 
-    Be specific and provide concrete prioritize solutions that:
-    1.Can be implemented immediately
-    2. Address the root cause
-    3. Prevent recurrence
-    Format response as numbered points only. No explanations needed.<|end|>
-    <|user|>
+    return SYSTEM_PROMPT + f"""
     ISSUE: {query}
     CONTEXT: {context}<|end|>
     <|assistant|>"""
-    
-    response = llm.invoke(prompt, 
-                        max_tokens=200, 
-                        temperature=0.1,  
-                        repeat_penalty=1.2,  
-                        stop=["<|end|>", "\n\n"]
-                    )  
-    
-    return response.strip()
\ No newline at end of file
+
+
+# Cached by every LLM worker once the model is loaded
+model_registry.configure_llm(system_prompt=SYSTEM_PROMPT, example_prompt=build_prompt("", ""))
+
+
+def format_context(doc) -> str:
+    """Document text, plus how common it is when it stands for several calls."""
+    count = doc.metadata.get("count", 1)
+    if count <= 1:
+        return doc.page_content
+    avg_duration = doc.metadata.get("avg_duration")
+    summary = f"Seen in {count} calls"
+    if avg_duration is not None:
+        summary += f", average duration {avg_duration:.0f}s"
+    return f"{doc.page_content}\n{summary}"
+
+
+def prepare_recommendation(query: str) -> Dict[str, Any]:
+    """Everything before generation: embed, check the cache, retrieve context."""
+    # Another API worker may have retrained the index; that also clears the cache
+    retriever_service.reload_if_changed()
+    # Before retrieval: an answer grounded in an index swapped out meanwhile must not be cached
+    cache_generation = recommendation_cache.generation
+    # Embed once: the same vector keys the cache and drives retrieval
+    query_vector = retriever_service.embed_query(query)
+    prepared = {
+        "query": query,
+        "vector": query_vector,
+        "cache_generation": cache_generation,
+        "cached": recommendation_cache.get(query_vector)
+    }
+    if prepared["cached"] is None:
+        docs = retriever_service.search_by_vector(query_vector)
+        context = "\n---\n".join([format_context(doc) for doc in docs])
+        prepared["docs"] = docs
+        prepared["prompt"] = build_prompt(query, context)
+    return prepared
+
+
+def generate_recommendation(prepared: Dict[str, Any]) -> str:
+    """Run the LLM on a prepared prompt; blocks until a pool worker has finished it."""
+    response = model_registry.llm().generate(prepared["prompt"], **GENERATION_KWARGS)
+    recommendation = response.strip()
+    recommendation_cache.put(prepared["query"], prepared["vector"], recommendation, generation=prepared["cache_generation"])
+    return recommendation
+
+
+def stream_recommendation(
+    prepared: Dict[str, Any], emit: Callable[[str], None], should_stop: Callable[[], bool]
+) -> str:
+    """Generate like `generate_recommendation` but hand each token to `emit` as it is produced.
+
+    Stop sequences are applied by llama.cpp, which holds back text that could
+    still turn into one. Stops early (and caches nothing) once `should_stop()`.
+    """
+    parts = []
+    # closing(): returning early cancels the generation on its worker
+    with closing(model_registry.llm().stream(prepared["prompt"], **GENERATION_KWARGS)) as tokens:
+        for token in tokens:
+            if should_stop():
+                return "".join(parts).strip()
+            if not parts:
+                token = token.lstrip()  # same as the .strip() of the blocking path
+                if not token:
+                    continue
+            parts.append(token)
+            emit(token)
+    recommendation = "".join(parts).strip()
+    recommendation_cache.put(prepared["query"], prepared["vector"], recommendation, generation=prepared["cache_generation"])
+    return recommendation
+
+
+def get_recommendations(query: str) -> str:
+    prepared = prepare_recommendation(query)
+    if prepared["cached"] is not None:
+        return prepared["cached"]
+    return generate_recommendation(prepared)
+
+
+async def get_recommendations_async(query: str, timeout: Optional[float] = None) -> str:
+    """API entry point: retrieval runs in a worker thread, generation is queued on the scheduler."""
+    prepared = await asyncio.to_thread(prepare_recommendation, query)
+    if prepared["cached"] is not None:
+        return prepared["cached"]
+    return await inference_scheduler.submit(generate_recommendation, prepared, timeout=timeout)
+
+
+async def stream_recommendations_async(query: str, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Retrieve context and admit a streaming generation.
+
+    Returns the prepared request plus `tokens`, an async iterator of the
+    generated text (a single item for cache hits). Scheduler errors such as a
+    full queue are raised here, before any output has been sent.
+    """
+    prepared = await asyncio.to_thread(prepare_recommendation, query)
+    if prepared["cached"] is not None:
+        async def cached_tokens() -> AsyncIterator[str]:
+            yield prepared["cached"]
+        prepared["tokens"] = cached_tokens()
+    else:
+        prepared["tokens"] = inference_scheduler.stream(stream_recommendation, prepared, timeout=timeout)
+    return prepared
@@ -1,20 +1,195 @@
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
 from langchain_community.vectorstores import FAISS
-from langchain_huggingface import HuggingFaceEmbeddings
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from rag.batching import MicroBatcher
+from rag.dedup import distinct_documents
+from rag.index_types import DEFAULT_EF_SEARCH, DEFAULT_NPROBE, apply_search_params, load_index_meta
+from rag.models import model_registry
+from rag.storage import load_vector_store
+
+INDEX_DIR = "data/retriever_db"
+TOP_K = 5
+# Candidates fetched per query so duplicates can be dropped and still leave TOP_K
+SEARCH_OVERFETCH = 4
+
+# Concurrent queries are embedded and searched together
+BATCH_MAX_WAIT_MS = 5.0
+BATCH_MAX_SIZE = 32
+# How often searches check whether another process rewrote the index on disk
+INDEX_CHECK_SECONDS = 1.0
+
+
+class RetrieverService:
+    """Process-wide owner of the FAISS index.
+
+    The index is loaded once and shared by every request; the embedding
+    model comes from the model registry.
+    `reload()` builds the new vector store off to the side and swaps the
+    reference under a lock, so searches that already grabbed the old store
+    finish against it untouched. Searches also reload when the index on
+    disk has been rewritten since it was loaded (checked at most every
+    `INDEX_CHECK_SECONDS`), which is how API worker processes other than
+    the one that retrained pick up the new index.
+    """
+
+    def __init__(
+        self,
+        index_dir: str = INDEX_DIR,
+        k: int = TOP_K,
+        batch_max_wait_ms: float = BATCH_MAX_WAIT_MS,
+        batch_max_size: int = BATCH_MAX_SIZE
+    ):
+        self.index_dir = index_dir
+        self.k = k
+        self._embed_batcher = MicroBatcher(
+            self._embed_batch, batch_max_wait_ms, batch_max_size, name="embed-batcher"
+        )
+        self._search_batcher = MicroBatcher(
+            self._search_batch, batch_max_wait_ms, batch_max_size, name="search-batcher"
+        )
+        self._vector_store: Optional[FAISS] = None
+        self._lock = threading.Lock()
+        self._check_lock = threading.Lock()
+        self._reload_listeners: List[Callable[[], None]] = []
+        self._search_overrides: Dict[str, Optional[int]] = {"nprobe": None, "ef_search": None}
+        self.index_meta: Dict[str, Any] = {}
+        self.search_params: Dict[str, int] = {}
+        self.version = 0
+        self._loaded_signature: Optional[str] = None
+        self._next_check = 0.0
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return model_registry.embeddings()
+
+    def _load_vector_store(self) -> FAISS:
+        # mmap-format indexes are mapped, not read: pages are shared between processes
+        store = load_vector_store(self.index_dir, self.embeddings)
+        self.index_meta = load_index_meta(self.index_dir)
+        self._apply_search_params(store)
+        return store
+
+    def _apply_search_params(self, store: FAISS) -> None:
+        # Overrides win over what was saved with the index, which wins over defaults
+        saved = self.index_meta.get("search", {})
+        nprobe = self._search_overrides["nprobe"] or saved.get("nprobe", DEFAULT_NPROBE)
+        ef_search = self._search_overrides["ef_search"] or saved.get("ef_search", DEFAULT_EF_SEARCH)
+        self.search_params = apply_search_params(store.index, nprobe=nprobe, ef_search=ef_search)
+
+    def set_search_params(self, nprobe: Optional[int] = None, ef_search: Optional[int] = None) -> Dict[str, int]:
+        """Change query-time parameters (IVF `nprobe`, HNSW `efSearch`) without a rebuild.
+
+        The values stick across reloads; `None` leaves a parameter unchanged.
+        """
+        if nprobe is not None:
+            self._search_overrides["nprobe"] = nprobe
+        if ef_search is not None:
+            self._search_overrides["ef_search"] = ef_search
+        self._apply_search_params(self.load())
+        return self.search_params
+
+    def load(self) -> FAISS:
+        """Load the index if it is not resident yet and return it."""
+        store = self._vector_store
+        if store is None:
+            with self._lock:
+                if self._vector_store is None:
+                    signature = self.index_signature()  # before loading: a rewrite during the load is seen next time
+                    self._vector_store = self._load_vector_store()
+                    self._loaded_signature = signature
+                    self.version += 1
+                store = self._vector_store
+        return store
+
+    def reload(self) -> int:
+        """Load the index from disk again and swap it in atomically."""
+        signature = self.index_signature()
+        new_store = self._load_vector_store()
+        with self._lock:
+            self._vector_store = new_store
+            self._loaded_signature = signature
+            self.version += 1
+            version = self.version
+        for listener in self._reload_listeners:
+            listener()
+        return version
+
+    def reload_if_changed(self) -> bool:
+        """Reload if the index on disk is not the one loaded (e.g. another worker retrained it)."""
+        if self._vector_store is None or time.monotonic() < self._next_check:
+            return False
+        if not self._check_lock.acquire(blocking=False):
+            return False  # another thread is checking (or reloading) right now
+        try:
+            self._next_check = time.monotonic() + INDEX_CHECK_SECONDS
+            if self.index_signature() == self._loaded_signature:
+                return False
+            print(f"Index in {self.index_dir} changed on disk, reloading")
+            self.reload()
+            return True
+        finally:
+            self._check_lock.release()
+
+    def add_reload_listener(self, listener: Callable[[], None]) -> None:
+        """Call `listener` after every index swap (e.g. to drop cached answers)."""
+        self._reload_listeners.append(listener)
+
+    def index_signature(self) -> str:
+        """Changes whenever the index on disk is rewritten."""
+        try:
+            return str(os.stat(os.path.join(self.index_dir, "index.faiss")).st_mtime_ns)
+        except FileNotFoundError:
+            return ""
+
+    def _embed_batch(self, queries: List[str]) -> List[List[float]]:
+        # One forward pass for the batch; same encode settings as embed_query
+        return self.embeddings.embed_documents(queries)
+
+    def _search_batch(self, vectors: List[List[float]]) -> List[List[Document]]:
+        self.reload_if_changed()
+        store = self.load()  # the whole batch sees the same index
+        matrix = np.asarray(vectors, dtype=np.float32)
+        if store._normalize_L2:
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            matrix = matrix / np.where(norms > 0, norms, 1)
+        _, indices = store.index.search(matrix, self.k * SEARCH_OVERFETCH)
+        return [
+            distinct_documents(
+                (store.docstore.search(store.index_to_docstore_id[i]) for i in row if i != -1),
+                self.k
+            )
+            for row in indices
+        ]
+
+    def embed_query(self, query: str) -> List[float]:
+        return self._embed_batcher.submit(query)
+
+    def search_by_vector(self, vector: List[float]) -> List[Document]:
+        return self._search_batcher.submit(vector)
+
+    def batching_stats(self) -> Dict[str, Any]:
+        return {
+            "embedding": self._embed_batcher.stats(),
+            "search": self._search_batcher.stats()
+        }
+
+    def index_info(self) -> Dict[str, Any]:
+        self.load()
+        return {**self.index_meta, "search": self.search_params, "version": self.version}
+
+    def get_retriever(self):
+        return self.load().as_retriever(
+            search_kwargs={"k": self.k}
+        )
+
+
+retriever_service = RetrieverService()
+
 
 def get_retriever():
-    # Initialize embeddings
-    embeddings = HuggingFaceEmbeddings(
-        model_name="BAAI/bge-base-en-v1.5",
-        model_kwargs={"device": "cpu"}
-    )
-    
-    # Load FAISS index
-    vector_store = FAISS.load_local(
-        "data/retriever_db",
-        embeddings,
-        allow_dangerous_deserialization=True
-    )
-    
-    return vector_store.as_retriever(
-        search_kwargs={"k": 5}
-    )
\ No newline at end of file
+    return retriever_service.get_retriever()
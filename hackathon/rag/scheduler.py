@@ -0,0 +1,221 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+MAX_QUEUED_REQUESTS = 16
+DEFAULT_TIMEOUT_SECONDS = 120.0
+
+
+class SchedulerError(Exception):
+    """Base class for requests the scheduler could not run."""
+
+
+class QueueFullError(SchedulerError):
+    """The bounded queue is full; the caller should back off and retry."""
+
+
+class SchedulerUnavailableError(SchedulerError):
+    """The scheduler is not running (startup not finished or shutting down)."""
+
+
+class DeadlineExceededError(SchedulerError):
+    """The request was not finished before its deadline."""
+
+
+class _Job:
+    __slots__ = ("fn", "args", "kwargs", "future", "deadline", "cancelled")
+
+    def __init__(self, fn, args, kwargs, future, deadline):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+        self.deadline = deadline
+        self.cancelled = False
+
+
+class InferenceScheduler:
+    """Admission control in front of the LLM workers.
+
+    Requests wait in a bounded asyncio queue and run on dedicated threads,
+    at most `concurrency` at a time (one per model instance), so a
+    generation never blocks the event loop and instances are never
+    oversubscribed. Jobs whose deadline passed or whose caller went away
+    are dropped before they start.
+    """
+
+    def __init__(self, max_queued: int = MAX_QUEUED_REQUESTS, default_timeout: float = DEFAULT_TIMEOUT_SECONDS):
+        self.max_queued = max_queued
+        self.default_timeout = default_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self.concurrency = 1
+        self.running_jobs = 0
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.expired = 0
+        self.cancelled = 0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    async def start(self, concurrency: int = 1) -> None:
+        if self.running:
+            return
+        self.concurrency = concurrency
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="llm")
+        self._worker = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        while not self._queue.empty():
+            job = self._queue.get_nowait()
+            if not job.future.done():
+                job.future.set_exception(SchedulerUnavailableError("Scheduler is shutting down"))
+        self._executor.shutdown(wait=True)
+
+    def _enqueue(self, fn: Callable[..., Any], args, kwargs, timeout: float) -> _Job:
+        if not self.running:
+            raise SchedulerUnavailableError("Inference scheduler is not running")
+        loop = asyncio.get_running_loop()
+        job = _Job(fn, args, kwargs, loop.create_future(), loop.time() + timeout)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            raise QueueFullError(f"{self.max_queued} requests already queued")
+        return job
+
+    @staticmethod
+    def _abandon(job: _Job) -> None:
+        job.cancelled = True
+        job.future.cancel()
+
+    async def submit(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Queue `fn(*args, **kwargs)` for the model thread and wait for its result."""
+        timeout = self.default_timeout if timeout is None else timeout
+        job = self._enqueue(fn, args, kwargs, timeout)
+        try:
+            # shield: a timeout must not cancel a generation that is already running
+            return await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            self._abandon(job)
+            raise DeadlineExceededError(f"No result within {timeout:.0f}s")
+        except asyncio.CancelledError:
+            self._abandon(job)  # caller went away
+            raise
+
+    def stream(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> AsyncIterator[Any]:
+        """Queue a streaming job and return an async iterator over what it emits.
+
+        The job is admitted immediately, so `QueueFullError` is raised here,
+        before a response has started. `fn` is called with two extra keyword
+        arguments: `emit(item)` to hand an item to the iterator and
+        `should_stop()`, which turns true once the consumer has gone away.
+        The deadline only covers the wait in the queue.
+        """
+        loop = asyncio.get_running_loop()
+        items: asyncio.Queue = asyncio.Queue()
+        finished = object()
+        job: Optional[_Job] = None
+
+        def emit(item: Any) -> None:
+            loop.call_soon_threadsafe(items.put_nowait, item)
+
+        kwargs.update(emit=emit, should_stop=lambda: job.cancelled)
+        job = self._enqueue(fn, args, kwargs, self.default_timeout if timeout is None else timeout)
+        # Runs on the loop after every emit() scheduled before the job returned
+        job.future.add_done_callback(lambda _: items.put_nowait(finished))
+
+        async def iterate() -> AsyncIterator[Any]:
+            try:
+                while True:
+                    item = await items.get()
+                    if item is finished:
+                        break
+                    yield item
+                if not job.future.cancelled():
+                    job.future.result()  # re-raise a failure from the model thread
+            finally:
+                if not job.future.done():
+                    self._abandon(job)
+
+        return iterate()
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        slots = asyncio.Semaphore(self.concurrency)
+        tasks = set()
+
+        def release(task: asyncio.Task) -> None:
+            tasks.discard(task)
+            slots.release()
+
+        try:
+            while True:
+                await slots.acquire()
+                job = await self._queue.get()
+                if job.cancelled or job.future.done():
+                    self.cancelled += 1
+                    slots.release()
+                    continue
+                if loop.time() >= job.deadline:
+                    self.expired += 1
+                    job.future.set_exception(DeadlineExceededError("Deadline passed while queued"))
+                    slots.release()
+                    continue
+                task = asyncio.create_task(self._execute(job))
+                tasks.add(task)
+                task.add_done_callback(release)
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _execute(self, job: _Job) -> None:
+        loop = asyncio.get_running_loop()
+        self.running_jobs += 1
+        try:
+            result = await loop.run_in_executor(self._executor, lambda: job.fn(*job.args, **job.kwargs))
+        except asyncio.CancelledError:
+            if not job.future.done():
+                job.future.set_exception(SchedulerUnavailableError("Scheduler is shutting down"))
+            raise
+        except Exception as e:
+            self.failed += 1
+            if not job.future.done():
+                job.future.set_exception(e)
+        else:
+            self.completed += 1
+            if not job.future.done():
+                job.future.set_result(result)
+        finally:
+            self.running_jobs -= 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.running,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queued": self.max_queued,
+            "concurrency": self.concurrency,
+            "in_progress": self.running_jobs,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "expired": self.expired,
+            "cancelled": self.cancelled
+        }
+
+
+inference_scheduler = InferenceScheduler()
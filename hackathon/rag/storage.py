@@ -0,0 +1,185 @@
+import json
+import mmap
+import os
+import shutil
+import tempfile
+from collections.abc import Mapping
+from typing import Iterable, Iterator, Optional
+import faiss
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from rag.index_types import load_index_meta, reconstruct_all, removes_by_position, write_index_meta
+
+# "pickle" is langchain's save_local (index.faiss + index.pkl). "mmap" keeps
+# index.faiss and stores documents as JSON lines with an offsets array, so the
+# index and the docstore are both memory-mapped instead of read and unpickled.
+STORAGE_MODES = ("pickle", "mmap")
+INDEX_FILE = "index.faiss"
+PICKLE_FILE = "index.pkl"
+DOCS_FILE = "docs.jsonl"
+OFFSETS_FILE = "docs.offsets.npy"
+STORAGE_FILES = {"pickle": (INDEX_FILE, PICKLE_FILE), "mmap": (INDEX_FILE, DOCS_FILE, OFFSETS_FILE)}
+
+
+def mmap_flags(index_type: str) -> int:
+    """FAISS read flags that map the vectors instead of copying them.
+
+    IVF indexes map their inverted lists; flat and HNSW codes need the
+    newer "in-file codes" flag, which older FAISS builds don't have.
+    """
+    if index_type in ("ivf", "ivfpq") or not hasattr(faiss, "IO_FLAG_MMAP_IFC"):
+        return faiss.IO_FLAG_MMAP
+    return faiss.IO_FLAG_MMAP_IFC
+
+
+class PositionIds(Mapping):
+    """`index_to_docstore_id` for a mapped docstore: position i has id "i"."""
+
+    def __init__(self, size: int):
+        self.size = size
+
+    def __getitem__(self, position: int) -> str:
+        if not 0 <= position < self.size:
+            raise KeyError(position)
+        return str(position)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(self.size))
+
+
+class MmapDocstore(Docstore):
+    """Read-only docstore over `docs.jsonl`, looked up by index position.
+
+    Only the offsets array and the pages of documents actually returned
+    are touched, and those pages are shared with every process mapping
+    the same file.
+    """
+
+    def __init__(self, index_dir: str):
+        self.offsets = np.load(os.path.join(index_dir, OFFSETS_FILE), mmap_mode="r")
+        with open(os.path.join(index_dir, DOCS_FILE), "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            self._data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def record(self, position: int) -> dict:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return json.loads(self._data[start:end])
+
+    def search(self, search: str) -> Document:
+        position = int(search)
+        if not 0 <= position < len(self):
+            return f"ID {search} not found."  # what InMemoryDocstore returns
+        record = self.record(position)
+        return Document(page_content=record["page_content"], metadata=record["metadata"])
+
+
+def remove_documents(store: FAISS, doc_ids: Iterable[str]) -> FAISS:
+    """`store` without the documents `doc_ids`.
+
+    Flat indexes are updated in place. For the others (IVF, HNSW) search
+    labels must keep matching positions in `index_to_docstore_id`, so the
+    remaining vectors are copied into an empty clone of the index, keeping
+    its training and its build and search parameters, and a new store is
+    returned.
+    """
+    doc_ids = set(doc_ids)
+    if not doc_ids:
+        return store
+    if removes_by_position(store.index):
+        store.delete(list(doc_ids))
+        return store
+
+    kept = [(position, doc_id) for position, doc_id in sorted(store.index_to_docstore_id.items()) if doc_id not in doc_ids]
+    index = faiss.clone_index(store.index)
+    index.reset()
+    if kept:
+        vectors = reconstruct_all(store.index)
+        index.add(vectors[[position for position, _ in kept]])
+    docstore = InMemoryDocstore({doc_id: store.docstore.search(doc_id) for _, doc_id in kept})
+    return FAISS(store.embedding_function, index, docstore, {i: doc_id for i, (_, doc_id) in enumerate(kept)})
+
+
+def _write_docs(store: FAISS, directory: str) -> None:
+    offsets = [0]
+    with open(os.path.join(directory, DOCS_FILE), "wb") as f:
+        for position in range(store.index.ntotal):
+            doc_id = store.index_to_docstore_id[position]
+            doc = store.docstore.search(doc_id)
+            line = json.dumps({"id": doc_id, "page_content": doc.page_content, "metadata": doc.metadata})
+            data = line.encode("utf-8") + b"\n"
+            f.write(data)
+            offsets.append(offsets[-1] + len(data))
+    np.save(os.path.join(directory, OFFSETS_FILE), np.asarray(offsets, dtype=np.uint64))
+
+
+def save_vector_store(store: FAISS, index_dir: str, storage: Optional[str] = None) -> None:
+    """Write `store` in `storage` format (default: whatever the index dir already uses).
+
+    Each file is written under a temp name and renamed in, so a reader
+    never sees a half-written one; readers should still only be told to
+    reload once this returns. Switching format updates the index metadata,
+    then removes the other format's files.
+    """
+    meta = load_index_meta(index_dir)
+    storage = storage or meta["storage"]
+    if storage not in STORAGE_MODES:
+        raise ValueError(f"Unknown storage '{storage}', expected one of {', '.join(STORAGE_MODES)}")
+    os.makedirs(index_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(prefix=".tmp-", dir=index_dir)
+    try:
+        if storage == "pickle":
+            store.save_local(tmp_dir)
+        else:
+            _write_docs(store, tmp_dir)
+            faiss.write_index(store.index, os.path.join(tmp_dir, INDEX_FILE))
+        # index.faiss last: it is what index_signature() watches
+        for name in sorted(STORAGE_FILES[storage], key=lambda name: name == INDEX_FILE):
+            os.replace(os.path.join(tmp_dir, name), os.path.join(index_dir, name))
+    finally:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    if meta["storage"] != storage:
+        # Point readers at the new files before the old ones go away
+        write_index_meta(index_dir, {**meta, "storage": storage})
+    for name in set(sum(STORAGE_FILES.values(), ())) - set(STORAGE_FILES[storage]):
+        path = os.path.join(index_dir, name)
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def load_vector_store(index_dir: str, embeddings, memory_map: bool = True) -> FAISS:
+    """Open the vector store in `index_dir`, in whichever format it was saved.
+
+    mmap-format stores are opened read-only and memory-mapped by default;
+    pass `memory_map=False` for an in-memory, writable copy (e.g. to add
+    documents). Pickle-format stores are always unpickled.
+    """
+    meta = load_index_meta(index_dir)
+    if meta["storage"] == "pickle":
+        return FAISS.load_local(index_dir, embeddings, allow_dangerous_deserialization=True)
+
+    index_path = os.path.join(index_dir, INDEX_FILE)
+    if memory_map:
+        index = faiss.read_index(index_path, mmap_flags(meta["index_type"]))
+        docstore = MmapDocstore(index_dir)
+        if len(docstore) != index.ntotal:
+            raise ValueError(f"{index_dir}: {len(docstore)} documents for {index.ntotal} vectors")
+        return FAISS(embeddings, index, docstore, PositionIds(index.ntotal))
+
+    index = faiss.read_index(index_path)
+    mapped = MmapDocstore(index_dir)
+    documents = {}
+    index_to_docstore_id = {}
+    for position in range(len(mapped)):
+        record = mapped.record(position)
+        documents[record["id"]] = Document(page_content=record["page_content"], metadata=record["metadata"])
+        index_to_docstore_id[position] = record["id"]
+    return FAISS(embeddings, index, InMemoryDocstore(documents), index_to_docstore_id)
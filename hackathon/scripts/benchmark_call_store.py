@@ -0,0 +1,93 @@
+# scripts/benchmark_call_store.py
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analysis.call_store import CALL_STORE_MODES, CallStore, SharedCallStore, publish_columns
+
+DATA_FILE = "data/telecom_calls.jsonl"
+
+
+def memory_mb():
+    """Private (anonymous) and file-backed resident memory; file pages are shared through the page cache."""
+    memory = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, kb = line.split()[:2]
+                memory[name.rstrip(":")] = int(kb) / 1024
+    return memory
+
+
+def child(mode, file_path, shared_dir):
+    """One API worker: load or attach, then answer a few lookups like the endpoints do."""
+    before = memory_mb()
+    started = time.perf_counter()
+    store = SharedCallStore(file_path, shared_dir=shared_dir) if mode == "shared" else CallStore(file_path)
+    calls = store.get()
+    ready_seconds = time.perf_counter() - started
+
+    for row in range(0, len(calls), max(len(calls) // 100, 1)):
+        calls.find_call(str(calls.call_id[row]))
+        calls.customer_rows(calls.vocab["customer_id"][calls.codes["customer_id"][row]])
+    for reason in calls.vocab["reason"]:
+        calls.reason_rows(reason)
+    float(calls.duration.mean())
+    after = memory_mb()
+    print(json.dumps({"ready_seconds": ready_seconds, "mb": {name: after[name] - before[name] for name in before}}))
+
+
+def run_workers(mode, file_path, shared_dir, workers):
+    procs = [
+        subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), file_path, "--child", mode, "--shared-dir", shared_dir],
+            stdout=subprocess.PIPE, text=True
+        )
+        for _ in range(workers)
+    ]
+    results = []
+    for proc in procs:
+        output, _ = proc.communicate()
+        if proc.returncode:
+            raise RuntimeError(f"{mode} worker failed with exit code {proc.returncode}")
+        results.append(json.loads(output.strip().splitlines()[-1]))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-worker startup time and memory of process-local vs shared call stores")
+    parser.add_argument("file", nargs="?", default=DATA_FILE)
+    parser.add_argument("--workers", default="1,2,4,8", help="Comma-separated worker counts")
+    parser.add_argument("--child", choices=CALL_STORE_MODES, help=argparse.SUPPRESS)
+    parser.add_argument("--shared-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.file, args.shared_dir)
+        return
+
+    shared_dir = tempfile.mkdtemp(prefix="call-store-")
+    try:
+        started = time.perf_counter()
+        generation = publish_columns(args.file, shared_dir)
+        print(f"Published generation {generation} of {args.file} in {time.perf_counter() - started:.2f}s")
+        for mode in CALL_STORE_MODES:
+            for workers in [int(n) for n in args.workers.split(",")]:
+                results = run_workers(mode, args.file, shared_dir, workers)
+                ready = sorted(result["ready_seconds"] for result in results)
+                private = sum(result["mb"]["RssAnon"] for result in results)
+                mapped = max(result["mb"]["RssFile"] for result in results)
+                print(f"{mode:<7} {workers:2d} workers: ready median {ready[len(ready) // 2] * 1000:8.1f} ms, "
+                      f"max {ready[-1] * 1000:8.1f} ms; private {private:7.1f} MB total "
+                      f"({private / workers:6.1f} MB/worker), mapped {mapped:6.1f} MB shared")
+    finally:
+        shutil.rmtree(shared_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# scripts/benchmark_embeddings.py
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from analysis.call_store import iter_call_batches
+from rag.embedding_backends import EMBEDDING_BACKENDS, cosine_drift, create_embeddings
+from rag.models import EMBEDDING_MODEL
+
+QUERY = "Customer reports slow internet speeds between 7-10 PM daily\nReason: network congestion"
+
+
+def sample_texts(file_path, n):
+    texts = []
+    for batch in iter_call_batches(file_path):
+        for call in batch:
+            texts.append(f"Reason: {call.get('reason', '')}\nNotes: {call.get('notes', '')}")
+            if len(texts) == n:
+                return texts
+    return texts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare embedding backends: throughput, single-query latency and drift")
+    parser.add_argument("file", nargs="?", default="data/telecom_calls.jsonl")
+    parser.add_argument("--backends", default=",".join(EMBEDDING_BACKENDS))
+    parser.add_argument("--threads", type=int, default=None, help="Intra-op threads (default: all cores)")
+    parser.add_argument("--documents", type=int, default=2048, help="Documents embedded for throughput and drift")
+    parser.add_argument("--batch-size", type=int, default=256, help="Texts per embed_documents call, as in the index build")
+    parser.add_argument("--queries", type=int, default=200, help="Single-query calls timed for latency")
+    args = parser.parse_args()
+
+    texts = sample_texts(args.file, args.documents)
+    print(f"{len(texts)} documents, {args.queries} single queries, threads={args.threads or 'default'}")
+    reference = None
+    for backend in args.backends.split(","):
+        started = time.perf_counter()
+        embeddings = create_embeddings(EMBEDDING_MODEL, backend, args.threads)
+        load_seconds = time.perf_counter() - started
+        embeddings.embed_query(QUERY)  # warm-up
+
+        started = time.perf_counter()
+        vectors = []
+        for start in range(0, len(texts), args.batch_size):
+            vectors.extend(embeddings.embed_documents(texts[start:start + args.batch_size]))
+        rate = len(texts) / (time.perf_counter() - started)
+        vectors = np.asarray(vectors, dtype=np.float32)
+
+        latencies = []
+        for i in range(args.queries):
+            query = texts[i % len(texts)]
+            started = time.perf_counter()
+            embeddings.embed_query(query)
+            latencies.append((time.perf_counter() - started) * 1000)
+        p50, p99 = np.percentile(latencies, [50, 99])
+
+        line = (f"{backend:<10} load {load_seconds:5.1f}s  {rate:8.1f} docs/sec  "
+                f"query p50 {p50:6.1f} ms  p99 {p99:6.1f} ms")
+        if reference is None:
+            reference = vectors
+            line += "  (drift reference)"
+        else:
+            drift = cosine_drift(reference, vectors)
+            line += f"  cosine mean {drift['mean_cosine']:.6f} min {drift['min_cosine']:.6f}"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+# scripts/benchmark_index_load.py
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from rag.index_types import INDEX_META_FILE
+from rag.storage import STORAGE_MODES, load_vector_store, save_vector_store
+
+INDEX_DIR = "data/retriever_db"
+
+
+def memory_mb():
+    """Private (anonymous) and file-backed resident memory; file pages are shared through the page cache."""
+    memory = {}
+    with open("/proc/self/status", "r") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                name, kb = line.split()[:2]
+                memory[name.rstrip(":")] = int(kb) / 1024
+    return memory
+
+
+def child(index_dir, queries):
+    before = memory_mb()
+    started = time.perf_counter()
+    store = load_vector_store(index_dir, None)
+    load_seconds = time.perf_counter() - started
+    after_load = memory_mb()
+
+    rng = np.random.default_rng(0)
+    matrix = rng.standard_normal((queries, store.index.d)).astype(np.float32)
+    started = time.perf_counter()
+    _, indices = store.index.search(matrix, 5)
+    docs = [store.docstore.search(store.index_to_docstore_id[i]) for i in indices.ravel() if i != -1]
+    query_seconds = time.perf_counter() - started
+    after_query = memory_mb()
+
+    print(json.dumps({
+        "load_seconds": load_seconds,
+        "query_ms": query_seconds / queries * 1000,
+        "docs": len(docs),
+        "load_mb": {name: after_load[name] - before[name] for name in before},
+        "query_mb": {name: after_query[name] - before[name] for name in before}
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time and memory of pickle vs memory-mapped index storage")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.queries)
+        return
+
+    source = load_vector_store(args.index_dir, None, memory_map=False)
+    print(f"{source.index.ntotal} documents in {args.index_dir} (page cache warm: files were just written)")
+    work_dir = tempfile.mkdtemp(prefix="index-load-")
+    try:
+        for storage in STORAGE_MODES:
+            index_dir = os.path.join(work_dir, storage)
+            os.makedirs(index_dir)
+            if os.path.exists(os.path.join(args.index_dir, INDEX_META_FILE)):
+                shutil.copy(os.path.join(args.index_dir, INDEX_META_FILE), index_dir)  # index type, for mmap flags
+            save_vector_store(source, index_dir, storage)
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), "--child", index_dir, "--queries", str(args.queries)],
+                check=True, capture_output=True, text=True
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            load, query = result["load_mb"], result["query_mb"]
+            print(f"{storage:<7} load {result['load_seconds'] * 1000:9.1f} ms  "
+                  f"private {load['RssAnon']:7.1f} MB, shared {load['RssFile']:7.1f} MB after load; "
+                  f"{query['RssAnon']:7.1f} / {query['RssFile']:7.1f} MB after {args.queries} queries "
+                  f"({result['query_ms']:.2f} ms/query)")
+    finally:
+        shutil.rmtree(work_dir)
+
+
+if __name__ == "__main__":
+    main()
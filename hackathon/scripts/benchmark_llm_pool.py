@@ -0,0 +1,61 @@
+# scripts/benchmark_llm_pool.py
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.llm_pool import LLMPool, available_cpus, available_memory, plan_pool
+from rag.models import MODEL_KWARGS
+from rag.recommendation import GENERATION_KWARGS, SYSTEM_PROMPT, build_prompt
+
+QUERY = "Customer reports slow internet speeds between 7-10 PM daily\nReason: network congestion"
+CONTEXT = "Reason: network congestion\nNotes: Customer called regarding network congestion. Issue was resolved."
+
+
+def run(workers, threads, requests, affinity):
+    pool = LLMPool(MODEL_KWARGS, system_prompt=SYSTEM_PROMPT, workers=workers, threads=threads, affinity=affinity)
+    pool.start()
+    try:
+        prompt = build_prompt(QUERY, CONTEXT)
+        kwargs = {**GENERATION_KWARGS, "stop": ["<|end|>"]}  # don't stop at the first blank line
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=pool.size) as executor:
+            list(executor.map(lambda _: pool.generate(prompt, **kwargs), range(requests)))
+        elapsed = time.perf_counter() - started
+        tokens = pool.stats()["tokens"]
+    finally:
+        pool.stop()
+    return pool.size, pool.threads, tokens, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Aggregate LLM tokens/sec for different worker pool shapes")
+    parser.add_argument("--shapes", default="auto", help="Comma-separated WORKERSxTHREADS, e.g. 1x16,2x8,4x4 (or auto)")
+    parser.add_argument("--requests-per-worker", type=int, default=4)
+    parser.add_argument("--no-affinity", action="store_true")
+    args = parser.parse_args()
+
+    cpus = available_cpus()
+    model_bytes = os.path.getsize(MODEL_KWARGS["model_path"])
+    print(f"{len(cpus)} CPUs, {model_bytes / 1e9:.1f} GB model, "
+          f"auto plan: {'x'.join(map(str, plan_pool(model_bytes, len(cpus), available_memory())))}")
+
+    shapes = [(None, None)] if args.shapes == "auto" else [
+        tuple(int(n) for n in shape.split("x")) for shape in args.shapes.split(",")
+    ]
+    baseline = None
+    for workers, threads in shapes:
+        planned_workers = workers or plan_pool(model_bytes, len(cpus), available_memory())[0]
+        size, threads, tokens, elapsed = run(
+            workers, threads, planned_workers * args.requests_per_worker, not args.no_affinity
+        )
+        rate = tokens / elapsed
+        baseline = baseline or rate
+        print(f"{f'{size} workers x {threads} threads':<28} {tokens:6d} tokens in {elapsed:7.2f}s  "
+              f"{rate:7.1f} tokens/s  x{rate / baseline:.2f}")
+
+
+if __name__ == "__main__":
+    main()
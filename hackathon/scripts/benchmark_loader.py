@@ -0,0 +1,64 @@
+# scripts/benchmark_loader.py
+import argparse
+import json
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analysis.call_store import ColumnBuilder, iter_column_chunks, load_columns, merge_columns
+
+
+def legacy_load_calls(file_path):
+    """The single-threaded loader `analysis.aht_analysis.load_calls()` used to be."""
+    calls = []
+    with open(file_path, "r") as file:
+        for line in file:
+            try:
+                call = json.loads(line)
+                if "call_id" not in call:
+                    continue
+                calls.append(call)
+            except json.JSONDecodeError:
+                continue
+    return calls
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the JSONL call loaders")
+    parser.add_argument("file", nargs="?", default="data/telecom_calls.jsonl")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    size_mb = os.path.getsize(args.file) / 1e6
+    print(f"File: {args.file} ({size_mb:.1f} MB)")
+
+    baseline, calls = timed(lambda: legacy_load_calls(args.file))
+    print(f"{'legacy load_calls()':<32} {baseline:7.2f}s  {len(calls)} calls")
+    del calls
+
+    elapsed, columns = timed(lambda: ColumnBuilder().extend(legacy_load_calls(args.file)).build())
+    print(f"{'sequential -> columns':<32} {elapsed:7.2f}s  x{baseline / elapsed:.2f}")
+
+    workers = 1
+    while workers <= args.max_workers:
+        elapsed, columns = timed(lambda: merge_columns(iter_column_chunks(args.file, workers)))
+        print(f"{f'parallel, {workers} workers':<32} {elapsed:7.2f}s  x{baseline / elapsed:.2f}  "
+              f"({size_mb / elapsed:.0f} MB/s)")
+        workers *= 2
+
+    # Same rows and values as the sequential loader
+    reference = load_columns(args.file, workers=1)
+    assert len(reference) == len(columns)
+    assert (reference.duration == columns.duration).all()
+    assert (reference.labels("reason") == columns.labels("reason")).all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,103 @@
+# scripts/benchmark_prompt_cache.py
+import argparse
+import os
+import statistics
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from llama_cpp import Llama
+from rag.llm_pool import MIN_THREADS_PER_WORKER
+from rag.prefix_cache import PromptPrefixCache
+from rag.models import MODEL_KWARGS
+from rag.recommendation import GENERATION_KWARGS, SYSTEM_PROMPT, build_prompt
+
+QUERIES = [
+    ("Customer reports slow internet speeds between 7-10 PM daily", "network congestion"),
+    ("Customer was charged $50 extra for international roaming they didn't use", "billing dispute"),
+    ("Customer cannot activate the new SIM card after porting their number", "sim activation"),
+    ("Customer's router keeps rebooting every few hours", "equipment failure"),
+    ("Customer wants to downgrade their plan before the contract ends", "plan change"),
+]
+CONTEXT = (
+    "Reason: {reason}\nNotes: Customer called regarding {reason}. Issue was resolved.\n"
+    "Seen in 312 calls, average duration 540s"
+)
+
+
+def first_token_seconds(llama, prompt):
+    """Time to the first streamed token, i.e. prompt evaluation plus one decode step."""
+    started = time.perf_counter()
+    stream = llama.create_completion(
+        prompt,
+        max_tokens=GENERATION_KWARGS["max_tokens"],
+        temperature=GENERATION_KWARGS["temperature"],
+        repeat_penalty=GENERATION_KWARGS["repeat_penalty"],
+        stop=GENERATION_KWARGS["stop"],
+        stream=True
+    )
+    next(iter(stream))
+    ttft = time.perf_counter() - started
+    stream.close()
+    return ttft
+
+
+def prompt_eval_seconds(llama, prompt):
+    """Time to evaluate the prompt and sample a single token."""
+    started = time.perf_counter()
+    llama.create_completion(prompt, max_tokens=1, temperature=GENERATION_KWARGS["temperature"])
+    return time.perf_counter() - started
+
+
+def run(llama, prompts, before_each):
+    prompt_eval, ttft = [], []
+    for prompt in prompts:
+        before_each()
+        prompt_eval.append(prompt_eval_seconds(llama, prompt))
+        before_each()
+        ttft.append(first_token_seconds(llama, prompt))
+    return prompt_eval, ttft
+
+
+def report(name, prompt_eval, ttft):
+    print(
+        f"{name:<28} prompt eval: mean {statistics.mean(prompt_eval) * 1000:8.1f} ms, "
+        f"median {statistics.median(prompt_eval) * 1000:8.1f} ms | "
+        f"TTFT: mean {statistics.mean(ttft) * 1000:8.1f} ms, median {statistics.median(ttft) * 1000:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare prompt evaluation with and without the system-prompt KV cache")
+    parser.add_argument("--rounds", type=int, default=2, help="Passes over the sample queries")
+    parser.add_argument("--threads", type=int, default=MIN_THREADS_PER_WORKER, help="Threads for the model instance")
+    args = parser.parse_args()
+
+    # One instance, set up like a pool worker
+    llama = Llama(n_threads=args.threads, **MODEL_KWARGS)
+    prompt_prefix_cache = PromptPrefixCache(llama)
+    prompts = [
+        build_prompt(f"{notes}\nReason: {reason}", CONTEXT.format(reason=reason))
+        for _ in range(args.rounds)
+        for notes, reason in QUERIES
+    ]
+    prefix_tokens = prompt_prefix_cache.warm(SYSTEM_PROMPT, prompts[0])
+    prompt_tokens = [len(prompt_prefix_cache.tokenize(prompt)) for prompt in prompts]
+    print(f"System prompt: {prefix_tokens} tokens (cached in {prompt_prefix_cache.warm_seconds * 1000:.0f} ms)")
+    print(f"Prompts: {len(prompts)}, {statistics.mean(prompt_tokens):.0f} tokens on average")
+
+    # Without the cache: every request evaluates its whole prompt from an empty context
+    report("no prefix cache", *run(llama, prompts, llama.reset))
+    # Steady state: the previous request left the prefix in the KV cache
+    report("prefix cache (resident)", *run(llama, prompts, prompt_prefix_cache.restore))
+
+    # Something else ran on the model in between: the snapshot has to be loaded
+    def after_other_prompt():
+        llama.reset()
+        prompt_prefix_cache.restore()
+    report("prefix cache (restored)", *run(llama, prompts, after_other_prompt))
+    print(prompt_prefix_cache.stats())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# scripts/benchmark_startup.py
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+SCENARIOS = ("import", "feedback", "ready")
+
+
+def memory_kb(pid="self"):
+    """(RSS, PSS) in kB; PSS splits shared pages (mmap'd weights) between the processes using them."""
+    rss = pss = None
+    try:
+        with open(f"/proc/{pid}/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    rss = int(line.split()[1])
+        with open(f"/proc/{pid}/smaps_rollup", "r") as f:
+            for line in f:
+                if line.startswith("Pss:"):
+                    pss = int(line.split()[1])
+    except OSError:
+        pass
+    if rss is None and pid == "self":
+        import resource
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # peak, kB on Linux
+    return rss, pss
+
+
+def child(scenario):
+    """Runs in a fresh interpreter so imports are really cold."""
+    result = {"scenario": scenario}
+    started = time.perf_counter()
+    import main
+    result["import_seconds"] = time.perf_counter() - started
+    from rag.models import model_registry
+
+    if scenario == "feedback":
+        started = time.perf_counter()
+        main.get_feedback_summary(None)
+        result["first_request_seconds"] = time.perf_counter() - started
+    elif scenario == "ready":
+        async def startup():
+            async with main.lifespan(main.app):
+                result["ready_seconds"] = time.perf_counter() - started
+                pids = [w["pid"] for w in model_registry.llm().stats()["per_worker"]]
+                result["workers_kb"] = [memory_kb(pid) for pid in pids]
+                result["rss_kb"], result["pss_kb"] = memory_kb()
+        asyncio.run(startup())
+
+    result.setdefault("rss_kb", memory_kb()[0])
+    result["models"] = model_registry.stats()
+    print(json.dumps(result))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import time, time-to-ready and memory of the API process")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help=f"Comma-separated, from {', '.join(SCENARIOS)}")
+    parser.add_argument("--child", choices=SCENARIOS, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child)
+        return
+
+    for scenario in args.scenarios.split(","):
+        started = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), "--child", scenario],
+            check=True, capture_output=True, text=True
+        ).stdout
+        wall = time.perf_counter() - started
+        result = json.loads(output.strip().splitlines()[-1])
+        line = f"{scenario:<9} import {result['import_seconds']:6.2f}s"
+        if "first_request_seconds" in result:
+            line += f", first /feedback/summary {result['first_request_seconds']:6.2f}s"
+        if "ready_seconds" in result:
+            line += f", ready {result['ready_seconds']:6.2f}s"
+        line += f", RSS {result['rss_kb'] / 1024:7.0f} MB"
+        if result.get("pss_kb") is not None:
+            line += f" (PSS {result['pss_kb'] / 1024:.0f} MB)"
+        workers = result.get("workers_kb") or []
+        if workers:
+            rss = sum(kb[0] or 0 for kb in workers) / 1024
+            pss = sum(kb[1] or 0 for kb in workers) / 1024
+            line += f", {len(workers)} LLM workers RSS {rss:.0f} MB (PSS {pss:.0f} MB)"
+        print(f"{line}  [{wall:.1f}s wall]")
+        print(f"{'':<9} models: {result['models']}")
+
+
+if __name__ == "__main__":
+    main()
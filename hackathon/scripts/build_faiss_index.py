@@ -1,48 +1,302 @@
 # hackaton/scripts/build_faiss_index.py
 
-import os
+import argparse
 import json
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
 from langchain.vectorstores import FAISS
-from langchain.embeddings import HuggingFaceBgeEmbeddings
+from langchain.docstore.in_memory import InMemoryDocstore
 from langchain.schema import Document
 from tqdm import tqdm
+from analysis.call_store import iter_call_batches
+from rag.dedup import NEAR_DUPLICATE_THRESHOLD, DocumentGroup, dedup_key, group_documents, merge_near_duplicates
+from rag.embedding_backends import EMBEDDING_BACKENDS, LazyEmbeddings, create_embeddings, embedding_id
+from rag.embedding_cache import EmbeddingCache
+from rag.index_types import (
+    DEFAULT_EF_SEARCH, DEFAULT_NPROBE, HNSW_EF_CONSTRUCTION, HNSW_M, INDEX_TYPES,
+    PQ_BITS, PQ_SUBQUANTIZERS, apply_search_params, build_index, save_index_meta
+)
+from rag.storage import STORAGE_MODES, save_vector_store
 
 DATA_FILE = Path("data/telecom_calls.jsonl")
 INDEX_DIR = "data/retriever_db"
+SHARD_DIR = "data/retriever_db.shards"
+EMBEDDING_MODEL = "BAAI/bge-base-en-v1.5"
+EMBED_BATCH_SIZE = 256
+CHUNK_SIZE = 4096  # documents per shard; the unit of work and of resume
+THREADS_PER_WORKER = 4
+MANIFEST_FILE = "manifest.json"
+SHARD_FORMAT = 2  # shards hold deduplicated document groups
 
-def load_calls(file_path):
+def iter_calls(file_path):
+    """Stream valid call records, parsed in parallel chunks."""
     if not file_path.exists():
         raise FileNotFoundError(f"{file_path} not found.")
-    with open(file_path, "r") as f:
-        return [json.loads(line) for line in f]
+    for batch in iter_call_batches(str(file_path)):
+        yield from batch
+
+def build_document(call):
+    context = call.get("notes", "")
+    reason = call.get("reason", "")
+    customer_id = call.get("customer", {}).get("customer_id", "unknown")
+    doc_text = f"Customer ID: {customer_id}\nReason: {reason}\nNotes: {context}"
+    return Document(page_content=doc_text, metadata={"call_id": call.get("call_id"), "duration": call.get("duration")})
 
 def build_documents(calls):
-    docs = []
-    for call in calls:
-        context = call.get("notes", "")
-        reason = call.get("reason", "")
-        customer_id = call.get("customer", {}).get("customer_id", "unknown")
-        doc_text = f"Customer ID: {customer_id}\nReason: {reason}\nNotes: {context}"
-        docs.append(Document(page_content=doc_text))
-    return docs
-
-def main():
-    print("Loading call data...")
-    calls = load_calls(DATA_FILE)
-
-    print(f"Building {len(calls)} documents...")
-    documents = build_documents(calls)
-
-    print("Generating embeddings...")
-    embeddings = HuggingFaceBgeEmbeddings(model_name="BAAI/bge-base-en-v1.5")
-
-    print("Building FAISS index...")
-    db = FAISS.from_documents(documents, embeddings)
-
-    print(f"Saving FAISS index to {INDEX_DIR}")
-    db.save_local(INDEX_DIR)
+    return [build_document(call) for call in calls]
+
+def iter_document_chunks(file_path, chunk_size=CHUNK_SIZE):
+    """Yield (chunk_id, documents) in file order; ids are stable across runs for the same file."""
+    chunk = []
+    chunk_id = 0
+    for call in iter_calls(file_path):
+        chunk.append(build_document(call))
+        if len(chunk) == chunk_size:
+            yield chunk_id, chunk
+            chunk, chunk_id = [], chunk_id + 1
+    if chunk:
+        yield chunk_id, chunk
+
+def default_workers():
+    return max(1, (os.cpu_count() or 1) // THREADS_PER_WORKER)
+
+# --- Manifest -----------------------------------------------------------------
+
+def source_signature(file_path):
+    stat = os.stat(file_path)
+    return {"path": str(file_path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size}
+
+def shard_paths(shard_dir, chunk_id):
+    stem = os.path.join(shard_dir, f"chunk_{chunk_id:06d}")
+    return f"{stem}.npy", f"{stem}.jsonl"
+
+def write_json_atomic(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def load_manifest(shard_dir, source, chunk_size, backend="torch"):
+    """Manifest of completed shards, or a fresh one if the source or settings changed."""
+    fresh = {"source": source, "model": embedding_id(EMBEDDING_MODEL, backend), "chunk_size": chunk_size, "format": SHARD_FORMAT, "chunks": {}}
+    path = os.path.join(shard_dir, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            manifest = json.load(f)
+        if all(manifest.get(key) == fresh[key] for key in ("source", "model", "chunk_size", "format")):
+            return manifest
+        print("Source data or build settings changed, discarding old shards")
+    shutil.rmtree(shard_dir, ignore_errors=True)
+    os.makedirs(shard_dir)
+    write_json_atomic(path, fresh)
+    return fresh
+
+# --- Embedding workers --------------------------------------------------------
+
+_worker_embeddings = None
+
+def _init_worker(threads, backend):
+    global _worker_embeddings
+    _worker_embeddings = create_embeddings(EMBEDDING_MODEL, backend, threads)
+
+def embed_texts(texts, batch_size=EMBED_BATCH_SIZE):
+    """Embed texts in batches; runs in a worker process."""
+    started = time.perf_counter()
+    vectors = []
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(_worker_embeddings.embed_documents(texts[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32), time.perf_counter() - started
+
+def write_shard(shard_dir, chunk_id, groups, vectors):
+    vectors_path, docs_path = shard_paths(shard_dir, chunk_id)
+    # Write under temp names and rename, so a crash never leaves a half shard behind
+    with open(f"{vectors_path}.tmp", "wb") as f:
+        np.save(f, vectors)
+    with open(f"{docs_path}.tmp", "w") as f:
+        for group in groups:
+            f.write(json.dumps({"text": group.text, "group": group.to_state()}) + "\n")
+    os.replace(f"{docs_path}.tmp", docs_path)
+    os.replace(f"{vectors_path}.tmp", vectors_path)
+
+def embed_shards(file_path, shard_dir, workers, chunk_size=CHUNK_SIZE, cache=None, backend="torch"):
+    """Embed every chunk not yet in the manifest; returns the manifest.
+
+    Documents in a chunk are grouped by `dedup_key` first and each group's
+    text is embedded once. With a `cache`, workers only embed texts it
+    hasn't seen; their vectors are added to it as chunks finish.
+    """
+    manifest = load_manifest(shard_dir, source_signature(file_path), chunk_size, backend)
+    manifest_path = os.path.join(shard_dir, MANIFEST_FILE)
+    if manifest.get("complete"):
+        print(f"All {len(manifest['chunks'])} shards already embedded")
+        return manifest
+    if manifest["chunks"]:
+        print(f"Resuming: {len(manifest['chunks'])} shards already embedded")
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    started = time.perf_counter()
+    embedded = 0
+    cached = 0
+    progress = tqdm(desc="Embedding", unit="docs")
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(threads, backend)) as pool:
+        pending = {}  # future -> (chunk_id, docs, groups, cached vectors by position, missing positions)
+
+        def finish(chunk_id, n_docs, groups, hits, missing, computed, seconds):
+            nonlocal embedded, cached
+            texts = [group.text for group in groups]
+            if missing:
+                if cache is not None:
+                    cache.put([texts[i] for i in missing], computed)
+                hits.update(zip(missing, computed))
+            write_shard(shard_dir, chunk_id, groups, np.stack([hits[i] for i in range(len(texts))]))
+            manifest["chunks"][str(chunk_id)] = {"docs": n_docs, "groups": len(groups), "seconds": round(seconds, 3)}
+            embedded += n_docs
+            cached += len(texts) - len(missing)
+            progress.update(n_docs)
+
+        def collect(return_when):
+            done, _ = wait(pending, return_when=return_when)
+            failed = None
+            for future in done:
+                chunk = pending.pop(future)
+                if future.exception() is not None:
+                    failed = future.exception()
+                    continue
+                finish(*chunk, *future.result())
+            # Record finished shards before surfacing a failure, so a rerun resumes after them
+            write_json_atomic(manifest_path, manifest)
+            if failed is not None:
+                raise failed
+
+        for chunk_id, documents in iter_document_chunks(file_path, chunk_size):
+            if str(chunk_id) in manifest["chunks"]:
+                continue
+            # Keep at most two chunks per worker in flight to bound memory
+            if len(pending) >= 2 * workers:
+                collect(FIRST_COMPLETED)
+            groups = list(group_documents(documents).values())
+            texts = [group.text for group in groups]
+            hits, missing = cache.lookup(texts) if cache is not None else ({}, list(range(len(texts))))
+            if not missing:
+                finish(chunk_id, len(documents), groups, hits, missing, None, 0.0)
+                continue
+            future = pool.submit(embed_texts, [texts[i] for i in missing])
+            pending[future] = (chunk_id, len(documents), groups, hits, missing)
+        while pending:
+            collect(FIRST_COMPLETED)
+    progress.close()
+    if cache is not None:
+        cache.flush()
+
+    elapsed = time.perf_counter() - started
+    rate = embedded / elapsed if elapsed > 0 else 0.0
+    print(f"Embedded {embedded} documents in {elapsed:.1f}s ({rate:.1f} docs/sec, {workers} {backend} workers, {cached} group vectors from cache)")
+    manifest["complete"] = True
+    manifest["last_run"] = {
+        "docs": embedded,
+        "cached": cached,
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(rate, 1),
+        "workers": workers,
+        "backend": backend
+    }
+    write_json_atomic(manifest_path, manifest)
+    return manifest
+
+# --- Merge --------------------------------------------------------------------
+
+def iter_shards(shard_dir, manifest):
+    for chunk_id in sorted(int(c) for c in manifest["chunks"]):
+        vectors_path, docs_path = shard_paths(shard_dir, chunk_id)
+        with open(docs_path, "r") as f:
+            records = [json.loads(line) for line in f]
+        groups = [DocumentGroup.from_state(record["text"], record["group"]) for record in records]
+        yield np.load(vectors_path, mmap_mode="r"), groups
+
+def merge_shards(shard_dir, manifest, args):
+    """Collapse the shards' groups across chunks and build the final index from them."""
+    positions = {}
+    groups = []
+    vectors = []
+    for shard_vectors, shard_groups in tqdm(iter_shards(shard_dir, manifest), total=len(manifest["chunks"]), desc="Merging"):
+        for group, vector in zip(shard_groups, shard_vectors):
+            key = dedup_key(group.text)
+            if key in positions:
+                groups[positions[key]].merge(group)
+            else:
+                positions[key] = len(groups)
+                groups.append(group)
+                vectors.append(np.array(vector, dtype=np.float32))
+    vectors = np.stack(vectors)
+
+    if args.near_duplicate_threshold < 1:
+        kept = merge_near_duplicates(groups, vectors, args.near_duplicate_threshold)
+        groups, vectors = [groups[i] for i in kept], vectors[kept]
+
+    total = sum(group.count for group in groups)
+    print(f"Collapsed {total} documents into {len(groups)} distinct documents")
+    index = build_index(
+        args.index_type,
+        vectors,
+        nlist=args.nlist,
+        pq_m=args.pq_m,
+        pq_bits=args.pq_bits,
+        hnsw_m=args.hnsw_m,
+        ef_construction=args.ef_construction
+    )
+    docstore = {str(i): Document(page_content=group.text, metadata=group.metadata()) for i, group in enumerate(groups)}
+    return index, docstore
+
+def main(args):
+    workers = args.workers or default_workers()
+    print(f"Embedding call documents into shards under {SHARD_DIR}...")
+    cache = None if args.no_embedding_cache else EmbeddingCache(embedding_id(EMBEDDING_MODEL, args.embedding_backend))
+    manifest = embed_shards(DATA_FILE, SHARD_DIR, workers, args.chunk_size, cache, args.embedding_backend)
+
+    print(f"Building {args.index_type} FAISS index from {len(manifest['chunks'])} shards...")
+    index, docstore = merge_shards(SHARD_DIR, manifest, args)
+    search = apply_search_params(index, nprobe=args.nprobe, ef_search=args.ef_search)
+
+    # The vectors are already embedded; only a later query would need the model
+    db = FAISS(
+        embedding_function=LazyEmbeddings(EMBEDDING_MODEL, args.embedding_backend),
+        index=index,
+        docstore=InMemoryDocstore(docstore),
+        index_to_docstore_id={i: str(i) for i in range(len(docstore))}
+    )
+
+    print(f"Saving FAISS index to {INDEX_DIR} ({args.storage} storage)")
+    save_vector_store(db, INDEX_DIR, args.storage)
+    save_index_meta(INDEX_DIR, args.index_type, index, search, args.storage)
+    if not args.keep_shards:
+        shutil.rmtree(SHARD_DIR)
     print(" Done.")
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description="Build the call retriever FAISS index")
+    parser.add_argument("--index-type", choices=INDEX_TYPES, default="flat", help="Exact flat search or an approximate index")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF inverted lists (default ~4*sqrt(n))")
+    parser.add_argument("--nprobe", type=int, default=DEFAULT_NPROBE, help="IVF lists probed per query")
+    parser.add_argument("--pq-m", type=int, default=PQ_SUBQUANTIZERS, help="IVF-PQ code size in sub-quantizers")
+    parser.add_argument("--pq-bits", type=int, default=PQ_BITS, help="IVF-PQ bits per sub-quantizer")
+    parser.add_argument("--hnsw-m", type=int, default=HNSW_M, help="HNSW neighbours per node")
+    parser.add_argument("--ef-construction", type=int, default=HNSW_EF_CONSTRUCTION, help="HNSW build-time candidate list size")
+    parser.add_argument("--ef-search", type=int, default=DEFAULT_EF_SEARCH, help="HNSW query-time candidate list size")
+    parser.add_argument("--storage", choices=STORAGE_MODES, default="pickle",
+                        help="langchain pickle, or a memory-mapped index and docstore shared between processes")
+    parser.add_argument("--near-duplicate-threshold", type=float, default=NEAR_DUPLICATE_THRESHOLD,
+                        help="Cosine similarity at which distinct texts are merged (1 keeps only exact-duplicate merging)")
+    parser.add_argument("--embedding-backend", choices=EMBEDDING_BACKENDS, default="torch",
+                        help="sentence-transformers, or the ONNX export (run scripts/export_onnx_embeddings.py first)")
+    parser.add_argument("--workers", type=int, default=None, help=f"Embedding processes (default cores / {THREADS_PER_WORKER})")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE, help="Documents per shard")
+    parser.add_argument("--no-embedding-cache", action="store_true", help="Re-embed every document instead of reusing cached vectors")
+    parser.add_argument("--keep-shards", action="store_true", help="Keep shard files after the merge")
+    main(parser.parse_args())
@@ -0,0 +1,24 @@
+# hackaton/scripts/compact_embedding_cache.py
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.embedding_cache import DEFAULT_MAX_BYTES, EMBEDDING_CACHE_DIR, EmbeddingCache
+from rag.models import EMBEDDING_MODEL
+
+def main(args):
+    cache = EmbeddingCache(args.model, cache_dir=args.cache_dir, max_bytes=int(args.max_mb * 1024 ** 2))
+    print(f"Cache for {args.model}: {cache.count} entries, {cache.size_bytes() / 1024 ** 2:.1f} MB")
+    result = cache.compact(args.max_entries)
+    print(f"Kept {result['after']} entries, evicted {result['evicted']} least recently used")
+    print(f"Now {cache.size_bytes() / 1024 ** 2:.1f} MB")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Evict least recently used entries and rewrite the embedding cache")
+    parser.add_argument("--model", default=EMBEDDING_MODEL, help="Embedding model whose cache to compact")
+    parser.add_argument("--cache-dir", default=EMBEDDING_CACHE_DIR)
+    parser.add_argument("--max-mb", type=float, default=DEFAULT_MAX_BYTES / 1024 ** 2, help="Size limit to compact down to")
+    parser.add_argument("--max-entries", type=int, default=None, help="Keep at most this many entries (overrides --max-mb)")
+    main(parser.parse_args())
@@ -0,0 +1,32 @@
+# hackaton/scripts/convert_index_storage.py
+
+import argparse
+import os
+import sys
+import time
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.index_types import load_index_meta
+from rag.storage import STORAGE_MODES, load_vector_store, save_vector_store
+
+INDEX_DIR = "data/retriever_db"
+
+
+def main(args):
+    meta = load_index_meta(args.index_dir)
+    if meta["storage"] == args.to:
+        print(f"{args.index_dir} already uses {args.to} storage")
+        return
+    started = time.perf_counter()
+    # No embedding model needed: nothing is embedded, documents and vectors are copied as they are
+    store = load_vector_store(args.index_dir, None, memory_map=False)
+    save_vector_store(store, args.index_dir, args.to)
+    print(f"Converted {store.index.ntotal} documents from {meta['storage']} to {args.to} storage "
+          f"in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Switch a retriever index between pickle and memory-mapped storage")
+    parser.add_argument("--to", choices=STORAGE_MODES, default="mmap")
+    parser.add_argument("--index-dir", default=INDEX_DIR)
+    main(parser.parse_args())
@@ -0,0 +1,52 @@
+# hackaton/scripts/export_onnx_embeddings.py
+
+import argparse
+import os
+import sys
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import numpy as np
+from analysis.call_store import iter_call_batches
+from rag.embedding_backends import ONNX_MODEL_DIR, cosine_drift, create_embeddings, export_onnx
+from rag.models import EMBEDDING_MODEL
+
+DATA_FILE = "data/telecom_calls.jsonl"
+# int8 vectors below this cosine to the torch ones would noticeably reorder search results
+MIN_MEAN_COSINE = 0.99
+
+
+def sample_texts(file_path, n):
+    """Call documents as the index embeds them (reason and notes), first `n` calls."""
+    texts = []
+    for batch in iter_call_batches(file_path):
+        for call in batch:
+            texts.append(f"Reason: {call.get('reason', '')}\nNotes: {call.get('notes', '')}")
+            if len(texts) == n:
+                return texts
+    return texts
+
+
+def main(args):
+    print(f"Exporting {EMBEDDING_MODEL} to {args.output_dir}...")
+    paths = export_onnx(EMBEDDING_MODEL, args.output_dir, quantize=not args.no_quantize)
+    for backend, path in paths.items():
+        print(f"  {backend}: {path} ({os.path.getsize(path) / 1e6:.0f} MB)")
+
+    texts = sample_texts(args.data_file, args.samples)
+    print(f"Checking cosine drift against the torch backend on {len(texts)} call documents...")
+    reference = np.asarray(create_embeddings(EMBEDDING_MODEL, "torch").embed_documents(texts))
+    for backend in paths:
+        vectors = np.asarray(create_embeddings(EMBEDDING_MODEL, backend, onnx_model_dir=args.output_dir).embed_documents(texts))
+        drift = cosine_drift(reference, vectors)
+        verdict = "ok" if drift["mean_cosine"] >= MIN_MEAN_COSINE else "TOO FAR from the index vectors"
+        print(f"  {backend:<10} mean cosine {drift['mean_cosine']:.6f}, min {drift['min_cosine']:.6f}, "
+              f"p1 {drift['p01_cosine']:.6f}  {verdict}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the embedding model to ONNX (and int8) and report its drift")
+    parser.add_argument("--output-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--no-quantize", action="store_true", help="Only export the fp32 model")
+    parser.add_argument("--data-file", default=DATA_FILE)
+    parser.add_argument("--samples", type=int, default=512, help="Call documents to measure drift on")
+    main(parser.parse_args())
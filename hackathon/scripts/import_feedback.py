@@ -0,0 +1,22 @@
+# hackaton/scripts/import_feedback.py
+
+import argparse
+import os
+import sys
+from pathlib import Path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from feedback.feedback_store import FEEDBACK_DB, LEGACY_FEEDBACK_FILE, FeedbackStore
+
+def main(args):
+    store = FeedbackStore(Path(args.db), legacy_file=None)
+    imported = store.import_jsonl_once(Path(args.input_file))
+    if not imported:
+        print(f"Nothing imported: {args.input_file} is missing, empty or was imported before")
+    print(f"{store.count()} feedback entries in {args.db}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a feedback JSONL file into the SQLite feedback store")
+    parser.add_argument("input_file", nargs="?", default=str(LEGACY_FEEDBACK_FILE))
+    parser.add_argument("--db", default=str(FEEDBACK_DB))
+    main(parser.parse_args())
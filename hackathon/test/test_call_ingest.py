@@ -0,0 +1,90 @@
+# test/test_call_ingest.py
+import sys
+import os
+import json
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analysis.call_ingest import CallTailer
+from analysis.call_store import CallStore
+
+
+def call(call_id, duration=300):
+    return {
+        "call_id": call_id,
+        "start_time": "2026-04-20T07:00:00Z",
+        "duration": duration,
+        "customer": {"customer_id": "C1"},
+        "agent": {"agent_id": "A1"},
+        "reason": "slow internet",
+        "category": "technical",
+        "disposition": "resolved",
+        "events": [
+            {"event_type": "ringing", "timestamp": "2026-04-20T07:00:00Z"},
+            {"event_type": "answered", "timestamp": "2026-04-20T07:00:20Z"}
+        ]
+    }
+
+
+def write(path, calls, mode="a"):
+    with open(path, mode) as f:
+        for record in calls:
+            f.write(json.dumps(record) + "\n")
+
+
+@pytest.fixture
+def store(tmp_path):
+    data_file = str(tmp_path / "calls.jsonl")
+    write(data_file, [call(f"BASE-{i}") for i in range(3)], mode="w")
+    return CallStore(data_file)
+
+
+def test_poll_appends_complete_lines_only(store, tmp_path):
+    tail_file = str(tmp_path / "tail.jsonl")
+    tailer = CallTailer(tail_file, store)
+    assert tailer.poll() == 0  # no file yet
+
+    write(tail_file, [call("NEW-0"), call("NEW-1")])
+    with open(tail_file, "a") as f:
+        f.write(json.dumps(call("NEW-2"))[:20])  # still being written
+    assert tailer.poll() == 2
+    assert len(store.get()) == 5
+    assert store.get().find_call("NEW-1") == 4
+
+    with open(tail_file, "a") as f:
+        f.write(json.dumps(call("NEW-2"))[20:] + "\n" + "not json\n")
+    assert tailer.poll() == 1
+    assert tailer.poll() == 0
+    assert tailer.stats()["lines_read"] == 4
+    assert tailer.offset == os.path.getsize(tail_file)
+    assert len(store.get()) == 6
+
+
+def test_reload_replays_the_tail_without_double_counting(store, tmp_path):
+    tail_file = str(tmp_path / "tail.jsonl")
+    write(tail_file, [call("NEW-0"), call("NEW-1")])
+    tailer = CallTailer(tail_file, store)
+    assert tailer.poll() == 2
+
+    # A new export replaces the data and drops the appended calls
+    write(store.file_path, [call("BASE-3")])
+    assert tailer.poll() == 2
+    calls = store.get()
+    assert len(calls) == 6
+    assert sorted(calls.call_id.tolist()) == ["BASE-0", "BASE-1", "BASE-2", "BASE-3", "NEW-0", "NEW-1"]
+
+
+def test_shrunk_tail_file_is_read_from_the_start(store, tmp_path):
+    tail_file = str(tmp_path / "tail.jsonl")
+    write(tail_file, [call("NEW-0"), call("NEW-1")])
+    tailer = CallTailer(tail_file, store)
+    assert tailer.poll() == 2
+
+    write(tail_file, [call("ROTATED-0")], mode="w")
+    assert tailer.poll() == 1
+    assert len(store.get()) == 6
+
+
+def test_refuses_to_tail_the_store_file(store):
+    with pytest.raises(ValueError):
+        CallTailer(store.file_path, store)
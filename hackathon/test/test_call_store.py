@@ -0,0 +1,153 @@
+# test/test_call_store.py
+import sys
+import os
+import json
+import random
+import shutil
+from datetime import datetime, timedelta
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from analysis.aht_analysis import (
+    bottleneck_summary, calculate_aht, customer_level_insights, get_call_event_bottlenecks,
+    get_long_calls, longest_segments, top_contact_reasons
+)
+from analysis.call_store import CallStore, ColumnBuilder, SharedCallStore, read_call_records, read_current
+
+EVENT_TYPES = ["ringing", "answered", "hold", "resumed", "transfer", "ended"]
+REASONS = ["slow internet", "billing dispute", "no signal", "router setup"]
+
+
+def call(call_id, duration=300):
+    return {
+        "call_id": call_id,
+        "start_time": "2026-04-20T07:00:00Z",
+        "duration": duration,
+        "customer": {"customer_id": "C1"},
+        "agent": {"agent_id": "A1"},
+        "reason": "slow internet",
+        "category": "technical",
+        "disposition": "resolved",
+        "events": [
+            {"event_type": "ringing", "timestamp": "2026-04-20T07:00:00Z"},
+            {"event_type": "answered", "timestamp": "2026-04-20T07:00:20Z"}
+        ]
+    }
+
+
+def write(path, calls, mode="a"):
+    with open(path, mode) as f:
+        for record in calls:
+            f.write(json.dumps(record) + "\n")
+
+
+def random_call(rng, i):
+    start = datetime(2026, 4, 20, 7) + timedelta(minutes=i)
+    events = []
+    at = start
+    for _ in range(rng.randint(0, 6)):
+        event = {"event_type": rng.choice(EVENT_TYPES)}
+        at += timedelta(seconds=rng.choice([5, 5, 20, 61]), milliseconds=rng.choice([0, 0, 250]))
+        if rng.random() < 0.9:
+            # Both timestamp formats the exports use
+            fmt = "%Y-%m-%dT%H:%M:%S.%fZ" if at.microsecond else "%Y-%m-%dT%H:%M:%SZ"
+            event["timestamp"] = at.strftime(fmt)
+        events.append(event)
+    return {
+        "call_id": f"CALL-{i}",
+        "start_time": start.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "duration": rng.randint(10, 900),
+        "customer": {"customer_id": f"C{rng.randint(0, 40)}"},
+        "agent": {"agent_id": f"A{rng.randint(0, 5)}"},
+        "reason": rng.choice(REASONS),
+        "category": "technical",
+        "disposition": "resolved",
+        "events": events
+    }
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    rng = random.Random(7)
+    path = str(tmp_path / "calls.jsonl")
+    write(path, [random_call(rng, i) for i in range(400)], mode="w")
+    with open(path, "a") as f:
+        f.write("not json\n" + json.dumps({"duration": 10}) + "\n")
+    return path
+
+
+def assert_matches_records(calls, records):
+    assert len(calls) == len(records)
+    assert calculate_aht(calls) == pytest.approx(calculate_aht(records))
+    assert get_long_calls(calls).call_id.tolist() == [call["call_id"] for call in get_long_calls(records)]
+    assert top_contact_reasons(calls) == top_contact_reasons(records)
+    assert list(customer_level_insights(calls).items()) == list(customer_level_insights(records).items())
+
+    column, longest = longest_segments(calls)
+    labels = calls.transitions().labels(calls.vocab)
+    for i, record in enumerate(records):
+        segment = get_call_event_bottlenecks(record).get("longest_segment")
+        if segment is None:
+            assert column[i] < 0 and np.isnan(longest[i])
+        else:
+            assert labels[column[i]] == f"{segment['from']} → {segment['to']}"
+            assert longest[i] == segment["duration"]
+
+
+def test_columns_match_the_record_analysis(data_file):
+    records = list(read_call_records(data_file))
+    calls = CallStore(data_file).get()
+    assert_matches_records(calls, records)
+
+    expected = {}
+    for record in records:
+        segment = get_call_event_bottlenecks(record).get("longest_segment")
+        if segment:
+            expected.setdefault(f"{segment['from']} → {segment['to']}", []).append(segment["duration"])
+    summary = {row["transition"]: row["avg_duration"] for row in bottleneck_summary(calls)}
+    assert summary == pytest.approx({key: np.mean(values) for key, values in expected.items()})
+
+
+def test_ties_go_to_the_earliest_segment():
+    events = [
+        {"event_type": "ringing", "timestamp": "2026-04-20T07:00:00Z"},
+        {"event_type": "answered", "timestamp": "2026-04-20T07:00:30Z"},
+        {"event_type": "hold", "timestamp": "2026-04-20T07:01:00Z"},
+        {"event_type": "answered", "timestamp": "2026-04-20T07:01:30Z"}
+    ]
+    record = dict(random_call(random.Random(0), 0), events=events)
+    builder = ColumnBuilder()
+    builder.append(record)
+    calls = builder.build()
+    column, longest = longest_segments(calls)
+    assert calls.transitions().labels(calls.vocab)[column[0]] == "ringing → answered"
+    assert longest[0] == 30
+
+
+def test_appended_calls_match_a_full_load(data_file, tmp_path):
+    records = list(read_call_records(data_file))
+    head = str(tmp_path / "head.jsonl")
+    write(head, records[:300], mode="w")
+    store = CallStore(head)
+    calls = store.get()
+    calls.transitions()  # appends extend the cached transitions too
+    assert store.append(records[300:350]) == 50
+    assert store.append(records[350:] + [{"call_id": "BAD", "duration": "n/a"}]) == 50
+
+    calls = store.get()
+    assert_matches_records(calls, records)
+    assert calls.find_call("CALL-399") == 399
+    assert calls.customer_rows("C3").tolist() == [i for i, r in enumerate(records) if r["customer"]["customer_id"] == "C3"]
+    assert calls.reason_rows("Slow Internet").tolist() == [i for i, r in enumerate(records) if r["reason"] == "slow internet"]
+
+
+def test_shared_store_fails_on_a_missing_generation(tmp_path):
+    data_file = str(tmp_path / "calls.jsonl")
+    write(data_file, [call(f"CALL-{i}") for i in range(3)], mode="w")
+    shared_dir = str(tmp_path / "shared")
+    assert len(SharedCallStore(data_file, shared_dir=shared_dir).get()) == 3
+
+    shutil.rmtree(os.path.join(shared_dir, read_current(shared_dir)["dir"]))
+    with pytest.raises(FileNotFoundError, match="generation 1"):
+        SharedCallStore(data_file, shared_dir=shared_dir).get()
@@ -0,0 +1,85 @@
+# test/test_feedback_retrain.py
+import sys
+import os
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import feedback.feedback_loop as feedback_loop
+import rag.retriever as retriever
+from feedback.feedback_store import FeedbackStore
+from rag.retriever import RetrieverService
+from rag.storage import save_vector_store
+from test_storage import N_DOCS, HashEmbeddings, make_store
+
+
+class FakeRegistry:
+    def __init__(self):
+        self._embeddings = HashEmbeddings()
+
+    def embeddings(self):
+        return self._embeddings
+
+    def document_embeddings(self):
+        return self._embeddings
+
+
+def feedback_text(context, recommendation):
+    return f"Context: {context}\nRecommendation: {recommendation}"
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch, request):
+    index_dir = str(tmp_path / "retriever_db")
+    save_vector_store(make_store(request.param), index_dir)
+    service = RetrieverService(index_dir)
+    store = FeedbackStore(str(tmp_path / "feedback.db"), legacy_file=None)
+    registry = FakeRegistry()
+    monkeypatch.setattr(feedback_loop, "index_dir", index_dir)
+    monkeypatch.setattr(feedback_loop, "WATERMARK_FILE", tmp_path / "retriever_db" / "feedback_watermark.json")
+    monkeypatch.setattr(feedback_loop, "get_feedback_store", lambda: store)
+    monkeypatch.setattr(feedback_loop, "model_registry", registry)
+    monkeypatch.setattr(feedback_loop, "retriever_service", service)
+    monkeypatch.setattr(retriever, "model_registry", registry)
+    service.load()
+    return service
+
+
+def save(call_id, context, recommendation, score=5):
+    feedback_loop.save_feedback(call_id, context, recommendation, score, original_duration=600, new_duration=420)
+
+
+def top_hit(service, text):
+    return service.load().similarity_search(text, k=1)[0]
+
+
+@pytest.mark.parametrize("service", ["flat", "ivf"], indirect=True)
+def test_retrain_upserts_feedback(service):
+    save("CALL-1", "billing dispute", "Verify the invoice first")
+    save("CALL-2", "no signal", "Restart the router")
+    save("CALL-3", "slow internet", "Run a line test", score=2)  # not positive
+    assert feedback_loop.retrain_faiss_with_feedback() == "Updated FAISS index with 2 new and 0 updated positive feedback entries."
+    assert service.load().index.ntotal == N_DOCS + 2
+    text = feedback_text("no signal", "Restart the router")
+    assert top_hit(service, text).page_content == text
+    assert feedback_loop.retrain_faiss_with_feedback() == "No new positive feedback to update FAISS index."
+
+    # Same call and recommendation: replaces the document instead of adding one
+    save("CALL-1", "billing dispute, second invoice", "Verify the invoice first")
+    assert feedback_loop.retrain_faiss_with_feedback() == "Updated FAISS index with 0 new and 1 updated positive feedback entries."
+    store = service.load()
+    assert store.index.ntotal == N_DOCS + 2
+    assert len(store.index_to_docstore_id) == N_DOCS + 2
+    for text in [feedback_text("billing dispute, second invoice", "Verify the invoice first"),
+                 feedback_text("no signal", "Restart the router"), "call 1999", "call 0"]:
+        assert top_hit(service, text).page_content == text
+    old = feedback_text("billing dispute", "Verify the invoice first")
+    assert all(doc.page_content != old for doc in store.similarity_search(old, k=5))
+
+
+@pytest.mark.parametrize("service", ["ivf"], indirect=True)
+def test_rebuilt_index_replays_feedback_without_duplicates(service, tmp_path):
+    save("CALL-1", "billing dispute", "Verify the invoice first")
+    feedback_loop.retrain_faiss_with_feedback()
+    os.remove(feedback_loop.WATERMARK_FILE)
+    assert feedback_loop.retrain_faiss_with_feedback() == "FAISS index already has all 1 positive feedback entries."
+    assert service.load().index.ntotal == N_DOCS + 1
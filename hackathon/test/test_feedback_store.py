@@ -0,0 +1,57 @@
+# test/test_feedback_store.py
+import sys
+import os
+import json
+import tempfile
+import threading
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from feedback.feedback_store import FeedbackStore
+
+FEEDBACK = {
+    "call_id": "CALL-1",
+    "context": "Reason: billing",
+    "recommendation": "Verify the invoice first",
+    "score": 4,
+    "original_duration": 600,
+    "new_duration": 450,
+    "duration_reduction": 150,
+    "percent_reduction": 25.0
+}
+
+with tempfile.TemporaryDirectory() as tmp:
+    store = FeedbackStore(os.path.join(tmp, "feedback.db"), legacy_file=None)
+
+    # POST /feedback/save without a comment passes comment=None
+    store.add({**FEEDBACK, "comment": None})
+    assert store.all()[-1]["comment"] == ""
+
+    # A malformed record fails its own caller, not the saves batched with it
+    errors = []
+
+    def save(record):
+        try:
+            store.add(record)
+        except ValueError as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=save, args=({**FEEDBACK, "score": None},))]
+    threads += [threading.Thread(target=save, args=({**FEEDBACK, "comment": f"ok {i}"},)) for i in range(5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(errors) == 1, errors
+    assert store.count() == 6, store.count()
+
+    # Legacy JSONL rows have no timestamp: they count toward all-time totals only
+    legacy_file = os.path.join(tmp, "feedback.jsonl")
+    with open(legacy_file, "w") as f:
+        for i in range(3):
+            f.write(json.dumps({**FEEDBACK, "comment": f"legacy {i}"}) + "\n")
+    store = FeedbackStore(os.path.join(tmp, "imported.db"), legacy_file=legacy_file)
+    store.add({**FEEDBACK, "comment": "new"})
+    assert store.totals()["total"] == 4, store.totals()
+    assert store.totals(window_seconds=3600)["total"] == 1, store.totals(window_seconds=3600)
+
+print("Feedback store checks passed")
@@ -0,0 +1,37 @@
+# test/test_index_types.py
+import sys
+import os
+import numpy as np
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from rag.index_types import MAX_POINTS_PER_CENTROID, build_index, create_index, training_sample
+
+DIM = 16
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).random((n, DIM), dtype=np.float32)
+
+
+def test_ivf_trains_on_a_sample():
+    data = vectors(5000)
+    index = create_index("ivf", DIM, len(data), nlist=4)
+    sample = training_sample(index, data)
+    assert len(sample) == 4 * MAX_POINTS_PER_CENTROID
+    assert len(np.unique(sample, axis=0)) == len(sample)
+    assert len(training_sample(index, data[:100])) == 100
+
+
+def test_ivfpq_sample_covers_every_pq_code():
+    data = vectors(80000)
+    index = create_index("ivfpq", DIM, len(data), nlist=4, pq_m=4)
+    assert len(training_sample(index, data)) == 2 ** 8 * MAX_POINTS_PER_CENTROID
+
+
+def test_sampled_index_still_holds_every_vector():
+    data = vectors(5000)
+    index = build_index("ivf", data, nlist=4)
+    index.nprobe = 4
+    assert index.ntotal == len(data)
+    _, labels = index.search(data[[0, 4999]], 1)
+    assert labels[:, 0].tolist() == [0, 4999]
@@ -5,17 +5,19 @@ import time
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
 try:
-    from rag.recommendation import llm
-    print("Successfully imported llm")
+    from rag.models import MODEL_KWARGS, model_registry
+    llm_pool = model_registry.llm()
+    print("Successfully created llm_pool")
 except Exception as e:
     print(f"Import error: {e}")
     sys.exit(1)
 
 print("\n Model configuration:")
-print(f"Model path: {llm.model_path}")
-print(f"Context size: {llm.n_ctx}")
-print(f"Threads: {llm.n_threads}")
-print(f"Batch size: {llm.n_batch}")
+print(f"Model path: {MODEL_KWARGS['model_path']}")
+print(f"Context size: {MODEL_KWARGS['n_ctx']}")
+print(f"Batch size: {MODEL_KWARGS['n_batch']}")
+llm_pool.start()
+print(f"Workers: {llm_pool.size} x {llm_pool.threads} threads")
 
 print("\nTesting model inference...")
 start_time = time.time()
@@ -23,7 +25,7 @@ start_time = time.time()
 try:
     prompt = "how telecom company works?"
     print(f"\n Prompt: '{prompt}'")
-    response = llm.invoke(prompt, max_tokens=20)
+    response = llm_pool.generate(prompt, max_tokens=20)
     elapsed = time.time() - start_time
     
     print(f"\nResponse received in {elapsed:.2f} seconds:")
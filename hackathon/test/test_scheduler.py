@@ -0,0 +1,117 @@
+# test/test_scheduler.py
+import sys
+import os
+import asyncio
+import threading
+import httpx
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+import main
+import rag.recommendation as recommendation
+from rag.scheduler import DeadlineExceededError, InferenceScheduler, QueueFullError, SchedulerUnavailableError
+
+CALL = {"call_id": "CALL-1", "duration": 600, "reason": "billing", "notes": "Customer disputes a charge", "events": []}
+
+
+async def wait_until(condition, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("condition not met")
+
+
+def test_full_queue_is_rejected_and_stop_fails_the_queued():
+    async def scenario():
+        scheduler = InferenceScheduler(max_queued=1)
+        with pytest.raises(SchedulerUnavailableError):
+            await scheduler.submit(lambda: None)
+
+        await scheduler.start(concurrency=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(scheduler.submit(release.wait))
+        await wait_until(lambda: scheduler.running_jobs == 1)
+        queued = asyncio.ensure_future(scheduler.submit(lambda: "queued"))
+        await wait_until(lambda: scheduler.stats()["queued"] == 1)
+        with pytest.raises(QueueFullError):
+            await scheduler.submit(lambda: "rejected")
+        assert scheduler.stats()["rejected"] == 1
+
+        release.set()
+        assert await running is True
+        assert await queued == "queued"
+        await scheduler.stop()
+        with pytest.raises(SchedulerUnavailableError):
+            await scheduler.submit(lambda: None)
+
+    asyncio.run(scenario())
+
+
+def test_request_expires_in_the_queue():
+    async def scenario():
+        scheduler = InferenceScheduler(max_queued=2)
+        await scheduler.start(concurrency=1)
+        release = threading.Event()
+        running = asyncio.ensure_future(scheduler.submit(release.wait))
+        await wait_until(lambda: scheduler.running_jobs == 1)
+        with pytest.raises(DeadlineExceededError):
+            await scheduler.submit(lambda: "late", timeout=0.05)
+        release.set()
+        await running
+        await wait_until(lambda: scheduler.stats()["cancelled"] == 1)
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def blocked_generation(monkeypatch):
+    """Generations through a one-slot queue that only finish once the returned event is set."""
+    release = threading.Event()
+    scheduler = InferenceScheduler(max_queued=1)
+
+    def generate(prepared):
+        release.wait()
+        return "Verify the invoice"
+
+    monkeypatch.setattr(recommendation, "inference_scheduler", scheduler)
+    monkeypatch.setattr(recommendation, "prepare_recommendation", lambda query: {"query": query, "cached": None})
+    monkeypatch.setattr(recommendation, "generate_recommendation", generate)
+    return scheduler, release
+
+
+def test_recommendations_answer_429_when_the_queue_is_full(blocked_generation):
+    scheduler, release = blocked_generation
+
+    async def scenario():
+        await scheduler.start(concurrency=1)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            first = asyncio.ensure_future(client.post("/recommendations", json=CALL))
+            await wait_until(lambda: scheduler.running_jobs == 1)
+            second = asyncio.ensure_future(client.post("/recommendations", json=CALL))
+            await wait_until(lambda: scheduler.stats()["queued"] == 1)
+
+            rejected = await client.post("/recommendations", json=CALL)
+            assert rejected.status_code == 429
+            assert rejected.headers["Retry-After"] == "5"
+            rejected = await client.post("/recommendations/stream", json=CALL)
+            assert rejected.status_code == 429
+
+            release.set()
+            for response in await asyncio.gather(first, second):
+                assert response.status_code == 200
+                assert response.json()["recommendations"] == "Verify the invoice"
+        await scheduler.stop()
+
+    asyncio.run(scenario())
+
+
+def test_recommendations_answer_503_when_the_scheduler_is_stopped(blocked_generation):
+    async def scenario():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://test") as client:
+            response = await client.post("/recommendations", json=CALL)
+            assert response.status_code == 503
+            assert response.headers["Retry-After"] == "5"
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+# test/test_storage.py
+import sys
+import os
+import hashlib
+import numpy as np
+import pytest
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from langchain_community.docstore.in_memory import InMemoryDocstore
+from langchain_community.vectorstores import FAISS
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from rag.index_types import build_index
+from rag.storage import load_vector_store, remove_documents, save_vector_store
+
+DIM = 32
+N_DOCS = 2000
+
+
+class HashEmbeddings(Embeddings):
+    """Deterministic vectors, so a text always lands on the same point."""
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+    def _embed(self, text):
+        seed = int.from_bytes(hashlib.sha1(text.encode("utf-8")).digest()[:8], "little")
+        return np.random.default_rng(seed).random(DIM, dtype=np.float32).tolist()
+
+
+def make_store(index_type):
+    embeddings = HashEmbeddings()
+    texts = [f"call {i}" for i in range(N_DOCS)]
+    vectors = np.asarray(embeddings.embed_documents(texts), dtype=np.float32)
+    options = {"pq_m": 8} if index_type == "ivfpq" else {}
+    index = build_index(index_type, vectors, **options)
+    docstore = InMemoryDocstore({f"doc-{i}": Document(page_content=text) for i, text in enumerate(texts)})
+    return FAISS(embeddings, index, docstore, {i: f"doc-{i}" for i in range(N_DOCS)})
+
+
+@pytest.mark.parametrize("index_type", ["flat", "ivf", "ivfpq", "hnsw"])
+def test_upsert_keeps_search_labels_in_sync(index_type):
+    store = make_store(index_type)
+    # An updated feedback entry: same id, new content
+    store = remove_documents(store, ["doc-0", "doc-5"])
+    store.add_documents([Document(page_content="call 0, updated")], ids=["doc-0"])
+
+    assert store.index.ntotal == N_DOCS - 1
+    assert len(store.index_to_docstore_id) == N_DOCS - 1
+    for text in ["call 0, updated", "call 1999", "call 7"]:
+        assert store.similarity_search(text, k=1)[0].page_content == text
+    assert all(doc.page_content != "call 5" for doc in store.similarity_search("call 5", k=5))
+
+
+def test_remove_nothing_returns_the_same_store():
+    store = make_store("hnsw")
+    assert remove_documents(store, []) is store
+
+
+@pytest.mark.parametrize("storage", ["pickle", "mmap"])
+def test_saved_store_round_trips(tmp_path, storage):
+    store = remove_documents(make_store("ivf"), ["doc-3"])
+    save_vector_store(store, str(tmp_path), storage=storage)
+    loaded = load_vector_store(str(tmp_path), HashEmbeddings())
+    assert loaded.index.ntotal == N_DOCS - 1
+    assert loaded.similarity_search("call 1999", k=1)[0].page_content == "call 1999"